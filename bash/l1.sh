@@ -4,4 +4,9 @@ source /root/.bashrc
 # shellcheck disable=SC2164
 cd /root/github/soros/ts
 
-python l1.py
+# 事实表按月增量重算, 周六全量重算一次刷新前复权历史
+if [ "$(date +%u)" -eq 6 ]; then
+  python l1.py --full_refresh=True
+else
+  python l1.py
+fi
@@ -44,15 +44,9 @@ class StockKlineRtWithCode(StockKlineRt):
     """
 
     @classmethod
-    def get_stock_minutes_rt(cls, code, klt=30, window=20, num_std=2, end=""):
-        # 使用父类逻辑获取单个标的的 K 线数据（原方法返回 (df, 0)）
-        df, _ = super().get_stock_minutes_rt(
-            code=code,
-            klt=klt,
-            window=window,
-            num_std=num_std,
-            end=end,
-        )
+    def get_stock_minutes_rt_parse(cls, res_json, code, klt=30, window=20, num_std=2, end=""):
+        # 同步和asyncio模式共用解析方法, 原方法返回 (df, 0), 这里返回行数
+        df, _ = super().get_stock_minutes_rt_parse(res_json, code, klt, window, num_std, end)
         print(f'get_stock_minutes_rt code: {code} df.shape: {df.shape}')
         return df, df.shape[0]
 
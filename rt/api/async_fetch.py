@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+asyncio 拉数核心, ThreadPoolExecutorBase.run_by_pool* 的异步执行后端
+
+- 进程内一个后台事件循环线程, 同步代码通过 run() 提交协程并等待结果
+- 每个 host 独立的并发上限(信号量), 单请求超时, 失败重试
+- 响应解析在默认线程池执行, 不阻塞事件循环
+- fail_fast 时任一请求失败即取消其余请求; 调用方中断(Ctrl+C/超时)时取消整批
+- aiohttp 为可选依赖, 未安装时 available() 为 False, 调用方回退线程池
+"""
+
+import asyncio
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from rt.api.push2_host_pool import Push2HostPool
+
+
+class AsyncFetchCore:
+
+    # 每个host同时进行的请求数, 不低于线程池模式的 max_workers(20), kline等全部请求同一host时并发不减少
+    HOST_LIMIT = 32
+    # 按 host_key 单独设置的并发数, 如 {'push2his.eastmoney.com': 64}
+    HOST_LIMITS = {}
+    # 所有host合计的连接数
+    TOTAL_LIMIT = 256
+    # 单个请求超时秒数
+    TIMEOUT = 10
+    # 失败重试次数及间隔秒数, 与同步方法上的 @retry 保持一致
+    RETRY_TIMES = 2
+    RETRY_WAIT = 0.2
+    # 空闲连接保活秒数, 两批请求间隔内连接不断开
+    KEEPALIVE_TIMEOUT = 60
+
+    _loop = None
+    _thread = None
+    _session = None
+    _host_semaphores = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def available(cls):
+        return aiohttp is not None
+
+    @classmethod
+    def get_loop(cls):
+        """后台事件循环, 首次调用时启动"""
+        with cls._lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='async_fetch_loop', daemon=True)
+                thread.start()
+                cls._loop, cls._thread = loop, thread
+            return cls._loop
+
+    @classmethod
+    def run(cls, coro, timeout=None):
+        """
+        在后台事件循环上执行协程, 阻塞等待结果
+        :param timeout: 整批超时秒数, 超时或调用方中断时取消协程
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, cls.get_loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    @classmethod
+    def get_session(cls):
+        # 只在事件循环线程内调用, 无需加锁
+        if cls._session is None or cls._session.closed:
+            # 按host的并发由信号量控制, 连接数上限取各host中最大的
+            limit_per_host = max([cls.HOST_LIMIT] + list(cls.HOST_LIMITS.values()))
+            connector = aiohttp.TCPConnector(limit=cls.TOTAL_LIMIT, limit_per_host=limit_per_host,
+                                             ttl_dns_cache=300, keepalive_timeout=cls.KEEPALIVE_TIMEOUT)
+            cls._session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=cls.TIMEOUT),
+                                                 trace_configs=[cls.get_trace_config()])
+        return cls._session
+
+    @classmethod
+    def get_trace_config(cls):
+        """统计新建连接及建连耗时, 请求时通过 trace_request_ctx 传入host"""
+        async def on_create_start(session, ctx, params):
+            ctx.connect_start = time.time()
+
+        async def on_create_end(session, ctx, params):
+            host = (ctx.trace_request_ctx or {}).get('host')
+            Push2HostPool.on_connect(host, time.time() - ctx.connect_start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(on_create_start)
+        trace_config.on_connection_create_end.append(on_create_end)
+        return trace_config
+
+    @classmethod
+    def get_host_semaphore(cls, host):
+        """
+        :param host: host_key 的返回值
+        """
+        if host not in cls._host_semaphores:
+            cls._host_semaphores[host] = asyncio.Semaphore(cls.HOST_LIMITS.get(host, cls.HOST_LIMIT))
+        return cls._host_semaphores[host]
+
+    @classmethod
+    def host_key(cls, host):
+        """*.push2.eastmoney.com 等随机子域名共用一个并发额度"""
+        parts = host.split('.')
+        return '.'.join(parts[-3:]) if len(parts) > 3 else host
+
+    @classmethod
+    async def get_json(cls, url, params=None, headers=None, proxies=None):
+        """
+        单次请求, 不重试
+        :param proxies: requests 格式 {'http': ..., 'https': ...}
+        """
+        parts = urlsplit(url)
+        proxy = (proxies or {}).get(parts.scheme)
+        semaphore = cls.get_host_semaphore(cls.host_key(parts.hostname or ''))
+        try:
+            async with semaphore:
+                async with cls.get_session().get(url, params=params, headers=headers, proxy=proxy,
+                                                 trace_request_ctx={'host': parts.hostname}) as r:
+                    r.raise_for_status()
+                    # push2 返回 text/plain 等非json的content-type
+                    data_json = await r.json(content_type=None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 代理故障与host无关, 不计入host连续失败
+            host_fault = not isinstance(e, (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError))
+            Push2HostPool.on_result(parts.hostname, False, host_fault)
+            raise
+        Push2HostPool.on_result(parts.hostname, True)
+        return data_json
+
+    @classmethod
+    async def fetch(cls, request_func, parse_func, args, proxies=None):
+        """
+        :param request_func: 参数 -> {'url', 'params', 'headers'}
+        :param parse_func: (响应json, 参数) -> 结果
+        """
+        for i in range(cls.RETRY_TIMES + 1):
+            # 重试时重新生成请求, push2 会换到池内其他host
+            req = request_func(*args)
+            try:
+                data_json = await cls.get_json(req['url'], req.get('params'), req.get('headers'), proxies)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if i == cls.RETRY_TIMES:
+                    raise
+                await asyncio.sleep(cls.RETRY_WAIT)
+        # 解析含pandas计算及交易日历等同步调用, 放到线程池避免阻塞事件循环
+        return await asyncio.get_running_loop().run_in_executor(None, parse_func, data_json, *args)
+
+    @classmethod
+    async def gather(cls, request_func, parse_func, args_list, proxies=None, fail_fast=False):
+        """
+        并发执行一批请求
+        :param fail_fast: True 时任一请求失败取消其余请求并抛出异常, False 时打印错误并跳过
+        :return: 与 args_list 顺序一致的结果, 失败的为 None
+        """
+        st = time.time()
+        tasks = [asyncio.ensure_future(cls.fetch(request_func, parse_func, args, proxies)) for args in args_list]
+        try:
+            done, pending = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_EXCEPTION if fail_fast else asyncio.ALL_COMPLETED)
+        except asyncio.CancelledError:
+            for t in tasks:
+                t.cancel()
+            raise
+        for t in pending:
+            t.cancel()
+
+        results = []
+        errors = 0
+        for args, t in zip(args_list, tasks):
+            if t in pending:
+                results.append(None)
+                continue
+            e = t.exception()
+            if e is not None:
+                errors += 1
+                print(f"Error fetching {args}: {e!r}")
+                if fail_fast:
+                    raise e
+                results.append(None)
+            else:
+                results.append(t.result())
+        print(f"AsyncFetchCore {getattr(parse_func, '__qualname__', parse_func)} requests:{len(args_list)} "
+              f"errors:{errors} cost:{time.time() - st:.2f}s")
+        return results
+
+    @classmethod
+    def close(cls):
+        if cls._loop is None:
+            return
+        if cls._session is not None:
+            cls.run(cls._session.close())
+        cls._loop.call_soon_threadsafe(cls._loop.stop)
+        cls._thread.join()
+        cls._loop, cls._thread, cls._session = None, None, None
+        cls._host_semaphores = {}
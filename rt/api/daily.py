@@ -1,6 +1,6 @@
 #coding: utf-8
-import time
 
+# pro带本地缓存和限流, 历史日期重复查询直接读缓存
 from utils.ts_util import pro
 import pandas as pd
 
@@ -24,7 +24,6 @@ class Daily:
             df = cls.__get(**{'trade_date': dt})
             if df.shape[0] > 0:
                 print(f"get-daily: {dt} finish. cnt={df.shape[0]}")
-            time.sleep(0.05)
             df_list.append(df)
         res = pd.concat(df_list)
         return res
@@ -1,12 +1,11 @@
 # coding: utf-8
 import time
 import uuid
-from random import randint
 
 import pandas as pd
-import requests
 from retrying import retry
 
+from rt.api.push2_host_pool import Push2HostPool
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 
 
@@ -73,9 +72,14 @@ class ETFListRT(ThreadPoolExecutorBase):
             23、年初至今涨跌幅:1YEAR
         """
 
+        data_json = cls.get_json(cls.get_rt_etf_all_a_dc_request(page_no))
+        return cls.get_rt_etf_all_a_dc_parse(data_json, page_no)
+
+    @classmethod
+    def get_rt_etf_all_a_dc_request(cls, page_no=None):
         ut = str(uuid.uuid4()).replace('-', '')
 
-        url = f"http://{randint(1, 100)}.push2.eastmoney.com/api/qt/clist/get"
+        url = Push2HostPool.url()
         a = "https://1.push2.eastmoney.com/api/qt/clist/get?" \
             "pn=1&pz=20&po=1&np=1&ut=bd1d9ddb04089700cf9c27f6f7426281&fltt=2&invt=2" \
              "& cb=cb=xxx" \
@@ -95,8 +99,10 @@ class ETFListRT(ThreadPoolExecutorBase):
             "fields": "f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f145,f115,f152",
             "_": str(time.time()),
         }
-        r = requests.get(url, params=params)
-        data_json = r.json()
+        return {'url': url, 'params': params}
+
+    @classmethod
+    def get_rt_etf_all_a_dc_parse(cls, data_json, page_no=None) -> (pd.DataFrame, int):
         if ((data_json is None)
                 or (not data_json["data"])
                 or (not data_json["data"]["diff"])):
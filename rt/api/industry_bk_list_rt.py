@@ -5,11 +5,10 @@ import datetime
 import time
 import uuid
 import pandas as pd
-import requests
-from random import randint
 from tushare.util.format_stock_code import format_stock_code
 from retrying import retry
 
+from rt.api.push2_host_pool import Push2HostPool
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 from rt.api.trading_time_util import get_last_trading_end_time
 
@@ -91,9 +90,14 @@ class IndustryBKListRT(ThreadPoolExecutorBase):
         东方财富网-板块实时行情
         https://quote.eastmoney.com/center/boardlist.html#boards-BK0465
         """
+        data_json = cls.get_json(cls.industry_bk_list_request(page_no))
+        return cls.industry_bk_list_parse(data_json, page_no)
+
+    @classmethod
+    def industry_bk_list_request(cls, page_no=None):
         ut = str(uuid.uuid4()).replace('-', '')
 
-        url = f"http://{randint(1, 100)}.push2.eastmoney.com/api/qt/clist/get"
+        url = Push2HostPool.url()
         fields_str = ",".join([i[0] for i in cls.field_config])
         params = {
             "pn": "1" if not page_no else str(page_no),
@@ -109,10 +113,10 @@ class IndustryBKListRT(ThreadPoolExecutorBase):
             "fields": fields_str,
             "_": str(int(time.time() * 1000)),
         }
+        return {'url': url, 'params': params}
 
-        r = requests.get(url, params=params, proxies=cls.get_proxy_conf())
-        data_json = r.json()
-
+    @classmethod
+    def industry_bk_list_parse(cls, data_json, page_no=None) -> (pd.DataFrame, int):
         if data_json is None or not data_json.get("data") or not data_json["data"].get("diff"):
             return pd.DataFrame(), 0
 
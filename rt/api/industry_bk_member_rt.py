@@ -5,11 +5,10 @@ import datetime
 import time
 import uuid
 import pandas as pd
-import requests
-from random import randint
-from tushare.util.format_stock_code import format_stock_code
 from retrying import retry
 
+from rt.api.field_transform import CODE, FieldPlan, Scale
+from rt.api.push2_host_pool import Push2HostPool
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 from rt.api.industry_bk_list_rt import IndustryBKListRT
 from rt.api.trading_time_util import get_last_trading_end_time
@@ -64,10 +63,10 @@ class BKMemberRT(ThreadPoolExecutorBase):
     #     setattr(cls, 'total_page', total_page)
     #     return total_page
 
-    # 字段处理函数
-    divide_100 = lambda x: x / 100 if x != "-" else None
-    divide_10k = lambda x: x / 10000 if x != "-" else None
-    code_format = lambda x: format_stock_code(x) if x != "-" else None
+    # 字段处理, '-' 由 FieldPlan 统一置空
+    divide_100 = Scale(100)
+    divide_10k = Scale(10000)
+    code_format = CODE
 
     # 字段映射配置
     field_config = (
@@ -87,12 +86,20 @@ class BKMemberRT(ThreadPoolExecutorBase):
         ('f124', '更新时间戳'),
         ('f13', '市场类型'),  # 0: 深市/A股，1: 沪市
     )
+    numeric_cols = ['最新价', '涨幅', '主力净流入', '换手率',
+                    '超大单净额', '超大单占比', '大单净额', '大单占比',
+                    '中单占比', '小单净额', '小单占比']
 
     @classmethod
     @retry(stop_max_attempt_number=3, wait_fixed=500)
     def component_stocks(cls, bk_code='BK0910', bk_name='专用设备', page_no=None) -> (pd.DataFrame, int):
+        data_json = cls.get_json(cls.component_stocks_request(bk_code, bk_name, page_no))
+        return cls.component_stocks_parse(data_json, bk_code, bk_name, page_no)
+
+    @classmethod
+    def component_stocks_request(cls, bk_code='BK0910', bk_name='专用设备', page_no=None):
         ut = str(uuid.uuid4()).replace('-', '')
-        url = f"http://{randint(1, 100)}.push2.eastmoney.com/api/qt/clist/get"
+        url = Push2HostPool.url()
 
         # print(f"component_stocks begin. bk_code={bk_code}, bk_name={bk_name}")
 
@@ -112,9 +119,10 @@ class BKMemberRT(ThreadPoolExecutorBase):
             "_": str(int(time.time() * 1000)),
         }
 
-        # 发送请求
-        r = requests.get(url, params=params, proxies=cls.get_proxy_conf())
-        data_json = r.json()
+        return {'url': url, 'params': params}
+
+    @classmethod
+    def component_stocks_parse(cls, data_json, bk_code='BK0910', bk_name='专用设备', page_no=None) -> (pd.DataFrame, int):
         # print(data_json)
 
         # 解析JSONP格式
@@ -130,24 +138,8 @@ class BKMemberRT(ThreadPoolExecutorBase):
         # if temp_df.shape[0] < total_num:
         #     print(f"component_stocks. bk_code={bk_code}, bk_name={bk_name} total_num={total_num}, but temp_df.num={temp_df.shape[0]}")
 
-        # 字段处理
-        for config in cls.field_config:
-            if len(config) > 2:
-                col_name = config[1]
-                temp_df[col_name] = temp_df[config[0]].apply(config[2])
-            else:
-                temp_df.rename(columns={config[0]: config[1]}, inplace=True)
-
-        # 保留需要的列
-        keep_columns = [c[1] for c in cls.field_config]
-        temp_df = temp_df[keep_columns]
-
-        # 处理特殊值
-        numeric_cols = ['最新价', '涨幅', '主力净流入', '换手率',
-                        '超大单净额', '超大单占比', '大单净额', '大单占比',
-                        '中单占比', '小单净额', '小单占比']
-        for col in numeric_cols:
-            temp_df[col] = pd.to_numeric(temp_df[col], errors='coerce')
+        # 字段处理: 重命名/转数值/缩放/代码格式化, 只保留 field_config 的列
+        temp_df = FieldPlan.compile(cls.field_config, cls.numeric_cols).apply(temp_df)
 
         # 时间戳转换
         if '更新时间戳' in temp_df.columns:
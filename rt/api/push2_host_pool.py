@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+东方财富 push2 host池
+
+- 原先每次请求随机 {1-100}.push2.eastmoney.com, 连接几乎无法复用, 每次都要 DNS+TCP 建连
+- 现固定使用 POOL_SIZE 个host轮询, 同host请求复用 keep-alive 连接
+- host连续失败 MAX_ERRORS 次移出池子, 冷却 COOLDOWN 秒内不再选中, 随机补一个新host
+- 全部host都在冷却中(断网/代理故障)时启用移出最久的host, 代理错误不计入host失败次数
+- 按host统计请求数/新建连接数/建连耗时, report() 输出连接复用率, 进程退出时输出一次
+"""
+
+import atexit
+import itertools
+import threading
+import time
+from random import choice
+
+import pandas as pd
+
+DOMAIN = 'push2.eastmoney.com'
+
+
+class Push2HostPool:
+
+    # 同时使用的host数
+    POOL_SIZE = 4
+    # 可选的host编号
+    HOST_NUMBERS = range(1, 101)
+    # 连续失败次数达到后移出池子
+    MAX_ERRORS = 3
+    # 移出后的冷却秒数
+    COOLDOWN = 300
+
+    _hosts = []
+    # host -> 连续失败次数
+    _errors = {}
+    # host -> 移出时间
+    _evicted = {}
+    # host -> {'requests', 'errors', 'connects', 'connect_cost'}
+    _stats = {}
+    # host -> 同步连接池上次记录的累计建连数
+    _pool_connections = {}
+    _cursor = itertools.count()
+    _lock = threading.Lock()
+
+    @classmethod
+    def is_pool_host(cls, host):
+        return bool(host) and host.endswith('.' + DOMAIN)
+
+    @classmethod
+    def _fill(cls):
+        now = time.time()
+        candidates = [f'{i}.{DOMAIN}' for i in cls.HOST_NUMBERS]
+        candidates = [h for h in candidates
+                      if h not in cls._hosts and now - cls._evicted.get(h, 0) > cls.COOLDOWN]
+        while len(cls._hosts) < cls.POOL_SIZE and candidates:
+            host = choice(candidates)
+            candidates.remove(host)
+            cls._hosts.append(host)
+            cls._errors[host] = 0
+        if not cls._hosts and cls._evicted:
+            # 全部host冷却中, 多半不是host的问题, 启用移出最久的
+            host = min(cls._evicted, key=cls._evicted.get)
+            cls._evicted.pop(host)
+            cls._hosts.append(host)
+            cls._errors[host] = 0
+
+    @classmethod
+    def get_host(cls):
+        """轮询池内host"""
+        with cls._lock:
+            if len(cls._hosts) < cls.POOL_SIZE:
+                cls._fill()
+            return cls._hosts[next(cls._cursor) % len(cls._hosts)]
+
+    @classmethod
+    def url(cls, path='/api/qt/clist/get', scheme='http'):
+        """
+        :param path: 接口路径
+        :return: http://12.push2.eastmoney.com/api/qt/clist/get
+        """
+        return f'{scheme}://{cls.get_host()}{path}'
+
+    @classmethod
+    def _host_stats(cls, host):
+        if host not in cls._stats:
+            cls._stats[host] = {'requests': 0, 'errors': 0, 'connects': 0, 'connect_cost': 0.0}
+        return cls._stats[host]
+
+    @classmethod
+    def on_result(cls, host, ok, host_fault=True):
+        """
+        记录一次请求结果, 非池内host忽略
+        :param ok: 请求是否成功
+        :param host_fault: 失败是否归因于host, 代理错误等为False, 只计数不累计连续失败
+        """
+        if not cls.is_pool_host(host):
+            return
+        with cls._lock:
+            stats = cls._host_stats(host)
+            stats['requests'] += 1
+            if ok:
+                cls._errors[host] = 0
+                return
+            stats['errors'] += 1
+            if not host_fault:
+                return
+            cls._errors[host] = cls._errors.get(host, 0) + 1
+            if cls._errors[host] >= cls.MAX_ERRORS and host in cls._hosts:
+                cls._hosts.remove(host)
+                cls._evicted[host] = time.time()
+                print(f'Push2HostPool evict {host} after {cls._errors[host]} errors')
+
+    @classmethod
+    def on_connect(cls, host, cost=None, num=1):
+        """
+        记录新建连接
+        :param cost: 建连耗时秒(DNS+TCP+TLS), 未知时为None
+        :param num: 新建连接数
+        """
+        if not cls.is_pool_host(host) or num <= 0:
+            return
+        with cls._lock:
+            stats = cls._host_stats(host)
+            stats['connects'] += num
+            if cost is not None:
+                stats['connect_cost'] += cost
+
+    @classmethod
+    def on_pool_connections(cls, host, num_connections):
+        """
+        同步模式按 urllib3 连接池的累计建连数记录增量
+        :param num_connections: HTTPConnectionPool.num_connections
+        """
+        with cls._lock:
+            num = num_connections - cls._pool_connections.get(host, 0)
+            cls._pool_connections[host] = max(num_connections, cls._pool_connections.get(host, 0))
+        cls.on_connect(host, num=num)
+
+    @classmethod
+    def report(cls, verbose=True):
+        """
+        :return: DataFrame host/requests/errors/connects/reuse_rate/connect_ms, 无请求时为空
+        """
+        with cls._lock:
+            rows = [dict(host=h, in_pool=h in cls._hosts, **s) for h, s in cls._stats.items()]
+        df = pd.DataFrame(rows, columns=['host', 'in_pool', 'requests', 'errors', 'connects', 'connect_cost'])
+        if df.empty:
+            return df
+        # 复用率: 未新建连接的请求占比
+        df['reuse_rate'] = (1 - df['connects'] / df['requests'].clip(lower=1)).clip(lower=0).round(3)
+        # 平均建连耗时, 同步模式无耗时数据为NaN
+        df['connect_ms'] = (df['connect_cost'] * 1000 / df['connects'].clip(lower=1)).round(1)
+        df['connect_ms'] = df['connect_ms'].where(df['connect_cost'] > 0)
+        df = df.drop(columns=['connect_cost']).sort_values('requests', ascending=False).reset_index(drop=True)
+        if verbose:
+            total = df['requests'].sum()
+            reuse = 1 - df['connects'].sum() / max(total, 1)
+            print(f'Push2HostPool hosts:{len(df)} requests:{total} reuse_rate:{reuse:.3f}\n{df.to_string()}')
+        return df
+
+    @classmethod
+    def report_at_exit(cls):
+        """每次运行结束输出一次累计统计, 无请求时不输出"""
+        if cls._stats:
+            cls.report()
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._hosts, cls._errors, cls._evicted, cls._stats, cls._pool_connections = [], {}, {}, {}, {}
+
+
+atexit.register(Push2HostPool.report_at_exit)
+
+if __name__ == '__main__':
+    urls = [Push2HostPool.url() for _ in range(8)]
+    print(urls)
+    for _ in range(Push2HostPool.MAX_ERRORS):
+        Push2HostPool.on_result(urls[0].split('/')[2], False)
+    print([Push2HostPool.url() for _ in range(8)])
+    Push2HostPool.report()
@@ -4,11 +4,10 @@
 import time
 import uuid
 import pandas as pd
-import requests
-from random import randint
-from tushare.util.format_stock_code import format_stock_code
 from retrying import retry
 
+from rt.api.field_transform import CODE, FieldPlan, Scale
+from rt.api.push2_host_pool import Push2HostPool
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 
 
@@ -60,8 +59,8 @@ class StockListRT(ThreadPoolExecutorBase):
         setattr(cls, 'total_page', total_page)
         return total_page
 
-    divide_100_func = lambda x: x / 100
-    divide_100_million_func = lambda x: round(x / 100000000, 1)
+    divide_100_func = Scale(100)
+    divide_100_million_func = Scale(100000000, 1)
 
     field_config = (
         ('f2', '价格', divide_100_func),
@@ -73,7 +72,7 @@ class StockListRT(ThreadPoolExecutorBase):
         ('f8', '换手', divide_100_func),
         ('f9', '市盈率-动态', divide_100_func),
         ('f10', '量比', divide_100_func),
-        ('f12', '代码', format_stock_code),
+        ('f12', '代码', CODE),
         ('f14', '名称'),
         ('f15', '最高价', divide_100_func),
         ('f16', '最低价', divide_100_func),
@@ -85,6 +84,8 @@ class StockListRT(ThreadPoolExecutorBase):
         ('f24', '60日涨幅', divide_100_func),
         ('f25', '今年涨幅', divide_100_func),
     )
+    # 代码/名称以外都转数值
+    numeric_cols = [i[1] for i in field_config if i[1] not in ('代码', '名称')]
 
     @classmethod
     @retry(stop_max_attempt_number=3, wait_fixed=200)
@@ -95,9 +96,14 @@ class StockListRT(ThreadPoolExecutorBase):
         :return: 实时行情
         :rtype: pandas.DataFrame、总数
         """
+        data_json = cls.get_json(cls.realtime_list_request(page_no))
+        return cls.realtime_list_parse(data_json, page_no)
+
+    @classmethod
+    def realtime_list_request(cls, page_no=None):
         ut = str(uuid.uuid4()).replace('-', '')
 
-        url = f"http://{randint(1, 100)}.push2.eastmoney.com/api/qt/clist/get&cb=cb=jQuery371016031028903839561_1756575499202"
+        url = Push2HostPool.url("/api/qt/clist/get&cb=cb=jQuery371016031028903839561_1756575499202")
         fields_str = ",".join([i[0] for i in cls.field_config])
         params = {
             "pn":  "1" if not page_no else str(page_no), # 页码
@@ -114,26 +120,18 @@ class StockListRT(ThreadPoolExecutorBase):
             "fields": fields_str,
             "_": str(time.time()),
         }
-        r = requests.get(url, params=params, proxies=cls.get_proxy_conf())
-        data_json = r.json()
+        return {'url': url, 'params': params}
+
+    @classmethod
+    def realtime_list_parse(cls, data_json, page_no=None) -> (pd.DataFrame, int):
         if ((data_json is None)
                 or (not data_json["data"])
                 or (not data_json["data"]["diff"])):
             return pd.DataFrame(), 0
         total_num = data_json['data']['total']
 
-        temp_df = pd.DataFrame(data_json["data"]["diff"])
-        column_dict = {i[0]: i[1] for i in cls.field_config}
-        apply_func_dict = {i[1]: i[2] for i in cls.field_config if len(i) > 2}
-        new_columns = [column_dict.get(i, '-') for i in temp_df.columns]
-        temp_df.columns = new_columns
+        temp_df = FieldPlan.compile(cls.field_config, cls.numeric_cols).apply(data_json["data"]["diff"], keep=True)
         temp_df.reset_index(inplace=True)
-        for col in new_columns:
-            if col not in ('代码', '名称'):
-                temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
-
-            if col in apply_func_dict:
-                temp_df[col] = temp_df[col].apply(apply_func_dict[col])
 
         temp_df = temp_df.dropna(subset=['价格'])
         temp_df = sort_df_columns(temp_df)
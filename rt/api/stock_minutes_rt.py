@@ -4,8 +4,10 @@ from requests import request
 from datetime import datetime, timedelta
 import random
 import requests
+import numpy as np
 import pandas as pd
 
+from rt.api.kline_decoder import KlineDecoder, COL_NAMES
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 
 base_url = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
@@ -18,21 +20,40 @@ def get_stock_minutes_rt(code, klt=30, window=20, num_std=2, end=""):
 class StockKlineRt(ThreadPoolExecutorBase):
 
     @classmethod
-    def run(cls, stock_list):
-
-        func = cls.get_stock_minutes_rt
-        # total_page = cls.get_total_page()
-        args = [[i] for i in stock_list]
-        result_df_list = cls.run_by_pool_pro(fetch_func=func, args=args)
-
-        print("len(result_df_list)")
-        print(len(result_df_list))
-        final_df = pd.concat(result_df_list, ignore_index=True)
+    def run(cls, stock_list, klt=30, window=20, num_std=2, end=""):
+        # 只拉原始kline, 全部返回后一次解码成一个DataFrame再按code分组计算BOLL
+        func = cls.get_klines
+        args = [[i, klt, window, num_std, end] for i in stock_list]
+        raw_list = cls.run_by_pool_pro(fetch_func=func, args=args)
+
+        print("len(raw_list)")
+        print(len(raw_list))
+        final_df = KlineDecoder.decode_batch(raw_list)
+        final_df['klt'] = klt
+        KlineDecoder.add_boll(final_df, window, num_std, by='code')
         final_df = final_df.sort_values(by='时间', ascending=False)
-        print(f"BKMemberRT.final_df.shape={final_df.shape}")
+        print(f"StockKlineRt.final_df.shape={final_df.shape}")
         return final_df
 
-    col_names = ['时间', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+    @classmethod
+    def get_klines(cls, code, klt=30, window=20, num_std=2, end="", req_tool=None):
+        """
+        :return: ((code, name, klines), kline条数)
+        """
+        res_json = cls.get_json(cls.get_klines_request(code, klt, window, num_std, end), req_tool)
+        return cls.get_klines_parse(res_json, code, klt, window, num_std, end)
+
+    @classmethod
+    def get_klines_request(cls, code, klt=30, window=20, num_std=2, end=""):
+        return cls.get_stock_minutes_rt_request(code, klt, window, num_std, end)
+
+    @classmethod
+    def get_klines_parse(cls, res_json, code, klt=30, window=20, num_std=2, end=""):
+        data = res_json.get('data') or {}
+        klines = data.get('klines') or []
+        return (code, data.get('name', ''), klines), len(klines)
+
+    col_names = COL_NAMES
     # 返回一致的列结构，包括后续计算产生的列
     empty_cols = col_names + ['code', 'name', 'klt', 'mean', 'std', 'ub', 'lb', 'low_lt_lb', 'low_lt_lb_prev1',
                               'low_lt_lb_prev2', 'sell_flag']
@@ -43,8 +64,15 @@ class StockKlineRt(ThreadPoolExecutorBase):
     """
     @classmethod
     def get_stock_minutes_rt(cls, code, klt=30, window=20, num_std=2, end="", req_tool=None):
+        res_json = cls.get_json(cls.get_stock_minutes_rt_request(code, klt, window, num_std, end), req_tool)
+        return cls.get_stock_minutes_rt_parse(res_json, code, klt, window, num_std, end)
 
-
+    @classmethod
+    def get_stock_minutes_rt_request(cls, code, klt=30, window=20, num_std=2, end="", beg="", lmt=500):
+        """
+        :param beg: 起始日期 YYYYMMDD, 增量拉取时为库里最新一根K线的日期
+        :param lmt: 最多返回的K线条数
+        """
         # secid：股票代码，格式为市场代码+股票代码，例如沪市股票的市场代码为1，深市股票的市场代码为0，股票代码为6位数字，如1.600000表示沪市股票600000。
         mkt = '1' if code.startswith('6') else \
             '1' if code.startswith('5') else '0'
@@ -60,17 +88,15 @@ class StockKlineRt(ThreadPoolExecutorBase):
                f"&fields2=f51%2Cf52%2Cf53%2Cf54%2Cf55%2Cf56%2Cf57%2Cf58%2Cf59%2Cf60%2Cf61"
                f"&klt={klt}" # klt：K线类型，例如1表示1分钟，5表示5分钟，101表示日K线等。
                f"&end={end_date_str}"
-               f"&lmt=500"
+               f"{'&beg=' + beg if beg else ''}"
+               f"&lmt={lmt}"
                f"&fqt=1" # fqt：复权类型，例如0表示不复权，1表示前复权，2表示后复权。
                f"")
         print(url)
-        # response = request("GET", url)
-        if req_tool is None:
-            response = requests.get(url,  proxies=cls.get_proxy_conf())
-        else:
-            response = req_tool.get(url, proxies=cls.get_proxy_conf())
-        res_json = response.json()
-        print(res_json)
+        return {'url': url}
+
+    @classmethod
+    def get_stock_minutes_rt_parse(cls, res_json, code, klt=30, window=20, num_std=2, end=""):
         data = res_json['data']
 
         market = data.get('market', 1)
@@ -80,43 +106,18 @@ class StockKlineRt(ThreadPoolExecutorBase):
         preKPrice = data.get('preKPrice', 128.82)
         klines = data.get('klines', [])
 
-        # "2025-01-03 15:00,126.22,124.98,126.22,124.85,48077,602495916.00,1.09,-0.97,-1.23,0.32"
-        col_names = ['时间', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
         print(f'market:{market}, name:{name}, kline.size={len(klines)}')
 
         if not klines:
             # 返回一致的列结构，包括后续计算产生的列
             return cls.empty_df, 0
 
-        klines_list = [
-            dict(zip(col_names, s.split(',')))
-            for s in klines
-        ]
-        print(klines_list[-1] if klines_list else 'klines_list empty')
-        df = pd.DataFrame(klines_list).astype({
-            '开盘': float,
-            '收盘': float,
-            '最高': float,
-            '最低': float,
-            '成交量': float,
-            '成交额': float,
-            '振幅': float,
-            '涨跌幅': float,
-            '涨跌额': float,
-            '换手率': float
-        })
+        # "2025-01-03 15:00,126.22,124.98,126.22,124.85,48077,602495916.00,1.09,-0.97,-1.23,0.32"
+        df = KlineDecoder.decode(klines)
         df['code'] = code
         df['name'] = name
         df['klt'] = klt
-
-        df['mean'] = df['收盘'].rolling(window=window, min_periods=window).mean()
-        df['std'] = df['收盘'].rolling(window=window, min_periods=window).std()
-        df['ub'] = df['mean'] + num_std * df['std']
-        df['lb'] = df['mean'] - num_std * df['std']
-        df['low_lt_lb'] = df['最低'] <= df['lb']
-        df['low_lt_lb_prev1'] = df['low_lt_lb'].shift(1)
-        df['low_lt_lb_prev2'] = df['low_lt_lb'].shift(2)
-        df['sell_flag'] = df['low_lt_lb'] & (df['low_lt_lb_prev1'] | df['low_lt_lb_prev2'])
+        KlineDecoder.add_boll(df, window, num_std)
 
         # low_lt_lb_1 = df.iloc[-1]['low_lt_lb']
         # low_lt_lb_2 = df.iloc[-2]['low_lt_lb']
@@ -131,6 +132,77 @@ class StockKlineRt(ThreadPoolExecutorBase):
 
     # return flag, df
 
+    # 增量拉取: (code, klt) -> 最近 window+2 根K线(COL_NAMES列), 用于拼接新K线计算BOLL
+    tail_cache = {}
+
+    @classmethod
+    def tail_size(cls, window=20):
+        # 新K线的BOLL需前 window-1 根, 下轨跌破标记再回看2根
+        return window + 2
+
+    @classmethod
+    def get_tail(cls, code, klt=30):
+        return cls.tail_cache.get((code, klt))
+
+    @classmethod
+    def set_tail(cls, code, klt, df, window=20):
+        """
+        :param df: 含 COL_NAMES 列, 按时间升序
+        """
+        if df is None or df.empty:
+            return
+        cls.tail_cache[(code, klt)] = df[cls.col_names].tail(cls.tail_size(window)).reset_index(drop=True)
+
+    @classmethod
+    def get_stock_minutes_rt_delta(cls, code, klt=30, window=20, num_std=2, last_time=None, req_tool=None):
+        """
+        只拉取库里最新一根K线(last_time)之后的K线, 与缓存的尾部K线拼接后计算BOLL
+        fqt=1 前复权价格在除权除息后整体重算, 新拉的K线从 last_time 前一根已走完的K线开始,
+        该K线价格与缓存不一致说明复权基准变了, 退化为全量拉取并重写
+        无缓存/缓存与库不一致/新数据与缓存不连续时同样退化为全量拉取
+        :param last_time: 库里最新的 trade_time, 如 2025-01-03 15:00
+        :return: (K线, 条数)
+            增量: 时间 >= last_time 的K线, last_time 那根可能是盘中未走完的K线, 一并更新
+            全量: 去掉前 window 根(BOLL不完整)后的全部K线, 覆盖库里同时间的旧数据
+        """
+        tail = cls.get_tail(code, klt)
+        if not last_time or tail is None or len(tail) < cls.tail_size(window) or tail['时间'].iloc[-1] != last_time:
+            return cls.get_stock_minutes_rt_full(code, klt, window, num_std, req_tool)
+
+        anchor = tail.iloc[-2]
+        req = cls.get_stock_minutes_rt_request(code, klt, window, num_std, beg=anchor['时间'][:10].replace('-', ''))
+        res_json = cls.get_json(req, req_tool)
+        data = res_json.get('data') or {}
+        new_df = KlineDecoder.decode(data.get('klines') or [])
+        new_df = new_df[new_df['时间'] >= anchor['时间']].reset_index(drop=True)
+        if len(new_df) < 2 or new_df['时间'].iloc[0] != anchor['时间'] or new_df['时间'].iloc[1] != last_time:
+            # 超过lmt条未更新, 与缓存之间有缺口
+            print(f'get_stock_minutes_rt_delta {code} klt={klt} gap after {last_time}, full fetch')
+            return cls.get_stock_minutes_rt_full(code, klt, window, num_std, req_tool)
+        price_cols = ['开盘', '收盘', '最高', '最低']
+        if not np.allclose(new_df.loc[0, price_cols].to_numpy(float), anchor[price_cols].to_numpy(float),
+                           rtol=0, atol=1e-6):
+            print(f'get_stock_minutes_rt_delta {code} klt={klt} price basis changed at {anchor["时间"]}, full fetch')
+            return cls.get_stock_minutes_rt_full(code, klt, window, num_std, req_tool)
+
+        df = pd.concat([tail[tail['时间'] < last_time], new_df.iloc[1:]], ignore_index=True)
+        df['code'] = code
+        df['name'] = data.get('name', '')
+        df['klt'] = klt
+        KlineDecoder.add_boll(df, window, num_std)
+        cls.set_tail(code, klt, df, window)
+        df = df[df['时间'] >= last_time].reset_index(drop=True)
+        return df, df.shape[0]
+
+    @classmethod
+    def get_stock_minutes_rt_full(cls, code, klt=30, window=20, num_std=2, req_tool=None):
+        """全量拉取并刷新尾部缓存, 去掉BOLL不完整的前 window 根"""
+        cls.tail_cache.pop((code, klt), None)
+        df, _ = cls.get_stock_minutes_rt(code, klt, window, num_std, req_tool=req_tool)
+        cls.set_tail(code, klt, df, window)
+        df = df.iloc[window:].reset_index(drop=True)
+        return df, df.shape[0]
+
 def get_sell_msg(df):
     row = df.iloc[-1]
     row1 = df.iloc[-2]
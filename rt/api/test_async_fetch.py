@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""AsyncFetchCore 及 run_by_pool* 的asyncio模式: 结果顺序, 丢弃失败的结果, host并发上限, fail_fast取消, 重试重建请求, 线程池回退"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from rt.api import async_fetch
+from rt.api.async_fetch import AsyncFetchCore
+from rt.api.thread_pool_executor import ThreadPoolExecutorBase
+
+
+class LocalServer:
+    """后台线程中的 aiohttp 服务, /json?i= 返回 {'i': i}, 可按参数延迟或失败"""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.hits = {}
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+
+    async def handle(self, request):
+        q = request.query
+        key = q.get('i')
+        self.hits[key] = self.hits.get(key, 0) + 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(float(q.get('delay', 0)))
+        finally:
+            self.active -= 1
+        # fail=n: 前n次请求返回500
+        if self.hits[key] <= int(q.get('fail', 0)):
+            return web.Response(status=500)
+        return web.json_response({'i': int(key)})
+
+    def start(self):
+        ready = threading.Event()
+
+        async def serve():
+            app = web.Application()
+            app.router.add_get('/json', self.handle)
+            self.runner = web.AppRunner(app)
+            await self.runner.setup()
+            site = web.TCPSite(self.runner, '127.0.0.1', 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            ready.set()
+
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(serve(), self.loop)
+        ready.wait(5)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def url(self, i, **params):
+        query = '&'.join(f'{k}={v}' for k, v in dict(i=i, **params).items())
+        return f'http://127.0.0.1:{self.port}/json?{query}'
+
+
+@pytest.fixture
+def server(monkeypatch):
+    s = LocalServer()
+    s.start()
+    monkeypatch.setattr(AsyncFetchCore, 'RETRY_WAIT', 0)
+    monkeypatch.setattr(AsyncFetchCore, '_host_semaphores', {})
+    yield s
+    AsyncFetchCore.close()
+    s.stop()
+
+
+def make_fetcher(server, params=None, **default):
+    """
+    :param params: {参数i: 请求参数}
+    :param default: 其他i的请求参数
+    """
+    params = params or {}
+
+    class Fetcher(ThreadPoolExecutorBase):
+        requests = []
+        sync_calls = []
+
+        @classmethod
+        def get_item(cls, i):
+            cls.sync_calls.append(i)
+            return cls.get_item_parse(cls.get_json(cls.get_item_request(i)), i)
+
+        @classmethod
+        def get_item_request(cls, i):
+            cls.requests.append(i)
+            return {'url': server.url(i, **params.get(i, default))}
+
+        @classmethod
+        def get_item_parse(cls, data_json, i):
+            return data_json['i'], 0
+
+    return Fetcher
+
+
+def test_order(server):
+    # 先请求的慢, 后请求的快, 结果仍按参数顺序
+    fetcher = make_fetcher(server, {i: {'delay': (10 - i) * 0.01} for i in range(10)})
+    assert fetcher.get_async_pair(fetcher.get_item) is not None
+    res = fetcher.run_by_pool_pro(fetcher.get_item, [(i,) for i in range(10)])
+    assert res == list(range(10))
+    assert fetcher.sync_calls == []
+
+
+def test_run_by_pool_drops_failed(server, monkeypatch):
+    # 失败的页结果为None, 打印错误后丢弃, 其余页保持顺序
+    monkeypatch.setattr(AsyncFetchCore, 'RETRY_TIMES', 0)
+    fetcher = make_fetcher(server, {2: {'fail': 9}, 5: {'fail': 9}})
+    assert fetcher.run_by_pool(fetcher.get_item, 6) == [1, 3, 4, 6]
+
+
+def test_host_limit(server, monkeypatch):
+    monkeypatch.setattr(AsyncFetchCore, 'HOST_LIMITS', {AsyncFetchCore.host_key('127.0.0.1'): 3})
+    fetcher = make_fetcher(server, delay=0.05)
+    res = fetcher.run_by_pool_pro(fetcher.get_item, [(i,) for i in range(0, 24, 2)])
+    assert len(res) == 12
+    assert server.max_active == 3
+
+
+def test_host_key():
+    assert AsyncFetchCore.host_key('12.push2.eastmoney.com') == AsyncFetchCore.host_key('77.push2.eastmoney.com')
+    assert AsyncFetchCore.host_key('push2his.eastmoney.com') == 'push2his.eastmoney.com'
+
+
+def test_fail_fast_cancels(server, monkeypatch):
+    monkeypatch.setattr(AsyncFetchCore, 'RETRY_TIMES', 0)
+    fetcher = make_fetcher(server, {0: {'fail': 9}}, delay=2)
+    st = time.time()
+    with pytest.raises(Exception):
+        fetcher.run_by_pool_pro(fetcher.get_item, [(i,) for i in range(6)])
+    assert time.time() - st < 1.5
+    # 其余请求被取消, 服务端连接随之断开
+    deadline = time.time() + 2
+    while server.active and time.time() < deadline:
+        time.sleep(0.05)
+    assert server.active == 0
+
+
+def test_retry_rebuilds_request(server, monkeypatch):
+    monkeypatch.setattr(AsyncFetchCore, 'RETRY_TIMES', 2)
+    fetcher = make_fetcher(server, fail=2)
+    assert fetcher.run_by_pool_pro(fetcher.get_item, [(0,), (2,)]) == [0, 2]
+    # 每次重试都重新调用 _request
+    assert sorted(fetcher.requests) == [0, 0, 0, 2, 2, 2]
+    assert server.hits == {'0': 3, '2': 3}
+
+
+def test_batch_timeout(server, monkeypatch):
+    fetcher = make_fetcher(server, delay=2)
+    monkeypatch.setattr(fetcher, 'batch_timeout', 0.2)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        fetcher.run_by_pool_pro(fetcher.get_item, [(0,), (2,)])
+
+
+def test_thread_pool_fallback(server, monkeypatch):
+    # 未安装aiohttp时回退线程池, 调用同步方法
+    monkeypatch.setattr(async_fetch, 'aiohttp', None)
+    assert not AsyncFetchCore.available()
+    fetcher = make_fetcher(server)
+    assert fetcher.get_async_pair(fetcher.get_item) is None
+    res = fetcher.run_by_pool_pro(fetcher.get_item, [(i,) for i in range(6)])
+    assert sorted(res) == list(range(6))
+    assert sorted(fetcher.sync_calls) == list(range(6))
+
+
+def test_use_async_off(server, monkeypatch):
+    fetcher = make_fetcher(server)
+    monkeypatch.setattr(fetcher, 'use_async', False)
+    assert fetcher.get_async_pair(fetcher.get_item) is None
+    # 没有配套 _request/_parse 的方法也走线程池
+    assert ThreadPoolExecutorBase.get_async_pair(fetcher.get_json) is None
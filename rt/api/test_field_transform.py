@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""FieldPlan 与原 rename -> to_numeric -> apply 的逐列处理结果一致"""
+
+import numpy as np
+import pandas as pd
+from tushare.util.format_stock_code import format_stock_code
+
+from rt.api.field_transform import CODE, FieldPlan, Scale
+
+OLD_CONFIG = (
+    ('f2', '价格', lambda x: x / 100),
+    ('f5', '成交量'),
+    ('f6', '成交额', lambda x: round(x / 100000000, 1)),
+    ('f12', '代码', format_stock_code),
+    ('f14', '名称'),
+    ('f24', '60日涨幅', lambda x: x / 100),
+)
+CONFIG = (
+    ('f2', '价格', Scale(100)),
+    ('f5', '成交量'),
+    ('f6', '成交额', Scale(100000000, 1)),
+    ('f12', '代码', CODE),
+    ('f14', '名称'),
+    ('f24', '60日涨幅', lambda x: x / 100),
+)
+
+
+def old_apply(diff, field_config):
+    """原 stock_list_rt.realtime_list 的处理, 除代码/名称外全部转数值"""
+    temp_df = pd.DataFrame(diff)
+    column_dict = {i[0]: i[1] for i in field_config}
+    apply_func_dict = {i[1]: i[2] for i in field_config if len(i) > 2}
+    new_columns = [column_dict.get(i, '-') for i in temp_df.columns]
+    temp_df.columns = new_columns
+    for col in new_columns:
+        if col not in ('代码', '名称'):
+            temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
+        if col in apply_func_dict:
+            temp_df[col] = temp_df[col].apply(apply_func_dict[col])
+    return temp_df
+
+
+def make_diff(n=300):
+    return [{
+        'f2': 1234 + i if i % 17 else '-',
+        'f5': i * 100 if i % 23 else '-',
+        'f6': 123456789012 + i * 98765,
+        'f12': f'{600000 + i:06d}' if i % 2 else f'{i:06d}',
+        'f14': f'股票{i}',
+        'f24': i - 150 if i % 29 else '-',
+    } for i in range(n)]
+
+
+def numeric_cols(field_config):
+    return [i[1] for i in field_config if i[1] not in ('代码', '名称')]
+
+
+def test_apply_records():
+    diff = make_diff()
+    df = FieldPlan.compile(CONFIG, numeric_cols(CONFIG)).apply(diff)
+    pd.testing.assert_frame_equal(df, old_apply(diff, OLD_CONFIG), check_dtype=False)
+
+
+def test_apply_dataframe():
+    diff = make_diff()
+    df = FieldPlan.compile(CONFIG, numeric_cols(CONFIG)).apply(pd.DataFrame(diff))
+    pd.testing.assert_frame_equal(df, old_apply(diff, OLD_CONFIG), check_dtype=False)
+
+
+def test_all_numeric():
+    # 没有 '-' 时保持整数类型
+    diff = [{'f2': 1000 + i, 'f5': i, 'f6': 10 ** 9, 'f12': '000001', 'f14': 'n', 'f24': 1} for i in range(10)]
+    df = FieldPlan.compile(CONFIG, numeric_cols(CONFIG)).apply(diff)
+    pd.testing.assert_frame_equal(df, old_apply(diff, OLD_CONFIG))
+
+
+def test_missing_field():
+    diff = [{k: v for k, v in d.items() if k != 'f24'} for d in make_diff(20)]
+    df = FieldPlan.compile(CONFIG, numeric_cols(CONFIG)).apply(diff)
+    assert '60日涨幅' not in df.columns
+    pd.testing.assert_frame_equal(df, old_apply(diff, OLD_CONFIG), check_dtype=False)
+
+
+def test_scale_call():
+    # Scale 仍可逐个调用
+    assert Scale(100)(1234) == 12.34
+    assert Scale(100000000, 1)(123456789012) == round(123456789012 / 100000000, 1)
+    np.testing.assert_array_equal(Scale(100).apply(np.array([1234, 100])), [12.34, 1.0])
+
+
+def test_compile_cached():
+    assert FieldPlan.compile(CONFIG) is FieldPlan.compile(CONFIG)
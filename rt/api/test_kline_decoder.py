@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""KlineDecoder 与原逐行 split + astype 解析的结果一致"""
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from rt.api.kline_decoder import COL_NAMES, FLOAT_COLS, KlineDecoder
+from rt.api.stock_minutes_rt import StockKlineRt
+
+
+def old_parse(klines, code, name, klt=30, window=20, num_std=2):
+    """原 get_stock_minutes_rt 的解析"""
+    df = pd.DataFrame([dict(zip(COL_NAMES, s.split(','))) for s in klines]).astype({c: float for c in FLOAT_COLS})
+    df['code'] = code
+    df['name'] = name
+    df['klt'] = klt
+    df['mean'] = df['收盘'].rolling(window=window, min_periods=window).mean()
+    df['std'] = df['收盘'].rolling(window=window, min_periods=window).std()
+    df['ub'] = df['mean'] + num_std * df['std']
+    df['lb'] = df['mean'] - num_std * df['std']
+    df['low_lt_lb'] = df['最低'] <= df['lb']
+    df['low_lt_lb_prev1'] = df['low_lt_lb'].shift(1)
+    df['low_lt_lb_prev2'] = df['low_lt_lb'].shift(2)
+    df['sell_flag'] = df['low_lt_lb'] & (df['low_lt_lb_prev1'] | df['low_lt_lb_prev2'])
+    return df
+
+
+def make_klines(n, seed=0):
+    r = random.Random(seed)
+    lines = []
+    for i in range(n):
+        o, c = round(r.uniform(9, 11), 2), round(r.uniform(9, 11), 2)
+        h, l = round(max(o, c) + r.uniform(0, 1), 2), round(min(o, c) - r.uniform(0, 1.5), 2)
+        lines.append(f"2025-01-{1 + i // 8:02d} {9 + i % 8:02d}:30,{o},{c},{h},{l},{r.randint(1, 99999)},"
+                     f"{r.uniform(1e5, 1e9):.2f},1.09,-0.97,-1.23,0.32")
+    return lines
+
+
+def test_decode():
+    klines = make_klines(100)
+    pd.testing.assert_frame_equal(KlineDecoder.decode(klines), old_parse(klines, 'x', 'x')[COL_NAMES])
+
+
+def test_decode_empty():
+    df = KlineDecoder.decode([])
+    assert list(df.columns) == COL_NAMES and df.shape[0] == 0
+
+
+def test_parse_with_boll():
+    klines = make_klines(300, seed=1)
+    res_json = {'data': {'name': '平安银行', 'klines': klines}}
+    df, _ = StockKlineRt.get_stock_minutes_rt_parse(res_json, '000001', klt=30)
+    ref = old_parse(klines, '000001', '平安银行', klt=30)
+    assert ref['sell_flag'].sum() > 0
+    pd.testing.assert_frame_equal(df, ref)
+
+
+def test_decode_batch_by_code():
+    items = [(f'{c:06d}', f'n{c}', make_klines(n, seed=c)) for c, n in [(1, 50), (2, 0), (3, 19), (4, 120)]]
+    df = KlineDecoder.decode_batch(items)
+    KlineDecoder.add_boll(df, by='code')
+    ref = pd.concat([old_parse(klines, code, name).drop(columns='klt') for code, name, klines in items if klines],
+                    ignore_index=True)
+    pd.testing.assert_frame_equal(df, ref)
+    # 每只股票的前 window-1 根不借用上一只的收盘价
+    assert np.isnan(df[df['code'] == '000004']['mean'].to_numpy()[:19]).all()
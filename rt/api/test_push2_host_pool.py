@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""Push2HostPool: host轮询, 连续失败移出及冷却, 代理错误不计入, 复用率及建连耗时统计"""
+
+import time
+
+import pytest
+
+from rt.api.push2_host_pool import DOMAIN, Push2HostPool
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    Push2HostPool.reset()
+    yield Push2HostPool
+    Push2HostPool.reset()
+
+
+def host_of(url):
+    return url.split('/')[2]
+
+
+def test_url_round_robin():
+    urls = [Push2HostPool.url() for _ in range(Push2HostPool.POOL_SIZE * 3)]
+    hosts = [host_of(u) for u in urls]
+    assert all(u.startswith('http://') and u.endswith('/api/qt/clist/get') for u in urls)
+    assert all(h.endswith('.' + DOMAIN) for h in hosts)
+    # 固定 POOL_SIZE 个host轮流使用
+    assert len(set(hosts)) == Push2HostPool.POOL_SIZE
+    assert hosts[:Push2HostPool.POOL_SIZE] * 3 == hosts
+    assert Push2HostPool.url('/api/qt/stock/get', 'https').startswith('https://')
+
+
+def test_evict_after_errors():
+    host = host_of(Push2HostPool.url())
+    for _ in range(Push2HostPool.MAX_ERRORS - 1):
+        Push2HostPool.on_result(host, False)
+    assert host in Push2HostPool._hosts
+    # 成功一次清零连续失败
+    Push2HostPool.on_result(host, True)
+    for _ in range(Push2HostPool.MAX_ERRORS - 1):
+        Push2HostPool.on_result(host, False)
+    assert host in Push2HostPool._hosts
+    Push2HostPool.on_result(host, False)
+    assert host not in Push2HostPool._hosts
+    # 补一个新host, 冷却期内不再选中
+    hosts = set(host_of(Push2HostPool.url()) for _ in range(Push2HostPool.POOL_SIZE * 2))
+    assert len(hosts) == Push2HostPool.POOL_SIZE and host not in hosts
+
+
+def test_proxy_fault_not_evict():
+    host = host_of(Push2HostPool.url())
+    for _ in range(Push2HostPool.MAX_ERRORS * 2):
+        Push2HostPool.on_result(host, False, host_fault=False)
+    assert host in Push2HostPool._hosts
+    stats = Push2HostPool.report(verbose=False).set_index('host').loc[host]
+    assert stats['requests'] == stats['errors'] == Push2HostPool.MAX_ERRORS * 2
+
+
+def test_cooldown_expired(monkeypatch):
+    monkeypatch.setattr(Push2HostPool, 'HOST_NUMBERS', range(1, Push2HostPool.POOL_SIZE + 1))
+    host = host_of(Push2HostPool.url())
+    for _ in range(Push2HostPool.MAX_ERRORS):
+        Push2HostPool.on_result(host, False)
+    # 没有可补的host时池子变小
+    assert len(set(host_of(Push2HostPool.url()) for _ in range(8))) == Push2HostPool.POOL_SIZE - 1
+    Push2HostPool._evicted[host] = time.time() - Push2HostPool.COOLDOWN - 1
+    assert host in set(host_of(Push2HostPool.url()) for _ in range(8))
+
+
+def test_all_evicted_fallback(monkeypatch):
+    monkeypatch.setattr(Push2HostPool, 'HOST_NUMBERS', range(1, 3))
+    hosts = set(host_of(Push2HostPool.url()) for _ in range(4))
+    assert len(hosts) == 2
+    for host in sorted(hosts):
+        for _ in range(Push2HostPool.MAX_ERRORS):
+            Push2HostPool.on_result(host, False)
+        time.sleep(0.01)
+    assert Push2HostPool._hosts == []
+    # 全部冷却中时启用移出最久的host, 不抛异常
+    assert host_of(Push2HostPool.url()) == sorted(hosts)[0]
+
+
+def test_non_pool_host_ignored():
+    Push2HostPool.on_result('push2his.eastmoney.com', False)
+    Push2HostPool.on_connect('127.0.0.1', 0.1)
+    assert Push2HostPool.report(verbose=False).empty
+
+
+def test_reuse_rate_and_connect_ms():
+    a, b = f'1.{DOMAIN}', f'2.{DOMAIN}'
+    for _ in range(10):
+        Push2HostPool.on_result(a, True)
+    Push2HostPool.on_connect(a, 0.1)
+    Push2HostPool.on_connect(a, 0.3)
+    for _ in range(4):
+        Push2HostPool.on_result(b, True)
+    # 同步模式只知道建连数, 不知道耗时
+    Push2HostPool.on_pool_connections(b, 1)
+    Push2HostPool.on_pool_connections(b, 1)
+    Push2HostPool.on_pool_connections(b, 2)
+    df = Push2HostPool.report(verbose=False).set_index('host')
+    assert df.loc[a, 'requests'] == 10 and df.loc[a, 'connects'] == 2
+    assert df.loc[a, 'reuse_rate'] == 0.8
+    assert df.loc[a, 'connect_ms'] == 200.0
+    assert df.loc[b, 'connects'] == 2 and df.loc[b, 'reuse_rate'] == 0.5
+    assert df.loc[b, 'connect_ms'] != df.loc[b, 'connect_ms']
+
+
+def test_report_at_exit(capsys):
+    Push2HostPool.report_at_exit()
+    assert capsys.readouterr().out == ''
+    Push2HostPool.on_result(f'1.{DOMAIN}', True)
+    Push2HostPool.report_at_exit()
+    assert 'reuse_rate' in capsys.readouterr().out
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+"""增量拉取 get_stock_minutes_rt_delta 写库后的结果与每次全量重算一致, 包括前复权价格整体调整"""
+
+import random
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+from rt.api.stock_minutes_rt import StockKlineRt
+
+WINDOW = 20
+
+
+class FakeServer:
+    """按请求的 beg/lmt 返回前n根K线, 价格乘以 scale 模拟除权后的前复权"""
+
+    def __init__(self, total=260, seed=7):
+        r = random.Random(seed)
+        self.rows = [[f"2025-01-{1 + i // 8:02d} {9 + i % 8:02d}:30"] +
+                     [round(r.uniform(9, 11), 2), round(r.uniform(9, 11), 2),
+                      round(r.uniform(10, 12), 2), round(r.uniform(7.5, 10), 2)] for i in range(total)]
+        self.n = 200
+        self.scale = 1.0
+        self.requests = []
+
+    def klines(self):
+        s = self.scale
+        return [f"{t},{o * s:.2f},{c * s:.2f},{h * s:.2f},{l * s:.2f},100,1000.00,1.09,-0.97,-1.23,0.32"
+                for t, o, c, h, l in self.rows[:self.n]]
+
+    def get_json(self, req):
+        q = parse_qs(urlsplit(req['url']).query)
+        self.requests.append(q)
+        klines = self.klines()
+        if 'beg' in q:
+            klines = [k for k in klines if k[:10].replace('-', '') >= q['beg'][0]]
+        return {'data': {'name': 'x', 'klines': klines[-int(q['lmt'][0]):]}}
+
+    def full(self):
+        """全量重算, 去掉BOLL不完整的前 window 根"""
+        res_json = {'data': {'name': 'x', 'klines': self.klines()[-500:]}}
+        df, _ = StockKlineRt.get_stock_minutes_rt_parse(res_json, '000001', window=WINDOW)
+        return df.iloc[WINDOW:].reset_index(drop=True)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    s = FakeServer()
+    monkeypatch.setattr(StockKlineRt, 'get_json', classmethod(lambda cls, req, req_tool=None: s.get_json(req)))
+    monkeypatch.setattr(StockKlineRt, 'tail_cache', {})
+    return s
+
+
+def run_steps(server, steps):
+    # 按时间覆盖写入, 模拟库表
+    db = {}
+    df, _ = StockKlineRt.get_stock_minutes_rt_delta('000001', window=WINDOW)
+    db.update((rec['时间'], rec) for rec in df.to_dict('records'))
+    for n, scale in steps:
+        server.n, server.scale = n, scale
+        df, _ = StockKlineRt.get_stock_minutes_rt_delta('000001', window=WINDOW, last_time=max(db))
+        db.update((rec['时间'], rec) for rec in df.to_dict('records'))
+        ref = server.full()
+        got = pd.DataFrame([db[t] for t in ref['时间']])
+        pd.testing.assert_frame_equal(got[ref.columns], ref, check_dtype=False)
+    return db
+
+
+def test_delta_matches_full(server):
+    run_steps(server, [(200, 1.0), (201, 1.0), (203, 1.0), (208, 1.0), (230, 1.0)])
+    # 首次全量, 之后都是增量请求
+    assert 'beg' not in server.requests[0]
+    assert all('beg' in q for q in server.requests[1:])
+
+
+def test_qfq_rescale(server):
+    run_steps(server, [(203, 1.0), (205, 1.0), (210, 0.9), (214, 0.9)])
+    # 复权调整后增量请求的锚点价格对不上, 退回全量, 之后恢复增量
+    assert 'beg' in server.requests[3]
+    assert 'beg' not in server.requests[4]
+    assert 'beg' in server.requests[5]
+
+
+def test_unknown_last_time(server):
+    StockKlineRt.get_stock_minutes_rt_delta('000001', window=WINDOW)
+    server.n = 205
+    df, _ = StockKlineRt.get_stock_minutes_rt_delta('000001', window=WINDOW, last_time='2024-12-31 15:00')
+    assert 'beg' not in server.requests[-1]
+    pd.testing.assert_frame_equal(df[server.full().columns], server.full(), check_dtype=False)
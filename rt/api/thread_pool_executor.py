@@ -8,9 +8,13 @@ import os
 import dotenv
 import sys
 import requests
+from urllib.parse import urlsplit
 
 sys.path.append('..')
 sys.path.append('./..')
+from rt.api.async_fetch import AsyncFetchCore
+from rt.api.push2_host_pool import Push2HostPool
+
 dotenv.load_dotenv()
 server = os.getenv("proxy_server")
 key = os.getenv("proxy_key")
@@ -31,10 +35,66 @@ class ThreadPoolExecutorBase:
 
     proxy_conf = {}
 
+    # 线程池模式的线程数
+    max_workers = 20
+    # 拉数方法有配套的 <方法名>_request / <方法名>_parse 时走 asyncio, 否则走线程池
+    use_async = True
+    # asyncio 模式整批超时秒数, None 不限
+    batch_timeout = None
+
+    @classmethod
+    def get_async_pair(cls, fetch_func):
+        """
+        :return: (request_func, parse_func), 不支持asyncio时返回None
+        """
+        if not cls.use_async or not AsyncFetchCore.available():
+            return None
+        owner = getattr(fetch_func, '__self__', None)
+        name = getattr(fetch_func, '__name__', '')
+        request_func = getattr(owner, name + '_request', None)
+        parse_func = getattr(owner, name + '_parse', None)
+        if request_func is None or parse_func is None:
+            return None
+        return request_func, parse_func
+
+    @classmethod
+    def run_async(cls, pair, args_list, fail_fast):
+        request_func, parse_func = pair
+        coro = AsyncFetchCore.gather(request_func, parse_func, args_list, cls.get_proxy_conf(), fail_fast)
+        res_list = AsyncFetchCore.run(coro, timeout=cls.batch_timeout)
+        return [res_tuple[0] for res_tuple in res_list if res_tuple is not None]
+
+    @classmethod
+    def get_json(cls, req, req_tool=None):
+        """
+        同步请求, 与asyncio模式共用 <方法名>_request 生成的请求
+        :param req: {'url', 'params', 'headers'}
+        :param req_tool: requests.Session() 等, 默认 cls.session 复用连接
+        """
+        req_tool = req_tool or cls.session
+        proxies = cls.get_proxy_conf()
+        host = urlsplit(req['url']).hostname
+        try:
+            r = req_tool.get(req['url'], params=req.get('params'), headers=req.get('headers'), proxies=proxies)
+            data_json = r.json()
+        except Exception as e:
+            Push2HostPool.on_result(host, False, host_fault=not isinstance(e, requests.exceptions.ProxyError))
+            raise
+        # urllib3 连接池累计建连数, 走代理时连接建在代理上, 不统计
+        pool = getattr(r.raw, '_pool', None)
+        if not proxies and pool is not None:
+            Push2HostPool.on_pool_connections(host, pool.num_connections)
+        Push2HostPool.on_result(host, True)
+        return data_json
+
     @classmethod
     def run_by_pool(cls, fetch_func, total_page) -> List[DataFrame]:
+        pair = cls.get_async_pair(fetch_func)
+        if pair:
+            return cls.run_async(pair, [(page_no, ) for page_no in range(1, total_page + 1)], fail_fast=False)
+
         results = []
-        with ThreadPoolExecutor(max_workers=20) as executor:
+        with ThreadPoolExecutor(max_workers=cls.max_workers) as executor:
             # 提交任务到线程池
             futures = [executor.submit(fetch_func, page_no)
                        for page_no in range(1, total_page + 1)]
@@ -50,8 +110,12 @@ class ThreadPoolExecutorBase:
 
     @classmethod
     def run_by_pool_pro(cls, fetch_func, args) -> List[DataFrame]:
+        pair = cls.get_async_pair(fetch_func)
+        if pair:
+            return cls.run_async(pair, [tuple(arg) for arg in args], fail_fast=True)
+
         results = []
-        with ThreadPoolExecutor(max_workers=20) as executor:
+        with ThreadPoolExecutor(max_workers=cls.max_workers) as executor:
             # 提交任务到线程池
             futures = [executor.submit(fetch_func, *arg)
                        for arg in args]
@@ -5,7 +5,6 @@ import hashlib
 import logging
 
 import pandas as pd
-import requests
 import time
 import datetime
 from retrying import retry
@@ -108,7 +107,11 @@ class TXBkStocksRT(ThreadPoolExecutorBase):
         :return: 实时行情 DataFrame、总数
         """
         """https://bisheng.tenpay.com/fcgi-bin/xg_plate_stocks.fcgi?exchange=12&plate_code=01801733&sort_type=1&source=zxg&stocks_type=3&time=1770043389166&user_type=4&sign=e36ba88617a2261b7241c33f515a5264"""
+        data_json = cls.get_json(cls.get_tx_bk_stocks_list_request(plate_code, plate_name), req or cls.session)
+        return cls.get_tx_bk_stocks_list_parse(data_json, plate_code, plate_name)
 
+    @classmethod
+    def get_tx_bk_stocks_list_request(cls, plate_code, plate_name=''):
         params = {
             "exchange": '12',           # 交易所
             "plate_code": plate_code,       # 板块代码
@@ -127,11 +130,10 @@ class TXBkStocksRT(ThreadPoolExecutorBase):
             'Accept': 'application/json, text/javascript, */*; q=0.01',
         }
 
-        if req is None:
-            r = cls.session.get(base_url, params=params, proxies=cls.get_proxy_conf(),headers=headers)
-        else:
-            r = req.get(base_url, params=params, proxies=cls.get_proxy_conf(),headers=headers)
-        data_json = r.json()
+        return {'url': base_url, 'params': params, 'headers': headers}
+
+    @classmethod
+    def get_tx_bk_stocks_list_parse(cls, data_json, plate_code, plate_name=''):
         # print(data_json)
 
         quote_statis = data_json['quote_statis']
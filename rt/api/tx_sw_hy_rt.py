@@ -6,6 +6,7 @@ import requests
 import datetime
 from retrying import retry
 
+from rt.api.field_transform import FieldPlan, Scale
 from rt.api.thread_pool_executor import ThreadPoolExecutorBase
 from rt.api.trading_time_util import get_last_trading_end_time
 
@@ -30,9 +31,9 @@ class TXSwHyRT(ThreadPoolExecutorBase):
     腾讯财经-申万行业板块实时行情
     """
 
-    divide_100_func = lambda x: x / 100
-    divide_10000_func = lambda x: x / 10000  # 成交量单位处理
-    divide_10000_round_func = lambda x: round(x / 10000, 2)  # 成交额/市值单位处理
+    divide_100_func = Scale(100)
+    divide_10000_func = Scale(10000)  # 成交量单位处理
+    divide_10000_round_func = Scale(10000, 2)  # 成交额/市值单位处理
 
     field_config = (
         ('code', '板块代码'),
@@ -58,6 +59,11 @@ class TXSwHyRT(ThreadPoolExecutorBase):
         ('lb', '量比'),
         ('zgb', '个股数量'),
     )
+    numeric_cols = ['最新价', '涨跌额', '涨跌幅', '5日涨跌幅', '20日涨跌幅',
+                    '60日涨跌幅', '年初至今涨跌幅', '换手率', '流通市值',
+                    '总市值', '成交量', '成交额', '主力净流入',
+                    '主力5日净流入', '主力20日净流入', '主力流出', '主力流入',
+                    '涨速', '量比']
 
     @classmethod
     @retry(stop_max_attempt_number=3, wait_fixed=200)
@@ -117,25 +123,8 @@ class TXSwHyRT(ThreadPoolExecutorBase):
             lzg_df.columns = [f'领涨股_{col}' for col in lzg_df.columns]
             temp_df = pd.concat([temp_df.drop('lzg', axis=1), lzg_df], axis=1)
 
-        # 字段重命名
-        column_map = {item[0]: item[1] for item in cls.field_config if item[0] in temp_df.columns}
-        temp_df.rename(columns=column_map, inplace=True)
-
-        # 数值类型转换（必须在应用转换函数之前）
-        numeric_cols = ['最新价', '涨跌额', '涨跌幅', '5日涨跌幅', '20日涨跌幅',
-                        '60日涨跌幅', '年初至今涨跌幅', '换手率', '流通市值',
-                        '总市值', '成交量', '成交额', '主力净流入',
-                        '主力5日净流入', '主力20日净流入', '主力流出', '主力流入',
-                        '涨速', '量比']
-
-        for col in numeric_cols:
-            if col in temp_df.columns:
-                temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
-
-        # 应用转换函数（此时已是数值类型）
-        for item in cls.field_config:
-            if len(item) > 2 and item[1] in temp_df.columns:
-                temp_df[item[1]] = temp_df[item[1]].apply(item[2])
+        # 字段重命名/转数值/缩放
+        temp_df = FieldPlan.compile(cls.field_config, cls.numeric_cols).apply(temp_df, keep=True)
 
         # 处理领涨股_code：新增领涨股_mcode保存原始值，code去掉前两位市场前缀
         if '板块代码' in temp_df.columns:
@@ -154,17 +143,13 @@ class TXSwHyRT(ThreadPoolExecutorBase):
             temp_df['上涨数量'] = pd.to_numeric(temp_df['上涨数量'], errors='coerce')
             temp_df['下跌数量'] = pd.to_numeric(temp_df['下跌数量'], errors='coerce')
             # 计算上涨下跌个数比（下跌为0时固定为999，保留两位小数）
-            temp_df['上涨下跌个数比'] = temp_df.apply(
-                lambda row: 999 if row['下跌数量'] == 0 else round(row['上涨数量'] / row['下跌数量'], 2),
-                axis=1
-            )
+            ratio = (temp_df['上涨数量'] / temp_df['下跌数量']).round(2)
+            temp_df['上涨下跌个数比'] = ratio.where(temp_df['下跌数量'] != 0, 999)
 
         # 计算主力流入流出比（主力流出为0时为空值，保留两位小数）
         if '主力流入' in temp_df.columns and '主力流出' in temp_df.columns:
-            temp_df['主力流入流出比'] = temp_df.apply(
-                lambda row: None if row['主力流出'] == 0 else round(row['主力流入'] / row['主力流出'], 2),
-                axis=1
-            )
+            ratio = (temp_df['主力流入'] / temp_df['主力流出']).round(2)
+            temp_df['主力流入流出比'] = ratio.where(temp_df['主力流出'] != 0)
 
         # 添加交易时间和爬取时间
         temp_df['trade_time'] = get_last_trading_end_time()
@@ -1,5 +1,7 @@
 import time
 
+import pandas as pd
+
 from env import proxy_conf
 from utils.trade_time_util import TradeTimeUtil
 from rt.easyq.astock import get_all_stock_rt
@@ -86,6 +88,15 @@ class ScraperStockKline(StockScraperBase):
         return (f"INSERT OR REPLACE INTO {self.table_name} "
                 f"({col_str}) VALUES ({v_str})")
 
+    def load_tail(self, cursor, code):
+        """库里最近的K线作为增量拉取的尾部缓存, 进程内后续轮次直接用内存缓存"""
+        cursor.execute(f"SELECT trade_time, open, close, high, low, volume, amount, amplitude, "
+                       f"pct_chg, chg_amt, turnover_rate "
+                       f"FROM {self.table_name} WHERE code=? ORDER BY trade_time DESC LIMIT ?",
+                       (code, StockKlineRt.tail_size()))
+        rows = cursor.fetchall()[::-1]
+        StockKlineRt.set_tail(code, self.kline_type, pd.DataFrame(rows, columns=StockKlineRt.col_names))
+
     def fetch_logic(self, code):
         time.sleep(0.05)
         # 1. 查库判断是否需要更新 (复用线程连接)
@@ -115,9 +126,13 @@ class ScraperStockKline(StockScraperBase):
 
         # 2. 发起请求
         # 注意：这里不需要写 try-except，基类的 _worker 会统一处理并重试
-        res = StockKlineRt.get_stock_minutes_rt(code, self.kline_type, req_tool=self.session)
+        # 库里已有数据时只拉取 max_trade_time 之后的K线, 与尾部K线拼接计算BOLL
+        # 复权基准变化等退化为全量拉取时返回全部K线(已去掉前20根), 覆盖库里旧价格
+        if max_trade_time and StockKlineRt.get_tail(code, self.kline_type) is None:
+            self.load_tail(cursor, code)
+        res = StockKlineRt.get_stock_minutes_rt_delta(code, self.kline_type, last_time=max_trade_time,
+                                                      req_tool=self.session)
         df = res[0]
-        df = df.iloc[20:].copy()
         data_list = df.to_dict('records')
         return [(
             i['时间'],
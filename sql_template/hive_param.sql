@@ -3,3 +3,7 @@ set mapred.max.split.size=100000000;
 set mapred.min.split.size=100000000;
 set mapreduce.map.memory.mb=3072;
 set mapreduce.reduce.memory.mb=3072;
+set hive.exec.dynamic.partition=true;
+set hive.exec.dynamic.partition.mode=nonstrict;
+set hive.exec.max.dynamic.partitions=2000;
+set hive.exec.max.dynamic.partitions.pernode=2000;
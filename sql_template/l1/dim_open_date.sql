@@ -113,9 +113,8 @@ from (
             substr(cal_date, 1, 4) as y,
             substr(cal_date, 5, 2) as m,
             substr(cal_date, 7, 2) as d
-        from ods.trade_cal
-        where pt_dt = '9999-01-01'
-            and is_open = 1
+        from ods.trade_cal_latest
+        where is_open = 1
     ) a
 ) t1
 left join (
@@ -137,9 +136,8 @@ left join (
         lead(cal_date, 5) over(order by cal_date asc) next5_date,
         lead(cal_date, 10) over(order by cal_date asc) next10_date,
         lead(cal_date, 20) over(order by cal_date asc) next20_date
-    from ods.trade_cal
-    where pt_dt = '9999-01-01'
-        and is_open=1
+    from ods.trade_cal_latest
+    where is_open=1
 ) t2
 on t1.cal_date = t2.cal_date
 
@@ -56,9 +56,8 @@ from (
             when type = 'N' then '概念'
             when type = 'S' then '特色'
         end as ths_type_str
-    from ods.ths_index
-    where pt_dt = '9999-01-01'
-        and `exchange` = 'A'
+    from ods.ths_index_latest
+    where `exchange` = 'A'
         and (type in ('I', 'N') or ts_code = '883957.TI')
 ) ths
 
@@ -67,9 +66,8 @@ join (
         ts_code as ths_code,
         code as ts_code,
         name as stock_name
-    from ods.ths_member
-    where pt_dt = '9999-01-01'
-        and is_new = 'Y'
+    from ods.ths_member_latest
+    where is_new = 'Y'
 ) rela
     on ths.ths_code = rela.ths_code
 
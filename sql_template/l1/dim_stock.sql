@@ -95,9 +95,8 @@ from (
         list_status,
         list_date,
         if(is_hs in ('H', 'S'), is_hs, null) is_hs
-    from ods.stock_basic
-    where pt_dt = '9999-01-01'
-        and name != '经纬纺机'
+    from ods.stock_basic_latest
+    where name != '经纬纺机'
         and name not like '%退%'
 ) t1
 left join (
@@ -109,8 +108,7 @@ left join (
         website,
         employees,
         main_business
-    from ods.stock_company
-    where pt_dt = '9999-01-01'
+    from ods.stock_company_latest
 ) t2
     on t1.ts_code = t2.ts_code
 left join (
@@ -131,9 +129,8 @@ left join (
             total_mv / 10000.0 as total_mv,
             circ_mv / 10000.0  as circ_mv,
             row_number() over(partition by ts_code order by trade_date desc) r
-        from ods.daily_basic
-        where pt_dt = '9999-01-01'
-            and trade_date > replace(cast(date_sub(current_date(), 30) as string), '-', '')
+        from ods.daily_basic_snap
+        where trade_date > replace(cast(date_sub(current_date(), 30) as string), '-', '')
     ) a where r = 1
 ) t3
     on t1.ts_code = t3.ts_code
@@ -146,8 +143,7 @@ left join (
             end_date,
             coalesce(holder_nums, holder_num) as holder_nums,
             row_number() over(partition by ts_code order by end_date desc) r
-        from ods.stock_holder_num
-        where pt_dt = '9999-01-01'
+        from ods.stock_holder_num_latest
     ) a
     where r = 1
 ) holder
@@ -174,12 +170,10 @@ left join (
             a.name    as ths_name,
             b.code    as ts_code,
             a.type    as ths_type
-        from ods.ths_index a
-        join ods.ths_member b
+        from ods.ths_index_latest a
+        join ods.ths_member_latest b
             on a.ts_code = b.ts_code
         where 1 = 1
-            and a.pt_dt = '0000-01-01'
-            and b.pt_dt = '0000-01-01'
             and a.`exchange` = 'A'
             and a.type in ('I', 'N')
             and b.is_new = 'Y'
@@ -1,5 +1,9 @@
 
+#if $getVar('full_refresh', True)
 drop table if exists l1.fact_stock_daily;
+#end if
+#set $codes = $getVar('ex_rights_codes', [])
+#set $code_list = ', '.join(["'%s'" % c for c in $codes])
 -- ddl
 create table if not exists l1.fact_stock_daily (
     ts_code             string      comment 'TS代码',
@@ -55,10 +59,19 @@ create table if not exists l1.fact_stock_daily (
     vol_real            double       comment '成交量（手）-未复权',
     change_real         double       comment '涨跌额-未复权'
 )  comment '日线行情'
+partitioned by (
+    trade_month         string      comment '交易月份yyyymm'
+)
 stored as orc;
 
 
-insert overwrite table l1.fact_stock_daily
+-- 增量: 只重算 start_month 及之后的月份分区, lookback_month 起读源数据供 lag 窗口使用
+-- 除权除息股票(ex_rights_codes)的前复权价格整体变化, 另重算这些股票的全部历史,
+-- 其所在的更早月份分区整体覆盖, 分区内其他股票的行原样写回
+insert overwrite table l1.fact_stock_daily partition (trade_month)
+select
+    *
+from (
 select
     t1.ts_code,
     dim_stock.name,
@@ -115,20 +128,28 @@ select
     t1.close as close_real,
     t1.pre_close as preclose_real,
     t1.vol as vol_real,
-    t1.change as change_real
+    t1.change as change_real,
+    substr(t1.trade_date, 1, 6) as trade_month
 
 from (
     select *
-    from ods.daily
-    where pt_dt = '9999-01-01'
-        and ts_code != 'ts_code'
+    from ods.daily_snap
+    where ts_code != 'ts_code'
         and trade_date != 'trade_date'
+        and (trade_date >= '${getVar('lookback_month', '')}'
+#if $codes
+            or ts_code in ($code_list)
+#end if
+        )
 ) t1
 
 left join (
     select *
-    from ods.daily_basic
-    where pt_dt = '9999-01-01'
+    from ods.daily_basic_snap
+    where trade_date >= '${getVar('lookback_month', '')}'
+#if $codes
+        or ts_code in ($code_list)
+#end if
 ) t2
     on t1.ts_code = t2.ts_code
     and t1.trade_date = t2.trade_date
@@ -145,14 +166,12 @@ left join (
         select ts_code,
                 trade_date,
                 adj_factor
-        from ods.adj_factor
-        where pt_dt = '9999-01-01'
+        from ods.adj_factor_snap
      ) a left join (
          select
             ts_code,
             max(adj_factor) last_factor
-         from ods.adj_factor
-         where pt_dt = '9999-01-01'
+         from ods.adj_factor_snap
          group by
             ts_code
     ) b
@@ -160,3 +179,22 @@ left join (
 ) adj
     on t1.ts_code = adj.ts_code
     and t1.trade_date = adj.trade_date
+) t
+where trade_month >= '${getVar('start_month', '')}'
+#if $codes
+    or ts_code in ($code_list)
+
+union all
+
+select
+    *
+from l1.fact_stock_daily
+where trade_month < '${getVar('start_month', '')}'
+    and ts_code not in ($code_list)
+    and trade_month in (
+        select distinct substr(trade_date, 1, 6)
+        from ods.daily_snap
+        where ts_code in ($code_list)
+            and trade_date < '${getVar('start_month', '')}'
+    )
+#end if
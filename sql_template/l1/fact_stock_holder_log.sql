@@ -42,8 +42,7 @@ join (
             end_date,
             coalesce(holder_nums, holder_num) as holder_nums,
             row_number() over(partition by ts_code order by end_date desc) r
-        from ods.stock_holder_num
-        where pt_dt = '9999-01-01'
+        from ods.stock_holder_num_latest
     ) a
 ) holder
     on dim.ts_code = holder.ts_code
@@ -1,5 +1,9 @@
 
+#if $getVar('full_refresh', True)
 drop table if exists l1.fact_stock_money_flow;
+#end if
+#set $codes = $getVar('ex_rights_codes', [])
+#set $code_list = ', '.join(["'%s'" % c for c in $codes])
 
 create table if not exists l1.fact_stock_money_flow (
     ts_code             string      comment 'TS代码',
@@ -50,9 +54,17 @@ create table if not exists l1.fact_stock_money_flow (
     net_in_amount       double       comment '净流入额（万元）',
     trade_count         int         comment '交易笔数'
 )  comment '个股资金流向 小单：5万以下 中单：5～20万 大单：20～100万 特大单：>=100万'
+partitioned by (
+    trade_month         string      comment '交易月份yyyymm'
+)
 stored as orc;
 
-insert overwrite table l1.fact_stock_money_flow
+-- 增量: 只重算 start_month 及之后的月份分区, lookback_month 起读源数据供近10日窗口使用
+-- close_qfq 取自 fact_stock_daily, 除权除息股票(ex_rights_codes)同样重算全部历史, 更早月份分区内其他股票的行原样写回
+insert overwrite table l1.fact_stock_money_flow partition (trade_month)
+select
+    *
+from (
 select
     ts_code,
     trade_date,
@@ -99,7 +111,8 @@ select
     net_in_gte_lg_vol,
     net_in_vol,
     net_in_amount,
-    trade_count
+    trade_count,
+    substr(trade_date, 1, 6) as trade_month
 from (
     select
         a.ts_code,
@@ -145,12 +158,40 @@ from (
         net_mf_amount as net_in_amount,
         trade_count
     from (
-        select * from ods.money_flow
-        where pt_dt = '9999-01-01'
+        select * from ods.money_flow_snap
+        where trade_date >= '${getVar('lookback_month', '')}'
+#if $codes
+            or ts_code in ($code_list)
+#end if
     ) a
     left join l1.dim_stock stock
         on a.ts_code = stock.ts_code
-    left join l1.fact_stock_daily daily
+    left join (
+        select * from l1.fact_stock_daily
+        where trade_month >= '${getVar('lookback_month', '')}'
+#if $codes
+            or ts_code in ($code_list)
+#end if
+    ) daily
         on a.ts_code = daily.ts_code
         and a.trade_date = daily.trade_date
-) t
\ No newline at end of file
+) t
+) tt
+where trade_month >= '${getVar('start_month', '')}'
+#if $codes
+    or ts_code in ($code_list)
+
+union all
+
+select
+    *
+from l1.fact_stock_money_flow
+where trade_month < '${getVar('start_month', '')}'
+    and ts_code not in ($code_list)
+    and trade_month in (
+        select distinct substr(trade_date, 1, 6)
+        from ods.money_flow_snap
+        where ts_code in ($code_list)
+            and trade_date < '${getVar('start_month', '')}'
+    )
+#end if
@@ -1,5 +1,7 @@
 
+#if $getVar('full_refresh', True)
 drop table if exists l1.fact_ths_daily;
+#end if
 -- ddl
 create table if not exists l1.fact_ths_daily (
 
@@ -27,10 +29,14 @@ create table if not exists l1.fact_ths_daily (
     `pb_mrq`        double       comment 'PB MRQ'
 
 )  comment '同花顺概念行情'
+partitioned by (
+    trade_month     string      comment '交易月份yyyymm'
+)
 stored as orc;
 
 
-insert overwrite table l1.fact_ths_daily
+-- 增量: 只重算 start_month 及之后的月份分区
+insert overwrite table l1.fact_ths_daily partition (trade_month)
 select
     daily.trade_date,
     dim.ths_code,
@@ -52,7 +58,8 @@ select
     daily.`total_mv`,
     daily.`float_mv`,
     daily.`pe_ttm`,
-    daily.`pb_mrq`
+    daily.`pb_mrq`,
+    substr(daily.trade_date, 1, 6) as trade_month
 from (
     select
         ts_code as ths_code,
@@ -65,14 +72,13 @@ from (
             when type = 'N' then '概念'
             when type = 'S' then '特色'
         end as ths_type_str
-    from ods.ths_index
-    where pt_dt = '9999-01-01'
-        and `exchange` = 'A'
+    from ods.ths_index_latest
+    where `exchange` = 'A'
         and type not in ('R', 'S')
 ) dim
 join (
     select *
-    from ods.ths_daily
-    where pt_dt = '9999-01-01'
+    from ods.ths_daily_latest
+    where trade_date >= '${getVar('start_month', '')}'
 ) daily
     on dim.ths_code = daily.ts_code
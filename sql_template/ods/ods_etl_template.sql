@@ -1,10 +1,99 @@
 
+#set $snapshot = $getVar('file_format', 'text') == 'parquet' and $getVar('snapshot_by_partition', False)
+## 日期分区保留天数, 至少保留当天
+#set $expire_date = $now.delta(max(int($getVar('retention_days', 10)), 1)).date
 -- ods
+#if not $snapshot
 create table if not exists ods.${table_name} like ods_incr.${table_name} stored as orc;
+-- 最新全量视图, 指向最近一次成功合并的日期分区; 首次创建时指向旧的 0000-01-01 全量分区
+create view if not exists ods.${table_name}_latest as
+select * from ods.${table_name} where pt_dt = '0000-01-01';
+#end if
 
+#if $getVar('file_format', 'text') == 'parquet'
+-- parquet增量外部表, 按${partition_col}分区, load只搬文件不解析文本
+create database if not exists ods_incr_pq;
+create external table if not exists ods_incr_pq.${table_name} (
+    ${pq_cols}
+)
+partitioned by (
+    pt_dt   string  comment '分区时间yyyy-mm-dd',
+    ${partition_col}  string
+) stored as parquet
+tblproperties ('parquet.compression'='SNAPPY', 'external.table.purge'='true');
+
+-- load data, hs2 执行时路径为上传后的HDFS路径(load_local为空)
+#for $p in $partition_list
+load data ${getVar('load_local', 'local')} inpath '${data_dir}/${partition_col}=${p}' into table ods_incr_pq.${table_name} partition (pt_dt='${now}', ${partition_col}='${p}');
+#end for
+#else
 -- load data
-load data local inpath '${data_file_path}' into table ods_incr.${table_name} partition (pt_dt='${now}');
+load data ${getVar('load_local', 'local')} inpath '${data_file_path}' into table ods_incr.${table_name} partition (pt_dt='${now}');
+#end if
+
+#if $snapshot
+-- 初始化时一次写入全部历史${partition_col}(daily约8000个), 大批量回补同理, 默认2000个动态分区上限不够
+set hive.exec.max.dynamic.partitions=20000;
+set hive.exec.max.dynamic.partitions.pernode=20000;
+set hive.exec.max.created.files=200000;
+
+-- 快照表按${partition_col}分区, 只重写本次增量涉及的分区, 读写量与增量成正比, 与历史总量无关
+create table if not exists ods.${table_name}_snap (
+    ${pq_cols}
+)
+partitioned by (
+    ${partition_col}  string
+) stored as orc;
+
+#if $getVar('snap_init', False)
+-- 首次启用: 由旧的全量分区初始化快照, 只补快照中还没有的分区, 重复执行不会覆盖已upsert的分区
+-- 新环境没有旧的全量表时建空表, 快照从当天增量开始
+create table if not exists ods.${table_name} like ods_incr.${table_name} stored as orc;
+insert overwrite table ods.${table_name}_snap partition (${partition_col})
+select
+    ${pq_col_names}, ${partition_col}
+from ods.${table_name}
+where pt_dt = '0000-01-01'
+    and ${partition_col} not in (select distinct ${partition_col} from ods.${table_name}_snap)
+distribute by ${partition_col}
+;
+
+#else
+-- 快照为空时直接失败, 避免L1读到空表; 快照表被重建等情况用 ods_runner --snap_init 重新初始化
+select assert_true(count(1) > 0) from ods.${table_name}_snap;
+
+#end if
+#if $partition_list
+#set $snap_in = ', '.join(["'%s'" % p for p in $partition_list])
+-- upsert
+insert overwrite table ods.${table_name}_snap partition (${partition_col})
+select
+    ${pq_col_names}, ${partition_col}
+from (
+    select
+        *,
+        row_number() over(partition by ${unique_cols} order by pt_dt desc) r
+    from (
+        select
+            ${pq_col_names}, ${partition_col}, pt_dt
+        from ods_incr_pq.${table_name}
+        where pt_dt >= '${now.date}'
+            and ${partition_col} in (${snap_in})
+
+        union all
+        select
+            ${pq_col_names}, ${partition_col}, '0000-01-01' as pt_dt
+        from ods.${table_name}_snap
+        where ${partition_col} in (${snap_in})
+    ) t
+) tt
+where r = 1
+;
+#end if
 
+alter table ods_incr.${table_name} drop if exists partition(pt_dt<='${expire_date}');
+alter table ods_incr_pq.${table_name} drop if exists partition(pt_dt<='${expire_date}');
+#else
 -- dml
 insert overwrite table ods.${table_name} partition (pt_dt='${now.date}')
 select
@@ -14,6 +103,17 @@ from (
         *,
         row_number() over(partition by ${unique_cols} order by pt_dt desc) r
     from (
+#if $getVar('file_format', 'text') == 'parquet'
+        select
+            ${cols}, pt_dt
+        from ods_incr_pq.${table_name}
+        where pt_dt >= '${now.date}'
+
+        union all
+        select
+            ${cols}, pt_dt
+        from ods.${table_name}_latest
+#else
         select
             *
         from ods_incr.${table_name}
@@ -22,20 +122,24 @@ from (
         union all
         select
             *
-        from ods.${table_name}
-        where pt_dt = '0000-01-01'
+        from ods.${table_name}_latest
+#end if
     ) t
 ) tt
 where r = 1
 ;
 
-insert overwrite table ods.${table_name} partition (pt_dt='0000-01-01')
-select ${cols} from ods.${table_name} where pt_dt = '${now.date}';
-
-insert overwrite table ods.${table_name} partition (pt_dt='9999-01-01')
-select ${cols} from ods.${table_name} where pt_dt = '${now.date}';
-
-alter table ods.${table_name} drop if exists partition(pt_dt<='${now.delta(10).date}', pt_dt>'0000-01-01' );
-alter table ods_incr.${table_name} drop if exists partition(pt_dt<='${now.delta(10).date}', pt_dt>'0000-01-01' );
-
+-- 全量只写一份, 最新视图切到当天分区
+drop view if exists ods.${table_name}_latest;
+create view ods.${table_name}_latest as
+select * from ods.${table_name} where pt_dt = '${now.date}';
 
+-- ${expire_date} 之后的日期分区保留为历史; 旧的 0000-01-01/9999-01-01 全量副本已由视图替代
+alter table ods.${table_name} drop if exists partition(pt_dt='0000-01-01');
+alter table ods.${table_name} drop if exists partition(pt_dt='9999-01-01');
+alter table ods.${table_name} drop if exists partition(pt_dt<='${expire_date}');
+alter table ods_incr.${table_name} drop if exists partition(pt_dt<='${expire_date}');
+#if $getVar('file_format', 'text') == 'parquet'
+alter table ods_incr_pq.${table_name} drop if exists partition(pt_dt<='${expire_date}');
+#end if
+#end if
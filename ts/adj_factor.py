@@ -8,7 +8,14 @@ class AdjFactor(BaseTask):
 
     DATA_FILE = 'adj_factor.csv'
     SQL_FILE = 'adj_factor.sql'
-    SLEEP_SECONDS = 0.2
+    API_NAME = 'adj_factor'
+    RATE_LIMIT = 300
+    FILE_FORMAT = 'parquet'
+    SNAPSHOT_BY_PARTITION = True
+    # 数据源对最近几日有延迟修正, 已入ODS的最近3个交易日每次重拉
+    LOOKBACK_DAYS = 3
+    # 单次最多6000行, 补数时按区间拉取
+    ROW_LIMIT = 6000
 
     @classmethod
     def run(cls):
@@ -17,11 +24,37 @@ class AdjFactor(BaseTask):
     @classmethod
     def get_df(cls, *args, **kwargs):
         dt = kwargs['dt']
+        return cls.query(trade_date=dt)
+
+    @classmethod
+    def get_range_df(cls, start_date, end_date, ts_code=''):
+        return cls.query(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+    @classmethod
+    def ex_rights_codes(cls, start_date, end_date):
+        """
+        start_date 到 end_date 之间发生除权除息(复权因子变化)的股票
+        比较 end_date 与 start_date 前一个交易日的因子, 只需两次调用
+        :param start_date: yyyymmdd
+        :param end_date: yyyymmdd
+        """
+        calendar = sorted(str(i) for i in cls.get_date_df()['cal_date'])
+        prev_list = [dt for dt in calendar if dt < str(start_date)]
+        if not prev_list:
+            return []
+        cls.configure_rate_limit()
+        prev_df = cls.get_df(dt=prev_list[-1])
+        last_df = cls.get_df(dt=str(end_date))
+        df = last_df.merge(prev_df, on='ts_code', suffixes=('', '_prev'))
+        return df[df['adj_factor'] != df['adj_factor_prev']]['ts_code'].to_list()
+
+    @classmethod
+    def query(cls, ts_code='', trade_date='', start_date='', end_date=''):
         return cls.pro.adj_factor(**{
-                "ts_code": "",
-                "trade_date": dt,
-                "start_date": "",
-                "end_date": "",
+                "ts_code": ts_code,
+                "trade_date": trade_date,
+                "start_date": start_date,
+                "end_date": end_date,
                 "limit": "",
                 "offset": ""
             }, fields=[
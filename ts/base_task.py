@@ -2,15 +2,23 @@
 
 import os
 import sys
-import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append('..')
 from utils.ts_util import pro
+from utils.rate_limiter import RateLimiter
 from utils.path_util import PathUtil
 from utils.template_util import TemplateUtil
+from utils.sql_executor import SqlExecutor
 from utils.local_dim_util import LocalDimUtil
-from functools import reduce
-from utils.local_pick_util import LocalPickleUtil
+from utils.ingest_ledger import IngestLedger
+from utils.data_manifest import DataManifest
+from utils.hive_resource import HiveResourceAdvisor
+from utils.now import Now
+from utils.progress import Progress
+from utils.parquet_util import ParquetUtil
+from utils.chunk_writer import TextChunkWriter, ParquetChunkWriter
 import pandas as pd
 
 
@@ -18,7 +26,34 @@ class BaseTask(object):
 
     DATA_FILE = 'base'
     SQL_FILE = 'base'
-    SLEEP_SECONDS = 0.1
+    # tushare接口名及每分钟调用次数, RATE_LIMIT为None时按 TS_API_QUOTA
+    API_NAME = None
+    RATE_LIMIT = None
+    # 并发拉数线程数
+    MAX_WORKERS = 4
+    # 落地文件格式 text/parquet, parquet按PARTITION_COL分区
+    FILE_FORMAT = 'text'
+    PARTITION_COL = 'trade_date'
+    # parquet格式时ODS改为维护按PARTITION_COL分区的快照表 ods.<table>_snap, 只upsert增量涉及的分区
+    SNAPSHOT_BY_PARTITION = False
+    # 强制由旧的全量分区初始化快照表(快照表被重建时), 由 ods_runner --snap_init 设置; 本机首次启用时自动初始化
+    SNAP_INIT = False
+    # ODS日期分区(pt_dt)保留天数, 最新全量通过视图 ods.<table>_latest 读取
+    RETENTION_DAYS = 10
+    # 单个落地文件最大行数, 每个文件落盘即为一个断点
+    SLICE_ROWS = 200000
+    # 按股票拉数时单只股票失败重试次数
+    RETRY_TIMES = 2
+    # 接口单次返回行数上限, 设置后需实现get_range_df, 由plan_fetch选择按日/区间/按股票拉取
+    ROW_LIMIT = None
+    # 每个交易日行数估计, None时按股票数
+    ROWS_PER_DATE = None
+    # 已入ODS的最近N个交易日仍重拉, 覆盖数据源的延迟修正, 按日拉数的行情类任务单独设置
+    LOOKBACK_DAYS = 0
+    # offset分页接口每页行数, 设置后需实现get_page_df, run_no_dt改为并发分页拉取
+    PAGE_LIMIT = None
+    # 是否同时保存一份完整数据到 ./data/DATA_FILE (带表头)
+    LOCAL_COPY = False
     pro = pro
 
     @classmethod
@@ -28,129 +63,398 @@ class BaseTask(object):
     @classmethod
     def run_by_dt(cls, check_cache=True):
         total_num = cls.save_data_by_dt(check_cache)
-        if total_num:
-            cls.render_and_exec()
+        return cls.load_and_mark(total_num)
 
     @classmethod
     def run_by_stock(cls):
         total_num = cls.save_data_by_stock()
-        if total_num:
-            cls.render_and_exec()
+        return cls.load_and_mark(total_num)
+
+    @classmethod
+    def load_and_mark(cls, total_num):
+        """有新数据或当天有未入ODS的落地文件时执行sql, 成功后台账标记为loaded"""
+        with IngestLedger(cls) as ledger:
+            if not total_num and not ledger.has_unloaded():
+                print(f'{cls.__name__} nothing to load.')
+                return 0
+            exit_code = cls.render_and_exec()
+            if exit_code == 0:
+                ledger.mark_loaded()
+        return exit_code
 
     @classmethod
     def run_no_dt(cls):
-        df = cls.get_df()
-        cls.save_to_csv(df)
-        cls.render_and_exec()
+        cls.configure_rate_limit()
+        if cls.PAGE_LIMIT:
+            cls.save_data_by_page()
+        else:
+            df = cls.get_df()
+            cls.save_to_file(df)
+        return cls.render_and_exec()
 
     @classmethod
     def get_df(cls, *args, **kwargs):
         raise NotImplementedError
 
+    @classmethod
+    def get_range_df(cls, start_date, end_date, ts_code=''):
+        raise NotImplementedError
+
+    @classmethod
+    def get_page_df(cls, limit, offset):
+        raise NotImplementedError
+
     @classmethod
     def get_date_df(cls):
         return LocalDimUtil.get_date_df()
 
+    @classmethod
+    def configure_rate_limit(cls):
+        if cls.API_NAME and cls.RATE_LIMIT:
+            RateLimiter.configure(cls.API_NAME, cls.RATE_LIMIT)
+
+    @classmethod
+    def get_df_or_none(cls, **kwargs):
+        """重试RETRY_TIMES次仍失败返回None, 不中断整批任务"""
+        for i in range(cls.RETRY_TIMES + 1):
+            try:
+                return cls.get_df(**kwargs)
+            except Exception as e:
+                print(f'{cls.__name__} {kwargs} retry:{i} error:{e}')
+        return None
+
+    @classmethod
+    def fetch_in_order(cls, key, value_list, skip_error=False, func=None):
+        """
+        多线程调用get_df, 按value_list顺序返回结果, 限流由 RateLimitedPro 按接口控制
+        :param key: get_df参数名, dt/ts_code
+        :param value_list: 参数值列表
+        :param skip_error: True时失败的值返回 (value, None), 否则抛出异常
+        :param func: 替代get_df的拉数方法
+        :return: 迭代器 (value, df)
+        """
+        cls.configure_rate_limit()
+        if func is None:
+            func = cls.get_df_or_none if skip_error else cls.get_df
+        window = cls.MAX_WORKERS * 2
+        with ThreadPoolExecutor(max_workers=cls.MAX_WORKERS) as executor:
+            futures = deque()
+            for value in value_list:
+                futures.append((value, executor.submit(func, **{key: value})))
+                # 控制在途任务数, 避免结果堆积在内存
+                if len(futures) >= window:
+                    v, f = futures.popleft()
+                    yield v, f.result()
+            while futures:
+                v, f = futures.popleft()
+                yield v, f.result()
+
+    @classmethod
+    def get_writer(cls, on_rotate=None):
+        """流式落地, 每个df到达即写入, 满SLICE_ROWS滚动新文件"""
+        if cls.FILE_FORMAT == 'parquet':
+            return ParquetChunkWriter(cls.DATA_FILE, cls.PARTITION_COL, cls.SLICE_ROWS, on_rotate)
+        return TextChunkWriter(cls.DATA_FILE, cls.SLICE_ROWS, on_rotate)
+
+    @classmethod
+    def split_dates(cls, idx_list, calendar, max_len):
+        """交易日下标切成连续且不超过max_len天的区间"""
+        chunks = []
+        chunk = []
+        prev = None
+        for i in idx_list:
+            if chunk and (i != prev + 1 or len(chunk) >= max_len):
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(calendar[i])
+            prev = i
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    @classmethod
+    def plan_fetch(cls, date_list, calendar):
+        """
+        按缺失的 (股票 x 日期) 区域选调用次数最少的拉取方式
+        :param date_list: 缺失的交易日
+        :param calendar: 全部交易日, 升序
+        :return: (shape, chunk_list)
+            dt: 每日一次, chunk为日期
+            range: 全市场按日期区间, 每次不超过 ROW_LIMIT // ROWS_PER_DATE 天
+            stock: 每只股票按日期区间, 每次不超过 ROW_LIMIT 天
+        """
+        if not cls.ROW_LIMIT or len(date_list) <= 1:
+            return 'dt', date_list
+
+        stock_list = LocalDimUtil.get_stock_df()['ts_code'].to_list()
+        rows_per_date = cls.ROWS_PER_DATE or len(stock_list)
+        pos = {dt: i for i, dt in enumerate(calendar)}
+        idx_list = sorted(pos[dt] for dt in date_list)
+
+        # 返回行数等于上限时无法区分是否截断, 按上限-1规划
+        cap = cls.ROW_LIMIT - 1
+        range_chunks = cls.split_dates(idx_list, calendar, max(1, cap // rows_per_date))
+        span = calendar[idx_list[0]: idx_list[-1] + 1]
+        span_chunks = [span[i: i + cap] for i in range(0, len(span), cap)]
+        calls = {
+            'dt': len(date_list),
+            'range': len(range_chunks),
+            'stock': len(stock_list) * len(span_chunks),
+        }
+        shape = min(calls, key=calls.get)
+        print(f'{cls.__name__} plan:{shape}, calls:{calls}')
+
+        if shape == 'range':
+            return shape, [{'ts_code': '', 'dates': c} for c in range_chunks]
+        if shape == 'stock':
+            return shape, [{'ts_code': code, 'dates': c} for code in stock_list for c in span_chunks]
+        return shape, date_list
+
+    @classmethod
+    def get_chunk_df(cls, chunk):
+        """按区间拉取, 返回行数达到ROW_LIMIT说明被截断, 区间对半拆分重拉"""
+        dates = chunk['dates']
+        df = cls.get_range_df(start_date=str(dates[0]), end_date=str(dates[-1]), ts_code=chunk['ts_code'])
+        if df.shape[0] >= cls.ROW_LIMIT and len(dates) > 1:
+            mid = len(dates) // 2
+            return pd.concat([cls.get_chunk_df(dict(chunk, dates=dates[:mid])),
+                              cls.get_chunk_df(dict(chunk, dates=dates[mid:]))], ignore_index=True)
+        return df
+
     @classmethod
     def save_data_by_dt(cls, check_cache=True):
 
-        cache = LocalPickleUtil(cls)
-        date_df = cls.get_date_df()
+        with IngestLedger(cls) as ledger:
+            date_df = cls.get_date_df()
+
+            calendar = sorted(date_df['cal_date'].to_list())
+            date_list = calendar
+            if check_cache:
+                date_list = ledger.missing(calendar, cls.LOOKBACK_DAYS)
+            print(f'{cls.__name__} calendar:{len(calendar)}, missing:{len(date_list)}')
+
+            shape, chunk_list = cls.plan_fetch(date_list, calendar)
+            if shape != 'dt':
+                return cls.save_data_by_range(ledger, shape, chunk_list, date_list)
+
+            # 文件落盘后再commit台账, 保证台账中完成的日期都已写入文件
+            data_dates = set()
+            with cls.get_writer(on_rotate=lambda keys: ledger.commit()) as writer:
+                for dt, df in cls.fetch_in_order('dt', date_list):
+                    if df.shape[0] == 0:
+                        continue
+                    ledger.record(dt, df=df)
+                    data_dates.add(str(dt))
+                    writer.write(df, dt)
+                    print(f'{cls.__name__} dt:{dt}, cache_num:{writer.rows}')
 
-        date_list = date_df['cal_date'].to_list()
+            cls.record_empty(ledger, date_list, data_dates)
+            return writer.total_rows
 
-        df_list = []
-        dt_list = []
-        num = 0
-        total_num = 0
+    @classmethod
+    def record_empty(cls, ledger, date_list, data_dates):
+        """
+        最晚有数据的日期之前返回为空的日期记0行, 之后不再重拉; 最晚日期之后的可能是数据还未发布, 下次仍拉取
+        :param data_dates: 有数据的日期 yyyymmdd
+        """
+        if not data_dates:
+            return
+        last = max(data_dates)
         for dt in date_list:
-            if check_cache:
-                if cache.check_pickle_exist(dt):
+            if str(dt) < last and str(dt) not in data_dates:
+                ledger.record(dt, row_count=0)
+        ledger.commit()
+
+    @classmethod
+    def save_data_by_range(cls, ledger, shape, chunk_list, date_list):
+        """按区间拉取的结果按PARTITION_COL过滤到缺失日期, 写入同样的落地文件"""
+        date_set = set(str(i) for i in date_list)
+        row_count = Counter()
+        data_dates = set()
+        progress = Progress(len(chunk_list))
+        with cls.get_writer(on_rotate=lambda keys: ledger.commit()) as writer:
+            for chunk, df in cls.fetch_in_order('chunk', chunk_list, func=cls.get_chunk_df):
+                progress.step()
+                df = df[df[cls.PARTITION_COL].astype(str).isin(date_set)]
+                if df.shape[0] == 0:
                     continue
+                if shape == 'range':
+                    for dt, dt_df in df.groupby(cls.PARTITION_COL):
+                        ledger.record(dt, df=dt_df)
+                        data_dates.add(str(dt))
+                    writer.write(df, chunk['dates'][0])
+                else:
+                    row_count.update(df[cls.PARTITION_COL].astype(str).value_counts().to_dict())
+                    writer.write(df, chunk['ts_code'])
+                print(f'{cls.__name__} {chunk["ts_code"]}{chunk["dates"][0]}-{chunk["dates"][-1]}, '
+                      f'cache_num:{writer.rows}, {progress}')
 
-            df = cls.get_df(dt=dt)
-            if cls.SLEEP_SECONDS:
-                time.sleep(cls.SLEEP_SECONDS)
-            df_list.append(df)
-            dt_list.append(dt)
-            if df.shape[0] > 0:
-                cache.add_pickle(dt)
-            else:
-                continue
-
-            num += df.shape[0]
-            total_num += df.shape[0]
-            print(f'{cls.__name__} dt:{dt}, cache_num:{num}')
-
-            if num >= 200000:
-                cls.slice_save_to_csv(data_df_list=df_list, dt_list=dt_list, cache=cache)
-                del df_list
-                del dt_list
-                df_list = []
-                dt_list = []
-                num = 0
-        if df_list:
-            cls.slice_save_to_csv(data_df_list=df_list, dt_list=dt_list, cache=cache)
-
-        return total_num
+        # 按股票拉取时全部股票完成后日期才完整
+        for dt, num in row_count.items():
+            ledger.record(dt, row_count=num)
+        ledger.commit()
+        cls.record_empty(ledger, date_list, data_dates | set(row_count))
+        return writer.total_rows
 
     @classmethod
     def save_data_by_stock(cls):
-        stock_df = LocalDimUtil.get_stock_df()
-        stock_list = stock_df['ts_code'].to_list()
-
-        df_list = []
-        dstock_list = []
-        num = 0
-        total_num = 0
-        for ts_code in stock_list:
-            df = cls.get_df(ts_code=ts_code)
-            if cls.SLEEP_SECONDS:
-                time.sleep(cls.SLEEP_SECONDS)
-            df_list.append(df)
-            dstock_list.append(ts_code)
-            num += df.shape[0]
-            total_num += df.shape[0]
-            print(f'{cls.__name__} ts_code:{ts_code}, cache_num:{num}')
-
-            if num >= 200000:
-                cls.slice_save_to_csv(data_df_list=df_list, dt_list=dstock_list)
-                del df_list
-                del dstock_list
-                df_list = []
-                dstock_list = []
-                num = 0
-        if df_list:
-            cls.slice_save_to_csv(data_df_list=df_list, dt_list=dstock_list)
-
-        return total_num
-
-    @classmethod
-    def save_to_csv(cls, df, suffix=None):
-        file_name = PathUtil.get_data_file_name(cls.DATA_FILE, suffix)
-        df.to_csv(file_name, sep='\u0001', index=False, header=False)
-        print(f'{cls.__name__} suffix:{suffix} save to {file_name}.')
-
-    @classmethod
-    def slice_save_to_csv(cls, data_df_list, dt_list, cache=None):
-        res = reduce(lambda x, y: pd.concat([x, y]) if x is not None else y, data_df_list, None)
-        suf = str(dt_list[-1]) + '_' + str(dt_list[0])
-
-        cls.save_to_csv(res, suf)
-        del res
-        if cache:
-            cache.commit()
+        """
+        按股票并发拉全量, 台账按 (ts_code, 当天) 记录, 每个落地文件滚动即checkpoint
+        中断或部分失败后重跑只拉当天未完成的股票
+        股票列表含退市/暂停上市的股票(StockBasic.LIST_STATUS), 当天标记完成时历史数据已全部覆盖
+        """
+        with IngestLedger(cls) as ledger:
+            today = Now().datekey
+            stock_df = LocalDimUtil.get_stock_df()
+            stock_list = [i for i in stock_df['ts_code'].to_list() if not ledger.exists(today, i)]
+            print(f'{cls.__name__} stock total:{stock_df.shape[0]}, todo:{len(stock_list)}')
+
+            progress = Progress(len(stock_list))
+            failed_list = []
+            with cls.get_writer(on_rotate=lambda keys: ledger.commit()) as writer:
+                for ts_code, df in cls.fetch_in_order('ts_code', stock_list, skip_error=True):
+                    progress.step()
+                    if df is None:
+                        failed_list.append(ts_code)
+                        continue
+                    ledger.record(today, ts_code, df)
+                    if df.shape[0] > 0:
+                        writer.write(df, ts_code)
+                    print(f'{cls.__name__} ts_code:{ts_code}, cache_num:{writer.rows}, {progress}')
+            ledger.commit()
+
+            if failed_list:
+                raise RuntimeError(f'{cls.__name__} {len(failed_list)} stocks failed, '
+                                   f'rerun to resume: {failed_list[:20]}')
+            return writer.total_rows
+
+    @classmethod
+    def fetch_pages(cls):
+        """
+        并发分页: 每轮并发拉MAX_WORKERS页, 出现不满一页即到末尾
+        :return: 迭代器 (offset, df), 按offset顺序
+        """
+        wave = cls.MAX_WORKERS
+        offset = 0
+        while True:
+            offset_list = [offset + i * cls.PAGE_LIMIT for i in range(wave)]
+            is_end = False
+            for page_offset, df in cls.fetch_in_order('offset', offset_list, func=cls.get_page):
+                if is_end:
+                    continue
+                yield page_offset, df
+                is_end = df.shape[0] < cls.PAGE_LIMIT
+            if is_end:
+                return
+            offset += wave * cls.PAGE_LIMIT
+
+    @classmethod
+    def get_page(cls, offset):
+        df = cls.get_page_df(limit=cls.PAGE_LIMIT, offset=offset)
+        print(f'{cls.__name__} limit:{cls.PAGE_LIMIT}, offset:{offset}, rows:{df.shape[0]}')
+        return df
+
+    @classmethod
+    def save_data_by_page(cls):
+        """分页结果逐页写入落地文件, LOCAL_COPY时同时写 ./data 下的完整副本"""
+        local_file = './data/' + cls.DATA_FILE
+        local_fp = open(local_file + '.tmp', 'w', encoding='utf-8') if cls.LOCAL_COPY else None
+        with cls.get_writer() as writer:
+            for offset, df in cls.fetch_pages():
+                if df.shape[0] == 0:
+                    continue
+                writer.write(df, offset)
+                if local_fp:
+                    df.to_csv(local_fp, sep='\u0001', index=False, header=offset == 0)
+        if local_fp:
+            local_fp.close()
+            os.replace(local_file + '.tmp', local_file)
+        return writer.total_rows
+
+    @classmethod
+    def save_to_file(cls, df, suffix=None):
+        with cls.get_writer() as writer:
+            writer.write(df, suffix)
+
+    @classmethod
+    def get_search_list(cls, path):
+        """
+        :param path: parquet为数据集目录, 文本为落地文件路径
+        """
+        if cls.FILE_FORMAT == 'parquet':
+            return {
+                'file_format': 'parquet',
+                'data_dir': path,
+                'partition_col': cls.PARTITION_COL,
+                'partition_list': ParquetUtil.list_partitions(path, cls.PARTITION_COL),
+                'pq_cols': ParquetUtil.hive_columns(path),
+                'pq_col_names': ParquetUtil.column_names(path),
+                'snapshot_by_partition': cls.SNAPSHOT_BY_PARTITION,
+                'snap_init': cls.SNAP_INIT,
+                'retention_days': cls.RETENTION_DAYS,
+            }
+        return {'data_file_path': path, 'retention_days': cls.RETENTION_DAYS}
+
+    @classmethod
+    def plan_search_list(cls):
+        """预渲染用, 按落地文件的默认位置生成参数"""
+        if cls.FILE_FORMAT == 'parquet':
+            return cls.get_search_list(PathUtil.get_data_dir_name(cls.DATA_FILE))
+        return cls.get_search_list(PathUtil.get_data_file_name(cls.DATA_FILE, 'compact'))
+
+    @classmethod
+    def prepare_load(cls, manifest):
+        """
+        合并未入库的落地文件
+        :return: (search_list, 本次load的文件列表)
+        """
+        if cls.FILE_FORMAT == 'parquet':
+            data_dir = manifest.prepare_parquet(PathUtil.get_data_dir_name(cls.DATA_FILE), cls.PARTITION_COL)
+            if not data_dir:
+                return None, []
+            return cls.get_search_list(data_dir), [p for p, _ in manifest.new_files(manifest.parquet_match(data_dir))]
+        data_file_path = manifest.prepare_text()
+        if not data_file_path:
+            return None, []
+        return cls.get_search_list(data_file_path), [data_file_path]
 
     @classmethod
     def render_and_exec(cls):
-        # 渲染sql
-        t = TemplateUtil(cls.SQL_FILE,
-                         search_list={'data_file_path': PathUtil.get_data_file_ambiguous_name(cls.DATA_FILE)},
-                         cata='ods')
-        print(t.sql)
-        sql_file = t.write_and_get_result_sql_path()
-
-        print(f"sudo -u hive hive -f {sql_file}")
-        exit_code = os.system(f"sudo -u hive hive -f {sql_file}")
-        return exit_code
+        manifest = DataManifest(cls.DATA_FILE)
+        search_list, files = cls.prepare_load(manifest)
+        if not files:
+            print(f'{cls.__name__} no new data file to load.')
+            return 0
+
+        # 快照表首次在本机启用时自动初始化, 初始化只补快照中缺失的分区, 重复执行无副作用
+        with IngestLedger(cls) as ledger:
+            snap_init = search_list.get('snapshot_by_partition') and (cls.SNAP_INIT or not ledger.snapshot_ready())
+            if snap_init:
+                search_list['snap_init'] = True
+
+            # hs2 在服务端解析 load data 的路径, 落地文件先上传HDFS
+            executor = SqlExecutor.get()
+            path_key = 'data_dir' if cls.FILE_FORMAT == 'parquet' else 'data_file_path'
+            staged_path = executor.stage(search_list[path_key])
+            search_list[path_key] = staged_path
+            search_list['load_local'] = 'local' if executor.LOCAL_LOAD else ''
+
+            # 渲染sql
+            t = TemplateUtil(cls.SQL_FILE,
+                             search_list=search_list,
+                             cata='ods')
+            print(t.sql)
+            sql_file = t.write_and_get_result_sql_path()
 
+            try:
+                result = executor.execute_file(sql_file)
+            finally:
+                executor.unstage(staged_path)
+            print(result)
+            HiveResourceAdvisor.get().record(cls.SQL_FILE, result)
+            if result.exit_code == 0:
+                manifest.mark_loaded(files)
+                manifest.expire()
+                if snap_init:
+                    ledger.mark_snapshot_ready()
+        return result.exit_code
@@ -7,6 +7,13 @@ class Daily(BaseTask):
 
     DATA_FILE = 'daily.csv'
     SQL_FILE = 'daily.sql'
+    API_NAME = 'daily'
+    FILE_FORMAT = 'parquet'
+    SNAPSHOT_BY_PARTITION = True
+    # 数据源对最近几日有延迟修正, 已入ODS的最近3个交易日每次重拉
+    LOOKBACK_DAYS = 3
+    # 单次最多6000行, 补数时按区间拉取
+    ROW_LIMIT = 6000
 
     @classmethod
     def run(cls):
@@ -15,11 +22,19 @@ class Daily(BaseTask):
     @classmethod
     def get_df(cls, *args, **kwargs):
         dt = kwargs['dt']
+        return cls.query(trade_date=dt)
+
+    @classmethod
+    def get_range_df(cls, start_date, end_date, ts_code=''):
+        return cls.query(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+    @classmethod
+    def query(cls, ts_code='', trade_date='', start_date='', end_date=''):
         return cls.pro.daily(**{
-            "ts_code": "",
-            "trade_date": dt,
-            "start_date": "",
-            "end_date": "",
+            "ts_code": ts_code,
+            "trade_date": trade_date,
+            "start_date": start_date,
+            "end_date": end_date,
             "offset": "",
             "limit": ""
         }, fields=[
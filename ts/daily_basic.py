@@ -8,10 +8,15 @@ class DailyBasic(BaseTask):
 
     DATA_FILE = 'daily_basic.csv'
     SQL_FILE = 'daily_basic.sql'
+    API_NAME = 'daily_basic'
+    FILE_FORMAT = 'parquet'
+    SNAPSHOT_BY_PARTITION = True
+    # 数据源对最近几日有延迟修正, 已入ODS的最近3个交易日每次重拉
+    LOOKBACK_DAYS = 3
 
     @classmethod
     def run(cls):
-        cls.run_by_dt()
+        return cls.run_by_dt()
 
     @classmethod
     def get_df(cls, *args, **kwargs):
@@ -8,13 +8,16 @@ class FinaMainBiz(BaseTask):
 
     DATA_FILE = 'fina_main_biz.csv'
     SQL_FILE = 'fina_main_biz.sql'
-    SLEEP_SECONDS = 1
+    API_NAME = 'fina_mainbz'
+    RATE_LIMIT = 60
+    # 每分钟仅60次, 小文件更频繁地checkpoint
+    SLICE_ROWS = 20000
 
     @classmethod
     def run(cls):
         # by stock
         # 写文件、上传文件，都需check
-        cls.run_by_stock()
+        return cls.run_by_stock()
 
     @classmethod
     def get_df(cls, *args, **kwargs):
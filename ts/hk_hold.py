@@ -11,7 +11,8 @@ class HkHold(BaseTask):
 
     DATA_FILE = 'hk_hold.csv'
     SQL_FILE = 'hk_hold.sql'
-    SLEEP_SECONDS = 1
+    API_NAME = 'hk_hold'
+    RATE_LIMIT = 120  # 每个交易日沪深各调用1次
 
     @classmethod
     def run(cls):
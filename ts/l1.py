@@ -1,53 +1,126 @@
 # coding: utf-8
 
-import os
+import sys
+from datetime import datetime
 
+import fire
+
+from adj_factor import AdjFactor
 from base_task import BaseTask
+from utils.dag_runner import DagRunner
+from utils.hive_resource import HiveResourceAdvisor
+from utils.ingest_ledger import IngestLedger
+from utils.now import Now
+from utils.sql_lineage import SqlLineage
 from utils.template_util import TemplateUtil
+from utils.sql_executor import SqlExecutor
+
+# 按月分区增量重算的事实表所依赖的ODS任务(台账任务名)
+INCR_SOURCE_TASKS = ['Daily', 'DailyBasic', 'AdjFactor', 'MoneyFlow', 'ThsDaily']
+
+# L1模板, 执行顺序由读写的表自动推导
+L1_TEMPLATES = [
+    'dim_stock.sql',
+    'dim_open_date.sql',
+
+    # stock
+    'fact_stock_daily.sql',
+    # 'fact_stock_future_change.sql',
+    # 'fact_stock_tag_price_prev.sql',
+    'fact_stock_money_flow.sql',
+    'fact_stock_holder_log.sql',
+
+    # market
+    'fact_market_amount.sql',
+
+    # ths
+    'dim_rela_ths_stock.sql',
+    'fact_ths_daily.sql',
+
+    'topic_stock_daily.sql',
+    'topic_ths_daily.sql',
+]
 
 
 class L1Task(BaseTask):
 
     @classmethod
-    def run(cls):
-        conf_list = [
-            'dim_stock.sql',
-            'dim_open_date.sql',
-
-            # stock
-            'fact_stock_daily.sql',
-            # 'fact_stock_future_change.sql',
-            # 'fact_stock_tag_price_prev.sql',
-            'fact_stock_money_flow.sql',
-            'fact_stock_holder_log.sql',
+    def get_incr_search_list(cls, full_refresh=False, check_ex_rights=True):
+        """
+        增量范围: 近一天ODS写入的最早交易日所在月份起重算, 源数据多读一个月供窗口函数回看
+        前复权价格依赖最新复权因子, 近一天有除权除息的股票另重算其全部历史(ex_rights_codes), 其他股票只重算增量月份
+        :param check_ex_rights: 是否调用接口检查除权除息
+        """
+        if full_refresh:
+            return {'full_refresh': True, 'start_month': '', 'lookback_month': '', 'ex_rights_codes': []}
 
-            # market
-            'fact_market_amount.sql',
+        since = IngestLedger.today_begin() - 86400
+        codes = []
+        if check_ex_rights:
+            with IngestLedger('AdjFactor') as ledger:
+                start_date, end_date = ledger.min_dt_since(since), ledger.max_dt_since(since)
+            codes = sorted(AdjFactor.ex_rights_codes(start_date, end_date)) if start_date else []
+            if codes:
+                print(f'L1Task {len(codes)} stocks ex-rights between {start_date} and {end_date}, '
+                      f'rebuild their history: {codes[:20]}')
 
-            # ths
-            'dim_rela_ths_stock.sql',
-            'fact_ths_daily.sql',
+        dt_list = []
+        for task in INCR_SOURCE_TASKS:
+            with IngestLedger(task) as ledger:
+                dt_list.append(ledger.min_dt_since(since))
+        start_month = min([str(dt)[:6] for dt in dt_list if dt] + [Now().datekey[:6]])
+        lookback_month = Now(datetime.strptime(start_month, '%Y%m')).delta(months=1).datekey[:6]
+        return {'full_refresh': False, 'start_month': start_month, 'lookback_month': lookback_month,
+                'ex_rights_codes': codes}
 
-            'topic_stock_daily.sql',
-            'topic_ths_daily.sql',
+    @classmethod
+    def build(cls, search_list, max_workers=4):
+        """渲染全部模板, 按解析出的读写表生成依赖: 读到其他模板写入的表即依赖该模板"""
+        conf_list = L1_TEMPLATES
+        sql_files = {}
+        lineages = {}
+        writers = {}
+        templates = TemplateUtil.render_batch([(name, 'l1') for name in conf_list], search_list, write=True)
+        for name, t in zip(conf_list, templates):
+            print(t.sql)
+            sql_files[name], lineages[name] = t.output_path, SqlLineage.parse(t.sql)
+            for table in lineages[name].writes:
+                if table in writers:
+                    raise ValueError(f'{table} written by both {writers[table]} and {name}')
+                writers[table] = name
 
-        ]
+        # sql失败多为逻辑错误, 不重试
+        runner = DagRunner(max_workers=max_workers, retries=0)
         for name in conf_list:
-            cls.render_and_exec_l1(name)
+            deps = sorted(set(writers[t] for t in lineages[name].reads if t in writers))
+            print(f'L1Task {name} deps: {deps}')
+            runner.add(name, lambda sql_file=sql_files[name], name=name: cls.exec_l1(sql_file, name), deps=deps)
+        return runner
 
     @classmethod
-    def render_and_exec_l1(cls, sql_file_name):
-        # 渲染sql
-        t = TemplateUtil(sql_file_name,
-                         cata='l1')
-        print(t.sql)
-        sql_file = t.write_and_get_result_sql_path()
+    def run(cls, full_refresh=False, max_workers=4):
+        """
+        :param full_refresh: 全量重建事实表, 首次部署或每周执行一次
+        :param max_workers: 同时执行的sql文件数
+        """
+        search_list = cls.get_incr_search_list(full_refresh)
+        print(f'L1Task search_list: {search_list}')
+        # 失败的模板其下游全部跳过
+        if not cls.build(search_list, max_workers).run():
+            sys.exit(1)
 
-        print(f"sudo -u hive hive -f {sql_file}")
-        exit_code = os.system(f"sudo -u hive hive -f {sql_file}")
-        return exit_code
+    @classmethod
+    def exec_l1(cls, sql_file, name=None):
+        """
+        :param name: 模板文件名, 用于记录执行统计
+        """
+        result = SqlExecutor.get().execute_file(sql_file)
+        print(result)
+        if name:
+            HiveResourceAdvisor.get().record(name, result)
+        return result.exit_code
 
 
 if __name__ == '__main__':
 
-    L1Task.run()
+    fire.Fire(L1Task.run)
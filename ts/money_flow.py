@@ -8,7 +8,12 @@ class MoneyFlow(BaseTask):
 
     DATA_FILE = 'money_flow.csv'
     SQL_FILE = 'money_flow.sql'
-    SLEEP_SECONDS = 0.2
+    API_NAME = 'moneyflow'
+    RATE_LIMIT = 300
+    FILE_FORMAT = 'parquet'
+    SNAPSHOT_BY_PARTITION = True
+    # 数据源对最近几日有延迟修正, 已入ODS的最近3个交易日每次重拉
+    LOOKBACK_DAYS = 3
 
     @classmethod
     def run(cls):
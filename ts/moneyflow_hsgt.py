@@ -8,7 +8,8 @@ class MoneyFlowHsgt(BaseTask):
 
     DATA_FILE = 'money_flow_hsgt.csv'
     SQL_FILE = 'money_flow_hsgt.sql'
-    SLEEP_SECONDS = 0.2
+    API_NAME = 'moneyflow_hsgt'
+    RATE_LIMIT = 300
 
     @classmethod
     def run(cls):
@@ -0,0 +1,121 @@
+# coding: utf-8
+# ODS任务依赖图: trade_cal/stock_basic 先行, 其余按依赖并发, 所有tushare接口共享总额度
+
+import os
+import sys
+import time
+
+import fire
+
+sys.path.append('..')
+from utils.dag_runner import DagRunner
+from utils.now import Now
+from utils.rate_limiter import RateLimiter
+from utils.template_util import TemplateUtil
+
+from base_task import BaseTask
+
+from trade_cal import TradeCal
+from stock_basic import StockBasic
+from stock_company import StockCompany
+from daily import Daily
+from daily_basic import DailyBasic
+from money_flow import MoneyFlow
+from adj_factor import AdjFactor
+from stock_holder_num import StockHolderNum
+from hk_hold import HkHold
+from moneyflow_hsgt import MoneyFlowHsgt
+from ths_index import ThsIndex
+from ths_daily import ThsDaily
+from ths_member import ThsMember
+from fina_main_biz import FinaMainBiz
+from l1 import L1Task, L1_TEMPLATES
+
+# 任务名: (任务类, 上游任务)
+ODS_TASKS = {
+    'trade_cal': (TradeCal, []),
+    'stock_basic': (StockBasic, []),
+    'stock_company': (StockCompany, []),
+    'ths_index': (ThsIndex, []),
+    'ths_member': (ThsMember, []),
+
+    'daily': (Daily, ['trade_cal', 'stock_basic']),
+    'adj_factor': (AdjFactor, ['trade_cal', 'stock_basic']),
+    'daily_basic': (DailyBasic, ['trade_cal']),
+    'money_flow': (MoneyFlow, ['trade_cal']),
+    'stock_holder_num': (StockHolderNum, ['trade_cal']),
+    'hk_hold': (HkHold, ['trade_cal']),
+    'moneyflow_hsgt': (MoneyFlowHsgt, ['trade_cal']),
+    'ths_daily': (ThsDaily, ['trade_cal']),
+
+    'fina_main_biz': (FinaMainBiz, ['stock_basic']),
+}
+# 默认不跑的任务
+OPTIONAL_TASKS = ['fina_main_biz']
+# 所有接口合计每分钟调用次数
+TS_GLOBAL_RATE = 1000
+
+
+class OdsRunner(object):
+
+    @classmethod
+    def build(cls, tasks=None, max_workers=4, retries=1):
+        """
+        :param tasks: 只跑指定任务, 逗号分隔; 上游不在其中时视为已完成
+        """
+        names = cls.task_names(tasks)
+        runner = DagRunner(max_workers=max_workers, retries=retries)
+        for name in names:
+            task_cls, deps = ODS_TASKS[name]
+            runner.add(name, task_cls.run, deps=[i for i in deps if i in names])
+        return runner
+
+    @classmethod
+    def task_names(cls, tasks=None):
+        if tasks:
+            return tasks.split(',') if isinstance(tasks, str) else list(tasks)
+        return [i for i in ODS_TASKS if i not in OPTIONAL_TASKS]
+
+    @classmethod
+    def plan(cls, tasks=None, full_refresh=False, write=False):
+        """
+        预渲染当晚全部ODS和L1模板, 检查模板错误
+        落地文件路径/L1增量月份都按当天的台账和文件计算, 只能预渲染当天
+        :param tasks: 逗号分隔的ODS任务名, 默认全部(不含 OPTIONAL_TASKS)
+        :param full_refresh: L1按全量重建渲染
+        :param write: 是否写入 sql_files/
+        """
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        now = Now()
+        st = time.time()
+        items = [(ODS_TASKS[name][0].SQL_FILE, 'ods', ODS_TASKS[name][0].plan_search_list())
+                 for name in cls.task_names(tasks)]
+        # 只检查模板, 不调用接口判断除权
+        l1_search_list = L1Task.get_incr_search_list(full_refresh, check_ex_rights=False)
+        items += [(name, 'l1', l1_search_list) for name in L1_TEMPLATES]
+        templates = TemplateUtil.render_batch(items, {'now': now}, write=write)
+        for t in templates:
+            print(f'{t.cata}/{t.file_name} {len(t.sql)} chars' + (f' -> {t.output_path}' if write else ''))
+        print(f'OdsRunner plan {now.date} {len(templates)} templates cost:{(time.time() - st) * 1000:.0f}ms')
+        return templates
+
+    @classmethod
+    def run(cls, tasks=None, max_workers=4, retries=1, budget=TS_GLOBAL_RATE, snap_init=False):
+        """
+        :param tasks: 逗号分隔的任务名, 默认全部(不含 OPTIONAL_TASKS)
+        :param max_workers: 同时执行的任务数
+        :param retries: 失败重试次数
+        :param budget: tushare所有接口合计每分钟调用次数
+        :param snap_init: 强制由旧的全量分区初始化快照表, 快照表被重建时使用; 本机首次启用时自动初始化
+        """
+        # 任务中的相对路径 ./data 以ts目录为准
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        RateLimiter.configure_global(budget)
+        BaseTask.SNAP_INIT = snap_init
+        ok = cls.build(tasks, max_workers, retries).run()
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    fire.Fire({'run': OdsRunner.run, 'plan': OdsRunner.plan})
@@ -1,5 +1,7 @@
 # coding: utf-8
 
+import pandas as pd
+
 from base_task import BaseTask
 
 
@@ -8,6 +10,9 @@ class StockBasic(BaseTask):
 
     DATA_FILE = 'stock_basic.csv'
     SQL_FILE = 'stock_basic.sql'
+    API_NAME = 'stock_basic'
+    # 上市状态 L上市 D退市 P暂停上市, 接口默认只返回L, 按股票拉数的任务需包含退市股票的历史
+    LIST_STATUS = ['L', 'D', 'P']
 
     @classmethod
     def run(cls):
@@ -15,13 +20,19 @@ class StockBasic(BaseTask):
 
     @classmethod
     def get_df(cls, *args, **kwargs):
-        df = cls.pro.stock_basic(**{
+        df = pd.concat([cls.query(list_status) for list_status in cls.LIST_STATUS], ignore_index=True)
+        df.to_csv('./data/'+cls.DATA_FILE, sep='\u0001', index=False)
+        return df
+
+    @classmethod
+    def query(cls, list_status):
+        return cls.pro.stock_basic(**{
             "ts_code": "",
             "name": "",
             "exchange": "",
             "market": "",
             "is_hs": "",
-            "list_status": "",
+            "list_status": list_status,
             "limit": "",
             "offset": ""
         }, fields=[
@@ -37,9 +48,6 @@ class StockBasic(BaseTask):
             "delist_date",
             "is_hs"
         ])
-        df.to_csv('./data/'+cls.DATA_FILE, sep='\u0001', index=False)
-        return df
-
 
 if __name__ == '__main__':
     df = StockBasic.get_df()
@@ -8,19 +8,22 @@ class StockCompany(BaseTask):
 
     DATA_FILE = 'stock_company.csv'
     SQL_FILE = 'stock_company.sql'
+    API_NAME = 'stock_company'
+    # 单次最多4500行
+    PAGE_LIMIT = 4500
 
     @classmethod
     def run(cls):
         return cls.run_no_dt()
 
     @classmethod
-    def get_df(cls):
+    def get_page_df(cls, limit, offset):
         return cls.pro.stock_company(**{
             "ts_code": "",
             "exchange": "",
             "status": "",
-            "limit": "",
-            "offset": ""
+            "limit": limit,
+            "offset": offset
         }, fields=[
             "ts_code",
             "exchange",
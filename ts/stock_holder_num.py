@@ -10,7 +10,8 @@ class StockHolderNum(BaseTask):
 
     DATA_FILE = 'stock_holder_num.csv'
     SQL_FILE = 'stock_holder_num.sql'
-    SLEEP_SECONDS = 0.2
+    API_NAME = 'stk_holdernumber'
+    RATE_LIMIT = 300
 
     @classmethod
     def run(cls):
@@ -0,0 +1,143 @@
+# coding: utf-8
+# BaseTask 并发拉数: 按接口额度限流, 结果按参数顺序返回
+
+import random
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from ts.base_task import BaseTask
+from utils.rate_limiter import RateLimiter
+
+
+class FakeTask(BaseTask):
+
+    API_NAME = 'test_fake_daily'
+    RATE_LIMIT = 6000
+    MAX_WORKERS = 4
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def get_df(cls, *args, **kwargs):
+        # 与 RateLimitedPro 一样调用前取令牌
+        RateLimiter.acquire(cls.API_NAME)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        # 先提交的请求可能后返回
+        time.sleep(random.uniform(0, 0.01))
+        with cls.lock:
+            cls.active -= 1
+        dt = kwargs['dt']
+        if dt == 'bad':
+            raise ValueError(dt)
+        return pd.DataFrame({'trade_date': [dt]})
+
+
+def test_fetch_in_order():
+    date_list = [f'2023{m:02d}{d:02d}' for m in range(1, 4) for d in range(1, 29)]
+    res = list(FakeTask.fetch_in_order('dt', date_list))
+    assert [dt for dt, _ in res] == date_list
+    assert [df['trade_date'].iloc[0] for _, df in res] == date_list
+    assert 1 < FakeTask.max_active <= FakeTask.MAX_WORKERS
+
+
+def test_fetch_in_order_quota():
+    # 6000次/分钟, 突发100后剩余50次至少0.5秒
+    FakeTask.configure_rate_limit()
+    time.sleep(1)
+    st = time.monotonic()
+    res = list(FakeTask.fetch_in_order('dt', [str(i) for i in range(150)]))
+    assert len(res) == 150
+    assert time.monotonic() - st >= 0.45
+    assert RateLimiter.get(FakeTask.API_NAME).rate == FakeTask.RATE_LIMIT
+
+
+def test_fetch_in_order_error():
+    with pytest.raises(ValueError):
+        list(FakeTask.fetch_in_order('dt', ['20230101', 'bad', '20230103']))
+    res = list(FakeTask.fetch_in_order('dt', ['20230101', 'bad', '20230103'], skip_error=True))
+    assert [dt for dt, _ in res] == ['20230101', 'bad', '20230103']
+    assert res[1][1] is None and res[2][1] is not None
+
+
+class FakeWriter(object):
+    """代替落地文件, 退出时与 TextChunkWriter 一样回调 on_rotate"""
+
+    def __init__(self, on_rotate=None):
+        self.on_rotate = on_rotate
+        self.keys = []
+        self.rows = 0
+        self.total_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.on_rotate:
+            self.on_rotate(self.keys)
+        return False
+
+    def write(self, df, key=None):
+        self.keys.append(key)
+        self.rows += df.shape[0]
+        self.total_rows += df.shape[0]
+
+
+class FakeDaily(BaseTask):
+
+    API_NAME = 'test_fake_daily'
+    LOOKBACK_DAYS = 2
+    calendar = ['20230103', '20230104', '20230105', '20230106', '20230109', '20230110']
+    # 无数据的日期: 0104 休市数据缺失, 0110 当天数据未发布
+    empty = {'20230104', '20230110'}
+    fetched = []
+
+    @classmethod
+    def get_date_df(cls):
+        return pd.DataFrame({'cal_date': cls.calendar})
+
+    @classmethod
+    def get_df(cls, *args, **kwargs):
+        dt = kwargs['dt']
+        cls.fetched.append(dt)
+        return pd.DataFrame({'trade_date': [] if dt in cls.empty else [dt, dt]})
+
+    @classmethod
+    def get_writer(cls, on_rotate=None):
+        return FakeWriter(on_rotate)
+
+
+@pytest.fixture
+def ledger_db(tmp_path, monkeypatch):
+    from utils.ingest_ledger import IngestLedger
+    monkeypatch.setattr(IngestLedger, 'get_db_path', classmethod(lambda cls: str(tmp_path / 'ingest_ledger.db')))
+    FakeDaily.fetched = []
+    return IngestLedger
+
+
+def test_save_data_by_dt_records_empty(ledger_db):
+    assert FakeDaily.save_data_by_dt() == 8
+    assert FakeDaily.fetched == FakeDaily.calendar
+    ledger = ledger_db(FakeDaily)
+    # 最晚有数据日期之前的空日期记0行, 之后的不记
+    assert ledger.missing(FakeDaily.calendar) == ['20230110']
+    row = ledger.conn.execute('SELECT row_count FROM ingest_ledger WHERE dt = ?', ('20230104',)).fetchone()
+    assert row == (0,)
+    ledger.close()
+
+
+def test_save_data_by_dt_lookback(ledger_db):
+    FakeDaily.save_data_by_dt()
+    FakeDaily.fetched = []
+    # 再次运行只拉未覆盖的日期及最近 LOOKBACK_DAYS 个交易日
+    FakeDaily.save_data_by_dt()
+    assert FakeDaily.fetched == ['20230109', '20230110']
+    FakeDaily.fetched = []
+    FakeDaily.save_data_by_dt(check_cache=False)
+    assert FakeDaily.fetched == FakeDaily.calendar
+
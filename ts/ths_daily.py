@@ -7,6 +7,7 @@ class ThsDaily(BaseTask):
 
     DATA_FILE = 'ths_daily.csv'
     SQL_FILE = 'ths_daily.sql'
+    API_NAME = 'ths_daily'
 
     @classmethod
     def run(cls):
@@ -8,19 +8,22 @@ class ThsIndex(BaseTask):
 
     DATA_FILE = 'ths_index.csv'
     SQL_FILE = 'ths_index.sql'
+    API_NAME = 'ths_index'
+    PAGE_LIMIT = 5000
+    LOCAL_COPY = True
 
     @classmethod
     def run(cls):
         return cls.run_no_dt()
 
     @classmethod
-    def get_df(cls, *args, **kwargs):
-        df = cls.pro.ths_index(**{
+    def get_page_df(cls, limit, offset):
+        return cls.pro.ths_index(**{
             "ts_code": "",
             "exchange": "",
             "type": "",
-            "limit": "",
-            "offset": ""
+            "limit": limit,
+            "offset": offset
         }, fields=[
             "ts_code",
             "name",
@@ -28,8 +31,6 @@ class ThsIndex(BaseTask):
             "list_date",
             "type"
         ])
-        df.to_csv('./data/'+cls.DATA_FILE, sep='\u0001', index=False)
-        return df
 
 
 if __name__ == '__main__':
@@ -8,6 +8,7 @@ class TradeCal(BaseTask):
 
     DATA_FILE = 'trade_cal.csv'
     SQL_FILE = 'trade_cal.sql'
+    API_NAME = 'trade_cal'
 
     @classmethod
     def run(cls):
@@ -0,0 +1,160 @@
+# coding: utf-8
+# 流式落地文件: 每个df到达即追加写入已打开的文件, 行数达到阈值后滚动, 内存只保留当前df
+
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.path_util import PathUtil
+from utils.parquet_util import ParquetUtil
+
+
+class TextChunkWriter(object):
+    """\\u0001分隔的文本文件, 先写隐藏临时文件, 滚动时按key范围改名为正式文件"""
+
+    def __init__(self, data_file, max_rows=200000, on_rotate=None):
+        """
+        :param data_file: daily.csv
+        :param max_rows: 单文件最大行数
+        :param on_rotate: 文件落盘后的回调, 参数为该文件包含的key列表
+        """
+        self.data_file = data_file
+        self.max_rows = max_rows
+        self.on_rotate = on_rotate
+        self.rows = 0
+        self.total_rows = 0
+        self.keys = []
+        self.file_list = []
+        self._fp = None
+        self._tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # 异常时已写入的df也是完整的, 照常落盘
+        self.close()
+        return False
+
+    def _suffix(self):
+        keys = [k for k in self.keys if k is not None]
+        if not keys:
+            return None
+        return str(keys[-1]) + '_' + str(keys[0])
+
+    def _tmp_name(self):
+        name = self.data_file.split('.')[0]
+        return os.path.join(PathUtil.get_data_file_dir(), f'.{name}_{uuid.uuid4().hex}.tmp')
+
+    def _open(self):
+        self._tmp_path = self._tmp_name()
+        self._fp = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def _append(self, df):
+        df.to_csv(self._fp, sep='\u0001', index=False, header=False)
+
+    def _finish(self):
+        self._fp.close()
+        self._fp = None
+        file_name = PathUtil.get_data_file_name(self.data_file, self._suffix())
+        os.replace(self._tmp_path, file_name)
+        return file_name
+
+    def write(self, df, key=None):
+        if self._fp is None:
+            self._open()
+        self._append(df)
+        self.keys.append(key)
+        self.rows += df.shape[0]
+        self.total_rows += df.shape[0]
+        if self.rows >= self.max_rows:
+            self.rotate()
+
+    def rotate(self):
+        if self._fp is None:
+            return
+        file_name = self._finish()
+        self.file_list.append(file_name)
+        print(f'{self.__class__.__name__} rows:{self.rows} save to {file_name}.')
+        keys = self.keys
+        self.rows = 0
+        self.keys = []
+        if self.on_rotate:
+            self.on_rotate(keys)
+
+    def close(self):
+        self.rotate()
+
+
+class ParquetChunkWriter(TextChunkWriter):
+    """parquet数据集, 每个分区一个打开的ParquetWriter, 每个df作为一个row group追加"""
+
+    def __init__(self, data_file, partition_col, max_rows=200000, on_rotate=None):
+        super(ParquetChunkWriter, self).__init__(data_file, max_rows, on_rotate)
+        self.partition_col = partition_col
+        self._writers = {}
+        self._buffer = []
+
+    def _open(self):
+        self._tmp_path = self._tmp_name()
+        os.makedirs(self._tmp_path)
+        self._fp = self._writers
+
+    def _part_dir(self, value):
+        part_dir = os.path.join(self._tmp_path, f'{self.partition_col}={value}')
+        if not os.path.exists(part_dir):
+            os.makedirs(part_dir)
+        return part_dir
+
+    def _write_part(self, value, part):
+        table = pa.Table.from_pandas(part.drop(columns=[self.partition_col]), preserve_index=False)
+        writer = self._writers.get(value)
+        if writer is None:
+            path = os.path.join(self._part_dir(value), 'stream.parquet')
+            writer = pq.ParquetWriter(path, table.schema, compression=ParquetUtil.COMPRESSION)
+            self._writers[value] = writer
+        elif not table.schema.equals(writer.schema):
+            table = table.cast(writer.schema)
+        writer.write_table(table)
+
+    def _append(self, df):
+        if df[self.partition_col].nunique() > 1:
+            # 跨多个分区的df(按股票区间拉取)先缓存, 落盘时每个分区整体写一个文件, 避免小文件
+            self._buffer.append(df)
+            return
+        df = ParquetUtil.normalize(df)
+        for value, part in df.groupby(self.partition_col, sort=False):
+            self._write_part(value, part)
+
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+        df = ParquetUtil.normalize(pd.concat(self._buffer, ignore_index=True))
+        self._buffer = []
+        for value, part in df.groupby(self.partition_col, sort=False):
+            table = pa.Table.from_pandas(part.drop(columns=[self.partition_col]), preserve_index=False)
+            pq.write_table(table, os.path.join(self._part_dir(value), 'batch.parquet'),
+                           compression=ParquetUtil.COMPRESSION)
+
+    def _finish(self):
+        self._flush_buffer()
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+        dir_path = PathUtil.get_data_dir_name(self.data_file)
+        file_id = f'{int(time.time())}_{uuid.uuid4().hex[:8]}'
+        for part_name in os.listdir(self._tmp_path):
+            part_dir = os.path.join(dir_path, part_name)
+            os.makedirs(part_dir, exist_ok=True)
+            for f in os.listdir(os.path.join(self._tmp_path, part_name)):
+                os.replace(os.path.join(self._tmp_path, part_name, f),
+                           os.path.join(part_dir, f'{file_id}_{f}'))
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+        self._fp = None
+        return dir_path
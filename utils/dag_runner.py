@@ -0,0 +1,171 @@
+# coding: utf-8
+# 按依赖并发执行任务: 依赖全部成功后才提交, 失败重试, 最终失败的任务其下游全部跳过, 记录每个任务耗时和关键路径
+
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class DagTask(object):
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, name, func, deps=(), retries=None):
+        """
+        :param name: 任务名
+        :param func: 无参函数, 抛异常或返回非0整数视为失败
+        :param deps: 上游任务名列表
+        :param retries: 失败重试次数, None时按 DagRunner.retries
+        """
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.retries = retries
+        self.status = self.PENDING
+        self.attempts = 0
+        self.start_time = None
+        self.end_time = None
+        self.error = None
+
+    @property
+    def cost(self):
+        if self.start_time is None or self.end_time is None:
+            return 0
+        return self.end_time - self.start_time
+
+
+class DagRunner(object):
+
+    def __init__(self, max_workers=4, retries=1, retry_wait=10):
+        """
+        :param max_workers: 同时执行的任务数
+        :param retries: 默认失败重试次数
+        :param retry_wait: 重试前等待秒数
+        """
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_wait = retry_wait
+        self.tasks = {}
+
+    def add(self, name, func, deps=(), retries=None):
+        self.tasks[name] = DagTask(name, func, deps, retries)
+        return self
+
+    def check(self):
+        """依赖存在且无环"""
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f'{task.name} depends on unknown task {dep}')
+        visited = {}
+
+        def visit(name, path):
+            if visited.get(name) == 1:
+                raise ValueError(f'cycle: {" -> ".join(path + [name])}')
+            if visited.get(name) == 2:
+                return
+            visited[name] = 1
+            for dep in self.tasks[name].deps:
+                visit(dep, path + [name])
+            visited[name] = 2
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def _call(self, task):
+        # 在工作线程中计时, 不含排队等待空闲线程的时间
+        if task.start_time is None:
+            task.start_time = time.time()
+        print(f'DagRunner start {task.name} attempt:{task.attempts}')
+        if task.attempts > 1 and self.retry_wait:
+            time.sleep(self.retry_wait)
+        result = task.func()
+        if isinstance(result, int) and not isinstance(result, bool) and result != 0:
+            raise RuntimeError(f'{task.name} return {result}')
+        return result
+
+    def _skip_downstream(self, name):
+        for task in self.tasks.values():
+            if name in task.deps and task.status == DagTask.PENDING:
+                task.status = DagTask.SKIPPED
+                task.error = f'upstream {name} failed'
+                self._skip_downstream(task.name)
+
+    def _ready(self):
+        return [task for task in self.tasks.values()
+                if task.status == DagTask.PENDING
+                and all(self.tasks[dep].status == DagTask.SUCCESS for dep in task.deps)]
+
+    def run(self):
+        """
+        :return: 是否全部成功
+        """
+        self.check()
+        begin = time.time()
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                for task in self._ready():
+                    task.status = DagTask.RUNNING
+                    task.attempts += 1
+                    futures[executor.submit(self._call, task)] = task
+                if not futures:
+                    break
+
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        task.status = DagTask.SUCCESS
+                        task.end_time = time.time()
+                        print(f'DagRunner finish {task.name} cost:{task.cost:.1f}s')
+                        continue
+
+                    retries = self.retries if task.retries is None else task.retries
+                    print(f'DagRunner {task.name} attempt:{task.attempts} error:{error}')
+                    traceback.print_exception(type(error), error, error.__traceback__)
+                    if task.attempts <= retries:
+                        task.status = DagTask.PENDING
+                    else:
+                        task.status = DagTask.FAILED
+                        task.end_time = time.time()
+                        task.error = str(error)
+                        self._skip_downstream(task.name)
+
+        self.summary(time.time() - begin)
+        return all(task.status == DagTask.SUCCESS for task in self.tasks.values())
+
+    def critical_path(self):
+        """按耗时的最长依赖链"""
+        memo = {}
+
+        def longest(name):
+            if name not in memo:
+                task = self.tasks[name]
+                best = max([longest(dep) for dep in task.deps], key=lambda x: x[0], default=(0, []))
+                memo[name] = (best[0] + task.cost, best[1] + [name])
+            return memo[name]
+
+        return max((longest(name) for name in self.tasks), key=lambda x: x[0], default=(0, []))
+
+    def summary(self, total_cost):
+        print(f'DagRunner total cost:{total_cost:.1f}s')
+        for task in sorted(self.tasks.values(), key=lambda t: t.start_time or float('inf')):
+            print(f'    {task.name:<20} {task.status:<8} attempts:{task.attempts} cost:{task.cost:.1f}s'
+                  + (f' error:{task.error}' if task.error else ''))
+        cost, path = self.critical_path()
+        print(f'DagRunner critical path {cost:.1f}s: {" -> ".join(path)}')
+
+
+if __name__ == '__main__':
+    r = DagRunner(max_workers=2, retry_wait=0)
+    r.add('a', lambda: time.sleep(0.2))
+    r.add('b', lambda: time.sleep(0.1), deps=['a'])
+    r.add('c', lambda: 1, deps=['a'])
+    r.add('d', lambda: None, deps=['c'])
+    print(r.run())
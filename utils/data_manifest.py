@@ -0,0 +1,233 @@
+# coding: utf-8
+# 落地文件清单: sqlite记录 data_files/ 下每个文件的状态, 重跑只load未入库的文件
+# 入库前把多个小文件合并为一个(文本直接拼接字节, parquet按分区合并), 入库成功后标记loaded, 过期后删除
+
+import fnmatch
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.now import Now
+from utils.path_util import PathUtil
+
+# loaded 的文件保留天数
+EXPIRE_DAYS = 3
+
+
+class DataManifest(object):
+
+    NEW = 'new'
+    LOADED = 'loaded'
+    # 已合并进其他文件, 原文件已删除
+    COMPACTED = 'compacted'
+
+    def __init__(self, data_file, db_path=None):
+        """
+        :param data_file: daily.csv
+        :param db_path: 默认 ts/data/data_manifest.db
+        """
+        self.data_file = data_file
+        self.name = data_file.split('.')[0]
+        self.db_path = db_path or self.get_db_path()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self._init_table()
+
+    @classmethod
+    def get_db_path(cls):
+        dir_path = os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data')
+        os.makedirs(dir_path, exist_ok=True)
+        return os.path.join(dir_path, 'data_manifest.db')
+
+    def _init_table(self):
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS data_manifest (
+                    path TEXT PRIMARY KEY,              -- 文件绝对路径
+                    data_file TEXT NOT NULL,            -- 任务DATA_FILE
+                    status TEXT NOT NULL,               -- new/loaded/compacted
+                    part TEXT DEFAULT '',               -- parquet分区值
+                    row_count INTEGER DEFAULT 0,        -- 行数
+                    bytes INTEGER DEFAULT 0,            -- 文件大小
+                    create_time REAL,                   -- 登记时间
+                    load_time REAL                      -- 入库时间
+                )
+            ''')
+
+    def _known(self):
+        rows = self.conn.execute('SELECT path FROM data_manifest WHERE data_file = ?', (self.data_file,)).fetchall()
+        return set(i[0] for i in rows)
+
+    def _register(self, path_list, part=''):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO data_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(p, self.data_file, self.NEW, part, 0, os.path.getsize(p), now, None) for p in path_list])
+
+    def _set_status(self, path_list, status, row_count=None):
+        with self.lock, self.conn:
+            for p in path_list:
+                self.conn.execute('UPDATE data_manifest SET status = ?, load_time = ? WHERE path = ?',
+                                  (status, time.time() if status == self.LOADED else None, p))
+                if row_count is not None:
+                    self.conn.execute('UPDATE data_manifest SET row_count = ? WHERE path = ?', (row_count, p))
+
+    @classmethod
+    def _remove(cls, path_list):
+        """删除文件, 及因此变空的上级目录(不含 data_files/ 本身)"""
+        root = PathUtil.get_data_file_dir()
+        for path in path_list:
+            if os.path.exists(path):
+                os.remove(path)
+            d = os.path.dirname(path)
+            while d.startswith(root) and d != root and os.path.isdir(d) and not os.listdir(d):
+                os.rmdir(d)
+                d = os.path.dirname(d)
+
+    def new_files(self, match):
+        """
+        本次运行的未入库文件, 更早运行遗留的未入库文件台账已视为缺失会重拉, 不再load, 由 expire 删除
+        :param match: 文件路径 -> 是否属于本次运行
+        """
+        rows = self.conn.execute('SELECT path, part FROM data_manifest WHERE data_file = ? AND status = ?',
+                                 (self.data_file, self.NEW)).fetchall()
+        return [(p, part) for p, part in rows if match(p) and os.path.exists(p)]
+
+    def text_match(self):
+        pattern = PathUtil.get_data_file_ambiguous_name(self.data_file)
+        return lambda p: fnmatch.fnmatch(p, pattern)
+
+    @classmethod
+    def parquet_match(cls, data_dir):
+        # 当天数据集目录 data_dir 及合并后的 data_dir_<时间戳>
+        return lambda p: p.startswith(data_dir + os.sep) or p.startswith(data_dir + '_')
+
+    # ---------- 文本 ----------
+
+    def scan_text(self):
+        """登记当天的文本落地文件, 更早的未入库文件台账已视为缺失会重拉, 不再load"""
+        known = self._known()
+        files = sorted(glob.glob(PathUtil.get_data_file_ambiguous_name(self.data_file)))
+        self._register([f for f in files if f not in known])
+
+    def prepare_text(self):
+        """
+        合并当天未入库的文本文件
+        :return: 待load的文件路径, 无新文件时返回None
+        """
+        self.scan_text()
+        files = [p for p, _ in self.new_files(self.text_match())]
+        if not files:
+            return None
+        if len(files) == 1:
+            return files[0]
+
+        # 无表头的\u0001文本, 直接拼接字节即可
+        target = PathUtil.get_data_file_name(self.data_file, 'compact')
+        tmp_path = target + '.tmp'
+        row_count = 0
+        with open(tmp_path, 'wb') as out:
+            for f in files:
+                with open(f, 'rb') as fp:
+                    data = fp.read()
+                if data and not data.endswith(b'\n'):
+                    data += b'\n'
+                row_count += data.count(b'\n')
+                out.write(data)
+        os.replace(tmp_path, target)
+        self._register([target])
+        self._set_status([target], self.NEW, row_count)
+        self._set_status(files, self.COMPACTED)
+        self._remove(files)
+        print(f'DataManifest {self.name} compact {len(files)} files {row_count} rows -> {target}')
+        return target
+
+    # ---------- parquet ----------
+
+    def scan_parquet(self, data_dir, partition_col):
+        known = self._known()
+        prefix = partition_col + '='
+        if not os.path.exists(data_dir):
+            return
+        for part_dir in sorted(os.listdir(data_dir)):
+            if not part_dir.startswith(prefix):
+                continue
+            dir_path = os.path.join(data_dir, part_dir)
+            files = [os.path.join(dir_path, f) for f in sorted(os.listdir(dir_path)) if f.endswith('.parquet')]
+            self._register([f for f in files if f not in known], part_dir[len(prefix):])
+
+    def prepare_parquet(self, data_dir, partition_col):
+        """
+        未入库的parquet文件按分区合并到本次运行的目录 data_dir_<时间戳>/partition_col=xxx/
+        :return: 本次运行目录, 无新文件时返回None
+        """
+        self.scan_parquet(data_dir, partition_col)
+        parts = {}
+        for path, part in self.new_files(self.parquet_match(data_dir)):
+            parts.setdefault(part, []).append(path)
+        if not parts:
+            return None
+
+        # 全空列在不同文件中推断的类型可能不同, 统一转为本次运行的schema再合并
+        schema = self.unify_schema([pq.read_schema(f) for files in parts.values() for f in files])
+        run_dir = f'{data_dir}_{int(time.time() * 1000)}'
+        for part, files in parts.items():
+            part_dir = os.path.join(run_dir, f'{partition_col}={part}')
+            os.makedirs(part_dir, exist_ok=True)
+            target = os.path.join(part_dir, 'part-0.parquet')
+            table = pa.concat_tables([self.conform(pq.read_table(f), schema) for f in files])
+            pq.write_table(table, target, compression='snappy')
+            self._register([target], part)
+            self._set_status([target], self.NEW, table.num_rows)
+            self._set_status(files, self.COMPACTED)
+            self._remove(files)
+        print(f'DataManifest {self.name} compact {sum(len(i) for i in parts.values())} files '
+              f'{len(parts)} partitions -> {run_dir}')
+        return run_dir
+
+    @classmethod
+    def unify_schema(cls, schemas):
+        """按字段首次出现的顺序合并, 类型取第一个非null类型"""
+        fields = {}
+        for schema in schemas:
+            for field in schema:
+                if field.name not in fields or pa.types.is_null(fields[field.name].type):
+                    fields[field.name] = field
+        return pa.schema(list(fields.values()))
+
+    @classmethod
+    def conform(cls, table, schema):
+        """按schema补齐缺失列(null)并转换类型"""
+        if table.schema.equals(schema):
+            return table
+        columns = [table.column(f.name).cast(f.type) if f.name in table.column_names
+                   else pa.nulls(table.num_rows, f.type) for f in schema]
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    # ---------- 入库/过期 ----------
+
+    def mark_loaded(self, path_list):
+        self._set_status(path_list, self.LOADED)
+
+    def expire(self, days=EXPIRE_DAYS):
+        """删除入库超过days天的文件, 超过days天仍未入库的遗留文件(已重拉), 及空目录"""
+        deadline = time.time() - days * 86400
+        rows = self.conn.execute('SELECT path FROM data_manifest WHERE data_file = ? AND status IN (?, ?) AND '
+                                 'coalesce(load_time, create_time) < ?',
+                                 (self.data_file, self.LOADED, self.NEW, deadline)).fetchall()
+        self._remove([path for (path,) in rows])
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM data_manifest WHERE data_file = ? AND '
+                              'coalesce(load_time, create_time) < ?', (self.data_file, deadline))
+        if rows:
+            print(f'DataManifest {self.name} expire {len(rows)} files loaded before {Now().delta(days).date}')
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,436 @@
+# coding: utf-8
+# 本地 DuckDB 执行后端: 同一套 Cheetah 模板渲染出的 hive sql 逐条翻译成 DuckDB 方言执行, 本地一台机器即可重建 ODS/L1
+# 只覆盖模板中用到的 hive 语法: set/建库/建表(分区列并入普通列)/like/load data/insert overwrite partition/drop partition/
+# map()/named_struct/collect_set/sort_array/percentile/assert_true/日期函数/反引号/distribute by
+
+import os
+import re
+import time
+
+from utils.path_util import PathUtil
+from utils.sql_executor import BaseExecutor, SqlResult, split_statements
+
+# hive 日期函数返回 yyyy-mm-dd 字符串, 用同名语义的宏替代
+MACROS = [
+    "create or replace macro hive_date_sub(d, n) as cast(cast(cast(d as date) - cast(n as integer) as date) as varchar)",
+    "create or replace macro hive_date_add(d, n) as cast(cast(cast(d as date) + cast(n as integer) as date) as varchar)",
+    "create or replace macro hive_add_months(d, n) as "
+    "cast(cast(cast(d as date) + to_months(cast(n as integer)) as date) as varchar)",
+    "create or replace macro hive_trunc(d, fmt) as cast(cast(date_trunc("
+    "case upper(fmt) when 'MM' then 'month' when 'MON' then 'month' when 'MONTH' then 'month' "
+    "when 'Q' then 'quarter' else 'year' end, cast(d as date)) as date) as varchar)",
+    "create or replace macro hive_dayofweek(d) as dayofweek(cast(d as date)) + 1",
+    "create or replace macro hive_datediff(a, b) as datediff('day', cast(b as date), cast(a as date))",
+]
+
+# 直接改名的函数
+RENAME_FUNCS = {
+    'date_sub': 'hive_date_sub',
+    'date_add': 'hive_date_add',
+    'add_months': 'hive_add_months',
+    'trunc': 'hive_trunc',
+    'dayofweek': 'hive_dayofweek',
+    'datediff': 'hive_datediff',
+    'nvl': 'coalesce',
+    'percentile': 'quantile_cont',
+    'percentile_approx': 'approx_quantile',
+    'sort_array': 'list_sort',
+}
+
+PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+
+class HiveToDuckDb(object):
+    """hive 语句翻译, 需要查表结构的语句(load/insert partition)依赖DuckDB连接"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    # ---------- 字符串字面量保护 ----------
+
+    @classmethod
+    def mask(cls, sql):
+        """字符串字面量替换为占位符, 避免改写时误伤; 双引号字符串转单引号"""
+        literals = []
+        out = []
+        i = 0
+        while i < len(sql):
+            c = sql[i]
+            if c in ("'", '"'):
+                j = i + 1
+                while j < len(sql) and sql[j] != c:
+                    j += 2 if sql[j] == '\\' else 1
+                body = sql[i + 1: j]
+                if c == '"':
+                    body = body.replace("'", "''")
+                literals.append("'" + body + "'")
+                out.append(f'\x00{len(literals) - 1}\x00')
+                i = j + 1
+            else:
+                out.append(c)
+                i += 1
+        return ''.join(out), literals
+
+    @classmethod
+    def unmask(cls, sql, literals):
+        return PLACEHOLDER.sub(lambda m: literals[int(m.group(1))], sql)
+
+    @classmethod
+    def literal_value(cls, token, literals):
+        m = PLACEHOLDER.fullmatch(token.strip())
+        if m:
+            return literals[int(m.group(1))][1:-1]
+        return token.strip()
+
+    # ---------- 括号/参数 ----------
+
+    @classmethod
+    def match_paren(cls, sql, start):
+        """sql[start] 为 '(' , 返回对应 ')' 的下标"""
+        depth = 0
+        for i in range(start, len(sql)):
+            if sql[i] == '(':
+                depth += 1
+            elif sql[i] == ')':
+                depth -= 1
+                if depth == 0:
+                    return i
+        raise ValueError(f'unbalanced parentheses: {sql[start:start + 80]}')
+
+    @classmethod
+    def split_args(cls, args):
+        res = []
+        depth = 0
+        buf = []
+        for c in args:
+            if c in '([':
+                depth += 1
+            elif c in ')]':
+                depth -= 1
+            if c == ',' and depth == 0:
+                res.append(''.join(buf).strip())
+                buf = []
+            else:
+                buf.append(c)
+        if ''.join(buf).strip():
+            res.append(''.join(buf).strip())
+        return res
+
+    @classmethod
+    def rewrite_calls(cls, sql, name, func):
+        """把 name(args) 替换为 func(args列表), 参数内的同名调用先替换"""
+        pattern = re.compile(r'(?<![\w.])%s\s*\(' % name, re.I)
+        out = []
+        pos = 0
+        while True:
+            m = pattern.search(sql, pos)
+            if not m:
+                break
+            end = cls.match_paren(sql, m.end() - 1)
+            args = [cls.rewrite_calls(a, name, func) for a in cls.split_args(sql[m.end(): end])]
+            out.append(sql[pos: m.start()])
+            out.append(func(args))
+            pos = end + 1
+        out.append(sql[pos:])
+        return ''.join(out)
+
+    @classmethod
+    def find_top_level(cls, sql, pattern):
+        """括号外第一次匹配的位置"""
+        for m in re.finditer(pattern, sql, re.I):
+            if sql[:m.start()].count('(') == sql[:m.start()].count(')'):
+                return m
+        return None
+
+    # ---------- 表达式 ----------
+
+    @classmethod
+    def rewrite_map(cls, args):
+        keys = args[0::2]
+        values = args[1::2]
+        return f"map([{', '.join(keys)}], [{', '.join(values)}])"
+
+    @classmethod
+    def rewrite_named_struct(cls, args):
+        return '{' + ', '.join(f'{k}: {v}' for k, v in zip(args[0::2], args[1::2])) + '}'
+
+    @classmethod
+    def rewrite_concat_ws(cls, args):
+        # concat_ws(',', collect_set(x)) 第二个参数为数组
+        if len(args) == 2 and re.match(r'(list_|list\()', args[1]):
+            return f'array_to_string({args[1]}, {args[0]})'
+        return f"concat_ws({', '.join(args)})"
+
+    @classmethod
+    def rewrite_substr(cls, name):
+        def func(args):
+            # hive substr 起始位置0等同于1
+            if len(args) > 1 and args[1] == '0':
+                args[1] = '1'
+            return f"{name}({', '.join(args)})"
+        return func
+
+    @classmethod
+    def rewrite_expr(cls, sql):
+        sql = sql.replace('`', '"')
+        sql = re.sub(r'\bcurrent_date\s*\(\s*\)', 'current_date', sql, flags=re.I)
+        sql = re.sub(r'\bcurrent_timestamp\s*\(\s*\)', 'current_timestamp', sql, flags=re.I)
+        # hive: group by a, b grouping sets(...) -> group by grouping sets(...)
+        sql = re.sub(r'\bgroup\s+by\s+[^()]*?\s+grouping\s+sets\b', 'group by grouping sets', sql, flags=re.I)
+        sql = cls.rewrite_calls(sql, 'collect_set', lambda a: f'list_distinct(list({a[0]}))')
+        sql = cls.rewrite_calls(sql, 'collect_list', lambda a: f'list({a[0]}) filter (where {a[0]} is not null)')
+        for old, new in RENAME_FUNCS.items():
+            sql = cls.rewrite_calls(sql, old, lambda a, new=new: f"{new}({', '.join(a)})")
+        sql = cls.rewrite_calls(sql, 'concat_ws', cls.rewrite_concat_ws)
+        sql = cls.rewrite_calls(sql, 'assert_true', lambda a: f"case when {a[0]} then null else error('assert_true') end")
+        sql = cls.rewrite_calls(sql, 'map', cls.rewrite_map)
+        sql = cls.rewrite_calls(sql, 'named_struct', cls.rewrite_named_struct)
+        sql = cls.rewrite_calls(sql, 'substr', cls.rewrite_substr('substr'))
+        sql = cls.rewrite_calls(sql, 'substring', cls.rewrite_substr('substring'))
+        return sql
+
+    @classmethod
+    def rewrite_type(cls, sql):
+        sql = re.sub(r'\bmap\s*<\s*(\w+)\s*,\s*(\w+)\s*>', r'map(\1, \2)', sql, flags=re.I)
+        sql = re.sub(r'\barray\s*<\s*(\w+)\s*>', r'\1[]', sql, flags=re.I)
+        return sql
+
+    # ---------- 表结构 ----------
+
+    def table_columns(self, table):
+        schema, name = table.split('.') if '.' in table else ('main', table)
+        rows = self.conn.execute(
+            'select column_name, data_type from information_schema.columns '
+            'where table_schema = ? and table_name = ? order by ordinal_position', [schema, name]).fetchall()
+        if not rows:
+            raise ValueError(f'table not found: {table}')
+        return rows
+
+    @classmethod
+    def schema_ddl(cls, table):
+        if '.' in table:
+            return [f'create schema if not exists {table.split(".")[0]}']
+        return []
+
+    @classmethod
+    def parse_partition(cls, spec, literals):
+        """partition (a='x', b) -> [(a, 'x'), (b, None)]"""
+        res = []
+        for item in cls.split_args(spec):
+            if '=' in item:
+                k, v = item.split('=', 1)
+                res.append((k.strip().strip('"'), cls.literal_value(v, literals)))
+            else:
+                res.append((item.strip().strip('"'), None))
+        return res
+
+    @classmethod
+    def where_static(cls, part_list):
+        return ' and '.join(f"\"{k}\" = '{v}'" for k, v in part_list if v is not None)
+
+    # ---------- 语句 ----------
+
+    def translate(self, statement):
+        """
+        :return: 可直接执行的 DuckDB 语句列表, 每项为 (sql, 写入的表名或None)
+        """
+        masked, literals = self.mask(statement)
+        masked = masked.strip()
+        head = re.sub(r'\s+', ' ', masked[:200]).lower()
+
+        if re.match(r'(set|add jar|msck|analyze|reset) ', head + ' '):
+            return []
+        if head.startswith('create database') or head.startswith('create schema'):
+            name = re.search(r'exists\s+(\w+)|database\s+(\w+)', masked, re.I)
+            return [(f'create schema if not exists {name.group(1) or name.group(2)}', None)]
+        if head.startswith('alter table') and ' drop ' in head:
+            return self.translate_drop_partition(masked, literals)
+        if head.startswith('alter table'):
+            return []
+        if head.startswith('create') and ' table ' in head:
+            return self.translate_create(masked, literals)
+        if head.startswith('load data'):
+            return self.translate_load(masked, literals)
+        if head.startswith('insert'):
+            return self.translate_insert(masked, literals)
+        if head.startswith('drop table'):
+            return [(self.unmask(re.sub(r'\s+purge\s*$', '', masked, flags=re.I), literals), None)]
+        return [(self.unmask(self.rewrite_expr(masked), literals), None)]
+
+    def translate_create(self, sql, literals):
+        m = re.match(r'create\s+(?:external\s+)?table\s+(?:if\s+not\s+exists\s+)?([\w.]+)\s*(.*)$', sql, re.I | re.S)
+        table, rest = m.group(1), m.group(2)
+        res = [(s, None) for s in self.schema_ddl(table)]
+
+        like = re.match(r'like\s+([\w.]+)', rest, re.I)
+        if like:
+            return res + [(f'create table if not exists {table} as select * from {like.group(1)} limit 0', None)]
+        as_select = re.match(r'(?:.*?\s)?as\s+(select|with)\b(.*)$', rest, re.I | re.S)
+        if not rest.startswith('(') and as_select:
+            body = self.rewrite_expr(as_select.group(1) + as_select.group(2))
+            return res + [(self.unmask(f'create table if not exists {table} as {body}', literals), None)]
+
+        rest = self.rewrite_type(rest)
+        end = self.match_paren(rest, 0)
+        cols = self.split_args(rest[1: end])
+        tail = rest[end + 1:]
+        part = re.search(r'partitioned\s+by\s*\(', tail, re.I)
+        if part:
+            p_end = self.match_paren(tail, part.end() - 1)
+            cols += self.split_args(tail[part.end(): p_end])
+
+        clean = []
+        for col in cols:
+            col = re.sub(r'\bcomment\s+\x00\d+\x00', '', col, flags=re.I)
+            col = re.sub(r'--[^\n]*', '', col).strip()
+            if col:
+                clean.append(col.replace('`', '"'))
+        ddl = f'create table if not exists {table} (\n    ' + ',\n    '.join(clean) + '\n)'
+        return res + [(self.unmask(ddl, literals), None)]
+
+    def translate_load(self, sql, literals):
+        m = re.match(r'load\s+data\s+(?:local\s+)?inpath\s+(\x00\d+\x00)\s+(overwrite\s+)?into\s+table\s+([\w.]+)'
+                     r'(?:\s+partition\s*\((.*)\))?\s*$', sql, re.I | re.S)
+        path = self.literal_value(m.group(1), literals)
+        table = m.group(3)
+        part_list = self.parse_partition(m.group(4), literals) if m.group(4) else []
+        part_names = set(k for k, _ in part_list)
+
+        if os.path.isdir(path):
+            source = f"read_parquet('{os.path.join(path, '**', '*.parquet')}', hive_partitioning=false)"
+        else:
+            cols = [(c, t) for c, t in self.table_columns(table) if c not in part_names]
+            columns = ', '.join(f"'{c}': '{t}'" for c, t in cols)
+            source = (f"read_csv('{path}', delim='\x01', header=false, auto_detect=false, "
+                      f"null_padding=true, columns={{{columns}}})")
+        cols = [c for c, _ in self.table_columns(table) if c not in part_names]
+        select = ', '.join(f'"{c}"' for c in cols) + ''.join(f", '{v}' as \"{k}\"" for k, v in part_list)
+
+        res = []
+        if m.group(2):
+            where = self.where_static(part_list)
+            res.append((f'delete from {table}' + (f' where {where}' if where else ''), None))
+        res.append((f'insert into {table} by name select {select} from {source}', table))
+        return res
+
+    def translate_insert(self, sql, literals):
+        m = re.match(r'insert\s+(overwrite|into)\s+(?:table\s+)?([\w.]+)\s*(.*)$', sql, re.I | re.S)
+        overwrite = m.group(1).lower() == 'overwrite'
+        table, rest = m.group(2), m.group(3)
+
+        part_list = []
+        if re.match(r'partition\s*\(', rest, re.I):
+            p_start = rest.index('(')
+            p_end = self.match_paren(rest, p_start)
+            part_list = self.parse_partition(rest[p_start + 1: p_end], literals)
+            rest = rest[p_end + 1:].strip()
+
+        # distribute by / cluster by 只影响hive的文件分布
+        tail = self.find_top_level(rest, r'\b(distribute|cluster|sort)\s+by\b')
+        if tail:
+            rest = rest[:tail.start()]
+        query = self.unmask(self.rewrite_expr(rest.strip()), literals)
+
+        if not part_list:
+            res = [(f'delete from {table}', None)] if overwrite else []
+            return res + [(f'insert into {table} {query}', table)]
+
+        static = [(k, v) for k, v in part_list if v is not None]
+        dynamic = [k for k, v in part_list if v is None]
+        part_names = set(k for k, _ in part_list)
+        cols = [c for c, _ in self.table_columns(table) if c not in part_names]
+        target = ', '.join(f'"{c}"' for c in cols + dynamic + [k for k, _ in static])
+        consts = ''.join(f", '{v}'" for _, v in static)
+
+        res = [('drop table if exists __hive_stage', None),
+               (f'create temp table __hive_stage as {query}', None)]
+        if overwrite:
+            where = self.where_static(static)
+            if dynamic:
+                res.append((DynamicDelete(table, where, dynamic), None))
+            else:
+                res.append((f'delete from {table} where {where}', None))
+        res.append((f'insert into {table} ({target}) select *{consts} from __hive_stage', table))
+        res.append(('drop table if exists __hive_stage', None))
+        return res
+
+    def translate_drop_partition(self, sql, literals):
+        m = re.match(r'alter\s+table\s+([\w.]+)\s+drop\s+(?:if\s+exists\s+)?(.*)$', sql, re.I | re.S)
+        table = m.group(1)
+        conds = []
+        for spec in re.finditer(r'partition\s*\(', m.group(2), re.I):
+            end = self.match_paren(m.group(2), spec.end() - 1)
+            items = self.split_args(m.group(2)[spec.end(): end])
+            conds.append('(' + ' and '.join(i.replace('`', '"') for i in items) + ')')
+        return [(self.unmask(f'delete from {table} where ' + ' or '.join(conds), literals), None)]
+
+
+class DynamicDelete(object):
+    """动态分区覆盖: 执行时才知道临时表的分区列名, 删除临时表中出现的分区"""
+
+    def __init__(self, table, where, dynamic):
+        self.table = table
+        self.where = where
+        self.dynamic = dynamic
+
+    def sql(self, conn):
+        stage_cols = [i[0] for i in conn.execute('describe __hive_stage').fetchall()]
+        stage_part = stage_cols[-len(self.dynamic):]
+        cond = (f"({', '.join(chr(34) + c + chr(34) for c in self.dynamic)}) in "
+                f"(select distinct {', '.join(chr(34) + c + chr(34) for c in stage_part)} from __hive_stage)")
+        if self.where:
+            cond = f'{self.where} and {cond}'
+        return f'delete from {self.table} where {cond}'
+
+
+class DuckDbExecutor(BaseExecutor):
+    """本地 DuckDB 文件库, 库文件默认 ts/data/warehouse.duckdb, 可用环境变量 DUCKDB_PATH 指定"""
+
+    def __init__(self, db_path=None):
+        import duckdb
+        self.db_path = db_path or os.environ.get('DUCKDB_PATH') or os.path.join(
+            PathUtil.get_root_abs_path(), 'ts', 'data', 'warehouse.duckdb')
+        self.conn = duckdb.connect(self.db_path)
+        for macro in MACROS:
+            self.conn.execute(macro)
+        self.translator = HiveToDuckDb(self.conn)
+
+    def execute(self, sql, name='sql'):
+        st = time.time()
+        rows = {}
+        done = 0
+        # 每次执行用独立cursor, 多线程并发执行不同文件时临时表互不可见
+        conn = self.conn.cursor()
+        translator = HiveToDuckDb(conn)
+        try:
+            for statement in split_statements(sql):
+                try:
+                    for duck_sql, table in translator.translate(statement):
+                        if isinstance(duck_sql, DynamicDelete):
+                            duck_sql = duck_sql.sql(conn)
+                        res = conn.execute(duck_sql).fetchall()
+                        if table and res:
+                            rows[table] = rows.get(table, 0) + res[0][0]
+                except Exception as e:
+                    print(f'DuckDbExecutor {os.path.basename(name)} error statement:\n{statement}')
+                    return SqlResult(name, 1, time.time() - st, rows, statements=done, error=str(e))
+                done += 1
+        finally:
+            conn.close()
+        return SqlResult(name, 0, time.time() - st, rows, statements=done)
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    e = DuckDbExecutor(':memory:')
+    print(e.execute("""
+        set mapred.max.split.size=100000000;
+        create table if not exists l1.t (ts_code string comment '代码', m map<int, double>) comment 't'
+        partitioned by (trade_month string) stored as orc;
+        insert overwrite table l1.t partition (trade_month)
+        select 'a', map(1, 1.0, -1, 2.0), substr('20230713', 0, 6) distribute by 1;
+    """))
+    print(e.conn.execute('select * from l1.t').fetchall())
+    print(e.translator.translate("select concat_ws(',', sort_array(collect_set(a))), date_sub(current_date(), 30) from t"))
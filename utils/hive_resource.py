@@ -0,0 +1,146 @@
+# coding: utf-8
+# hive资源参数按模板自适应: sqlite记录每个模板历次执行的读取字节数/写入行数, 渲染时据此生成 set 语句
+# 追加在 hive_param.sql 之后覆盖默认值, 按数据量调整split/reducer, 大任务加大内存避免溢写
+# 无历史记录(首次执行/非hive_cli执行)时不生成, 沿用 hive_param.sql
+# 按模板文件而非单条语句生成: hive -f 输出的 HDFS Read 无法对应到具体语句, 一个文件内的语句共用一组参数
+
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from utils.path_util import PathUtil
+
+MB = 1 << 20
+GB = 1 << 30
+
+
+class HiveResourceAdvisor(object):
+
+    # 取最近N次成功执行的最大值估计本次数据量
+    HISTORY_RUNS = 5
+    # 每个模板保留的记录数
+    KEEP_RUNS = 30
+    # 写入行数按每行字节数折算, 与读取字节数取大, 覆盖窗口/炸裂等输出大于输入的模板
+    ROW_BYTES = 100
+    # 单个map处理的数据量上下限, 下限与 hive_param.sql 默认一致, 小任务不拆出更多map
+    MIN_SPLIT = 100000000
+    MAX_SPLIT = 256 * MB
+    # 期望的map数, 数据量小于 TARGET_MAPS * MIN_SPLIT 时由 MIN_SPLIT 兜底
+    TARGET_MAPS = 100
+    # 单个reducer处理的数据量及reducer数上限
+    BYTES_PER_REDUCER = 256 * MB
+    MAX_REDUCERS = 200
+    # (数据量上限, container内存mb), 单个task的读取量已由split/reducer上限控制, 内存只在 hive_param.sql 默认的3072上加大
+    MEMORY_TIERS = [
+        (32 * GB, 3072),
+        (None, 4096),
+    ]
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db_path=None):
+        """
+        :param db_path: 默认 ts/data/sql_stats.db
+        """
+        self.db_path = db_path or self.get_db_path()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self._init_table()
+
+    @classmethod
+    def get(cls):
+        """进程内共用一个实例, 避免每次记录/渲染都新开sqlite连接"""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = HiveResourceAdvisor()
+            return cls._instance
+
+    @classmethod
+    def get_db_path(cls):
+        dir_path = os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data')
+        os.makedirs(dir_path, exist_ok=True)
+        return os.path.join(dir_path, 'sql_stats.db')
+
+    def _init_table(self):
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS sql_stats (
+                    name TEXT NOT NULL,                 -- 模板文件名
+                    run_time REAL NOT NULL,             -- 执行结束时间戳
+                    cost REAL DEFAULT 0,                -- 耗时秒
+                    row_count INTEGER DEFAULT 0,        -- 写入行数
+                    hdfs_read INTEGER DEFAULT 0         -- 读取字节数
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_sql_stats_name ON sql_stats (name, run_time)')
+
+    def record(self, name, result):
+        """
+        记录一次成功执行的统计
+        :param name: 模板文件名 daily.sql
+        :param result: SqlResult
+        """
+        # 只有 hive_cli 输出读取字节数, 其他执行方式不记录
+        if not result.ok or not result.hdfs_read:
+            return
+        with self.lock, self.conn:
+            self.conn.execute('INSERT INTO sql_stats VALUES (?, ?, ?, ?, ?)',
+                              (name, time.time(), result.cost, result.total_rows, result.hdfs_read))
+            self.conn.execute('DELETE FROM sql_stats WHERE name = ? AND run_time NOT IN '
+                              '(SELECT run_time FROM sql_stats WHERE name = ? ORDER BY run_time DESC LIMIT ?)',
+                              (name, name, self.KEEP_RUNS))
+
+    def estimate_bytes(self, name):
+        """最近HISTORY_RUNS次执行的最大数据量, 无记录返回None"""
+        row = self.conn.execute(
+            'SELECT max(hdfs_read), max(row_count), count(*) FROM '
+            '(SELECT hdfs_read, row_count FROM sql_stats WHERE name = ? ORDER BY run_time DESC LIMIT ?)',
+            (name, self.HISTORY_RUNS)).fetchone()
+        if not row[2]:
+            return None
+        return max(row[0] or 0, (row[1] or 0) * self.ROW_BYTES)
+
+    @classmethod
+    def advise(cls, input_bytes):
+        """
+        :param input_bytes: 估计的数据量
+        :return: [(参数名, 值)]
+        """
+        split = min(max(input_bytes // cls.TARGET_MAPS, cls.MIN_SPLIT), cls.MAX_SPLIT)
+        reducers = min(max(math.ceil(input_bytes / cls.BYTES_PER_REDUCER), 1), cls.MAX_REDUCERS)
+        memory = next(mb for limit, mb in cls.MEMORY_TIERS if limit is None or input_bytes < limit)
+        # jvm堆占container的80%, 余量给堆外内存
+        java_opts = f'-Xmx{int(memory * 0.8)}m'
+        return [
+            ('mapred.max.split.size', split),
+            ('mapred.min.split.size', split),
+            ('hive.exec.reducers.bytes.per.reducer', cls.BYTES_PER_REDUCER),
+            ('hive.exec.reducers.max', reducers),
+            ('mapreduce.map.memory.mb', memory),
+            ('mapreduce.reduce.memory.mb', memory),
+            ('mapreduce.map.java.opts', java_opts),
+            ('mapreduce.reduce.java.opts', java_opts),
+        ]
+
+    def hints(self, name):
+        """
+        :param name: 模板文件名
+        :return: set语句, 无历史记录时为空串
+        """
+        input_bytes = self.estimate_bytes(name)
+        if input_bytes is None:
+            return ''
+        lines = [f'-- resource hints: {name} estimated input {input_bytes / MB:.1f}MB']
+        lines += [f'set {k}={v};' for k, v in self.advise(input_bytes)]
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == '__main__':
+    for b in [10 * MB, 2 * GB, 50 * GB]:
+        print(b // MB, HiveResourceAdvisor.advise(b))
@@ -0,0 +1,215 @@
+# coding: utf-8
+# 落地台账: 替代 LocalPickleUtil, sqlite(WAL)按 (task, ts_code, dt) 记录每次拉数的状态/行数/校验和
+# 状态流转 fetched(已拉取) -> committed(已写入落地文件) -> loaded(已入ODS)
+# 覆盖范围 = loaded + 当天committed(落地文件还在, 待当天load); 更早committed未load的文件已不在当天glob内, 视为缺失
+# 每个实例一个sqlite连接, 用 with IngestLedger(...) as ledger 保证关闭
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from utils.now import Now
+from utils.path_util import PathUtil
+
+
+class IngestLedger(object):
+
+    FETCHED = 'fetched'
+    COMMITTED = 'committed'
+    LOADED = 'loaded'
+    # 快照表初始化完成的标记记录
+    SNAPSHOT_KEY = ('__snapshot__', '00000000')
+
+    def __init__(self, cls, db_path=None):
+        """
+        :param cls: 任务类或任务名
+        :param db_path: 默认 ts/data/ingest_ledger.db
+        """
+        if isinstance(cls, type(type)):
+            self.task = cls.__name__
+        else:
+            self.task = str(cls)
+        self.db_path = db_path or self.get_db_path()
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self._init_table()
+        self._migrate_pickle()
+        # 内存索引, O(1)判断是否已完成
+        self.done = set()
+        self.pending = set()
+        self.reload()
+
+    @classmethod
+    def get_db_path(cls):
+        dir_path = os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data')
+        if not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        return os.path.join(dir_path, 'ingest_ledger.db')
+
+    @classmethod
+    def checksum(cls, df):
+        """df内容校验和, 与行顺序相关"""
+        if df is None or df.shape[0] == 0:
+            return ''
+        return hashlib.md5(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+    def _init_table(self):
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_ledger (
+                    task TEXT NOT NULL,                 -- 任务类名
+                    ts_code TEXT NOT NULL DEFAULT '',   -- 股票代码, 按日期拉数时为空
+                    dt TEXT NOT NULL,                   -- 日期yyyymmdd
+                    status TEXT NOT NULL,               -- fetched/committed/loaded
+                    row_count INTEGER DEFAULT 0,        -- 行数
+                    checksum TEXT DEFAULT '',           -- 内容校验和
+                    update_time REAL,                   -- 更新时间戳
+                    PRIMARY KEY (task, ts_code, dt)
+                )
+            ''')
+
+    def _migrate_pickle(self):
+        """旧 ts/data/<task>.pickle 导入台账, 只在台账中无该任务记录时执行一次"""
+        file_name = os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data', f'{self.task}.pickle')
+        if not os.path.exists(file_name):
+            return
+        row = self.conn.execute('SELECT 1 FROM ingest_ledger WHERE task = ? LIMIT 1', (self.task,)).fetchone()
+        if row:
+            return
+        with open(file_name, 'rb') as f:
+            data = pickle.load(f)
+        now = time.time()
+        rows = [(self.task, code, str(dt), self.LOADED, 0, '', now)
+                for code, dt_set in data.items() for dt in dt_set]
+        with self.lock, self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO ingest_ledger VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        print(f'IngestLedger {self.task} migrate {len(rows)} rows from {file_name}.')
+
+    @classmethod
+    def today_begin(cls):
+        return time.mktime(Now().now.date().timetuple())
+
+    def reload(self):
+        rows = self.conn.execute(
+            'SELECT ts_code, dt FROM ingest_ledger WHERE task = ? AND (status = ? OR (status = ? AND update_time >= ?))',
+            (self.task, self.LOADED, self.COMMITTED, self.today_begin())).fetchall()
+        self.done = set((code, dt) for code, dt in rows)
+        self.pending = set()
+
+    def exists(self, dt, code=''):
+        return (code, str(dt)) in self.done
+
+    def missing(self, date_list, lookback=0, code=''):
+        """
+        未覆盖的日期, 最近lookback个日期无论是否已覆盖都重拉, 用于数据源的延迟修正
+        :param date_list: 升序日期列表
+        """
+        recent = set(date_list[-lookback:]) if lookback else set()
+        return [dt for dt in date_list if dt in recent or (code, str(dt)) not in self.done]
+
+    def has_unloaded(self):
+        """当天是否有已写落地文件但还未入ODS的记录"""
+        row = self.conn.execute('SELECT 1 FROM ingest_ledger WHERE task = ? AND status = ? AND update_time >= ? LIMIT 1',
+                                (self.task, self.COMMITTED, self.today_begin())).fetchone()
+        return row is not None
+
+    def mark_loaded(self):
+        """入ODS成功后, 当天committed记录标记为loaded"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                'UPDATE ingest_ledger SET status = ?, update_time = ? WHERE task = ? AND status = ? AND update_time >= ?',
+                (self.LOADED, time.time(), self.task, self.COMMITTED, self.today_begin()))
+
+    def record(self, dt, code='', df=None, row_count=None):
+        """拉取成功立即记一条fetched, 落地文件滚动后再commit"""
+        dt = str(dt)
+        if row_count is None:
+            row_count = 0 if df is None else df.shape[0]
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO ingest_ledger VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self.task, code, dt, self.FETCHED, row_count, self.checksum(df), time.time()))
+            self.pending.add((code, dt))
+
+    def commit(self, keys=None):
+        """
+        将fetched标记为committed, 一个事务内完成
+        :param keys: [(code, dt)], 默认全部pending
+        """
+        keys = self.pending if keys is None else set((code, str(dt)) for code, dt in keys)
+        if not keys:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'UPDATE ingest_ledger SET status = ?, update_time = ? WHERE task = ? AND ts_code = ? AND dt = ?',
+                [(self.COMMITTED, time.time(), self.task, code, dt) for code, dt in keys])
+            self.done |= keys
+            self.pending -= keys
+
+    def min_dt_since(self, since):
+        """
+        since之后写入的最早日期, 用于下游按变更范围增量重算
+        :param since: 时间戳
+        :return: yyyymmdd 或 None
+        """
+        row = self.conn.execute('SELECT min(dt) FROM ingest_ledger WHERE task = ? AND update_time >= ? AND ts_code != ?',
+                                (self.task, since, self.SNAPSHOT_KEY[0])).fetchone()
+        return row[0]
+
+    def max_dt_since(self, since):
+        """
+        since之后写入的最晚日期
+        :param since: 时间戳
+        :return: yyyymmdd 或 None
+        """
+        row = self.conn.execute('SELECT max(dt) FROM ingest_ledger WHERE task = ? AND update_time >= ? AND ts_code != ?',
+                                (self.task, since, self.SNAPSHOT_KEY[0])).fetchone()
+        return row[0]
+
+    def snapshot_ready(self):
+        """ods.<table>_snap 是否已由旧的全量分区初始化"""
+        code, dt = self.SNAPSHOT_KEY
+        row = self.conn.execute('SELECT 1 FROM ingest_ledger WHERE task = ? AND ts_code = ? AND dt = ? AND status = ?',
+                                (self.task, code, dt, self.LOADED)).fetchone()
+        return row is not None
+
+    def mark_snapshot_ready(self):
+        code, dt = self.SNAPSHOT_KEY
+        with self.lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO ingest_ledger VALUES (?, ?, ?, ?, ?, ?, ?)',
+                              (self.task, code, dt, self.LOADED, 0, '', time.time()))
+
+    def remove(self, dt_list, code=''):
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM ingest_ledger WHERE task = ? AND ts_code = ? AND dt = ?',
+                                  [(self.task, code, str(dt)) for dt in dt_list])
+        self.done -= set((code, str(dt)) for dt in dt_list)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+if __name__ == '__main__':
+    with IngestLedger('IngestLedgerDemo') as a:
+        dtt = 20230101
+        print(a.exists(dtt))
+        a.record(dtt, df=pd.DataFrame({'a': [1, 2]}))
+        print(a.exists(dtt))
+        a.commit()
+        print(a.exists(dtt))
+        a.remove([dtt])
+        print(a.exists(dtt))
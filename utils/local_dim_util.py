@@ -1,32 +1,45 @@
 # coding: utf-8
 
+import os
+
 import pandas as pd
 
 from utils.now import Now
+from utils.path_util import PathUtil
 
 
 class LocalDimUtil(object):
 
+    # 进程内缓存, 同一进程多个任务只读一次文件
+    _cache = {}
+
+    @classmethod
+    def read_csv(cls, file_name):
+        path = os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data', file_name)
+        mtime = os.path.getmtime(path)
+        cached = cls._cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, pd.read_csv(path, sep='\u0001', header=0))
+            cls._cache[path] = cached
+        return cached[1]
+
     @classmethod
     def get_stock_df(cls):
-        df = pd.read_csv('../ts/data/stock_basic.csv', sep='\u0001', header=0)
-        print(df.head())
-        return df
+        return cls.read_csv('stock_basic.csv')
 
     @classmethod
     def get_date_df(cls, is_open=True):
-        df = pd.read_csv('../ts/data/trade_cal.csv', sep='\u0001', header=0)
+        df = cls.read_csv('trade_cal.csv')
         df1 = df[
             (df['cal_date'] >= 20000101)
             & (df['cal_date'] <= int(Now().datekey))
         ]
         if is_open:
             df1 = df1[df1['is_open'] == 1]
-        df1.set_index(df1['cal_date'], inplace=True)
-        print(df1.head())
+        df1 = df1.set_index(df1['cal_date'])
         return df1
 
 
 if __name__ == '__main__':
-    LocalDimUtil.get_date_df()
+    print(LocalDimUtil.get_date_df().head())
     # LocalDimUtil.get_stock_df()
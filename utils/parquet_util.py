@@ -0,0 +1,70 @@
+# coding: utf-8
+# ODS落地文件的parquet格式: 按分区列写目录, 压缩存储, hive直接load无需解析文本
+
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pyarrow.types as pa_types
+
+
+class ParquetUtil(object):
+
+    COMPRESSION = 'snappy'
+
+    @classmethod
+    def normalize(cls, df):
+        """统一列类型, 保证多次写入的文件schema一致: 数值->double, 其余->string"""
+        dtypes = {}
+        for col in df.columns:
+            if pd.api.types.is_bool_dtype(df[col]):
+                dtypes[col] = 'string'
+            elif pd.api.types.is_numeric_dtype(df[col]):
+                dtypes[col] = 'float64'
+            else:
+                dtypes[col] = 'string'
+        return df.astype(dtypes)
+
+    @classmethod
+    def list_partitions(cls, dir_path, partition_col):
+        """数据集下的分区值列表"""
+        if not os.path.exists(dir_path):
+            return []
+        prefix = partition_col + '='
+        return sorted(i[len(prefix):] for i in os.listdir(dir_path) if i.startswith(prefix))
+
+    @classmethod
+    def read_schema(cls, dir_path):
+        for root, _, files in os.walk(dir_path):
+            files = [f for f in files if f.endswith('.parquet')]
+            if files:
+                return pq.read_schema(os.path.join(root, files[0]))
+        return None
+
+    @classmethod
+    def column_names(cls, dir_path):
+        """数据集字段名, 不含分区列, 用于sql中的字段列表"""
+        schema = cls.read_schema(dir_path)
+        if schema is None:
+            return ''
+        return ', '.join(f'`{field.name}`' for field in schema if not field.name.startswith('__'))
+
+    @classmethod
+    def hive_columns(cls, dir_path):
+        """由数据集schema生成hive建表字段, 不含分区列"""
+        schema = cls.read_schema(dir_path)
+        if schema is None:
+            return ''
+
+        cols = []
+        for field in schema:
+            if field.name.startswith('__'):
+                continue
+            if pa_types.is_floating(field.type):
+                t = 'double'
+            elif pa_types.is_integer(field.type):
+                t = 'bigint'
+            else:
+                t = 'string'
+            cols.append(f'`{field.name}` {t}')
+        return ',\n    '.join(cols)
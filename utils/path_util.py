@@ -21,24 +21,21 @@ class PathUtil(object):
     def get_sql_template_dir(cls, cata=None):
         root_path = cls.get_root_abs_path()
         path = os.path.join(root_path, 'sql_template', cata or '')
-        if not os.path.exists(path):
-            os.mkdir(path)
+        os.makedirs(path, exist_ok=True)
         return path
 
     @classmethod
     def get_sql_file_dir(cls):
         root_path = cls.get_root_abs_path()
         path = os.path.join(root_path, 'sql_files')
-        if not os.path.exists(path):
-            os.mkdir(path)
+        os.makedirs(path, exist_ok=True)
         return path
 
     @classmethod
     def get_data_file_dir(cls):
         root_path = cls.get_root_abs_path()
         path = os.path.join(root_path, 'data_files')
-        if not os.path.exists(path):
-            os.mkdir(path)
+        os.makedirs(path, exist_ok=True)
         return path
 
     @classmethod
@@ -80,6 +77,17 @@ class PathUtil(object):
         f_name = f_list[0] + '_' + Now().datekey + "*." + f_list[1]
         return os.path.join(dir_path, f_name)
 
+    @classmethod
+    def get_data_dir_name(cls, file_name):
+        """
+        parquet数据集目录名
+        :param file_name: daily.csv
+        :return: xxx/data_files/daily_20230713_pq
+        """
+        dir_path = cls.get_data_file_dir()
+        f_name = file_name.split('.')[0] + '_' + Now().datekey + '_pq'
+        return os.path.join(dir_path, f_name)
+
     @classmethod
     def get_sql_file_name(cls, file_name):
         """
@@ -103,3 +111,4 @@ if __name__ == '__main__':
     print(p.get_data_file_dir())
     print(p.get_data_file_name('stock_basic.csv'))
     print(p.get_data_file_ambiguous_name('stock_basic.csv'))
+    print(p.get_data_dir_name('daily.csv'))
@@ -0,0 +1,45 @@
+# coding: utf-8
+# 长任务进度: 已完成数/总数, 速率及预计剩余时间
+
+import time
+
+
+class Progress(object):
+
+    def __init__(self, total):
+        """
+        :param total: 总任务数
+        """
+        self.total = total
+        self.done = 0
+        self.start = time.time()
+
+    @classmethod
+    def format_seconds(cls, seconds):
+        seconds = int(seconds)
+        return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+    def step(self, n=1):
+        self.done += n
+        return self
+
+    @property
+    def eta(self):
+        cost = time.time() - self.start
+        if self.done == 0:
+            return None
+        return cost / self.done * (self.total - self.done)
+
+    def __str__(self):
+        cost = time.time() - self.start
+        pct = self.done * 100.0 / self.total if self.total else 100.0
+        speed = self.done / cost if cost > 0 else 0
+        eta = '--:--:--' if self.eta is None else self.format_seconds(self.eta)
+        return f'{self.done}/{self.total} {pct:.1f}% {speed:.1f}/s eta:{eta}'
+
+
+if __name__ == '__main__':
+    p = Progress(5)
+    for i in range(5):
+        time.sleep(0.2)
+        print(p.step())
@@ -0,0 +1,116 @@
+# coding: utf-8
+# tushare 接口限流: 令牌桶, 按接口名共享, 线程安全
+
+import threading
+import time
+
+# tushare 各接口每分钟调用上限(按当前积分档位), 未列出的按 DEFAULT_RATE
+TS_API_QUOTA = {
+    'daily': 500,
+    'daily_basic': 500,
+    'adj_factor': 500,
+    'moneyflow': 300,
+    'moneyflow_hsgt': 300,
+    'hk_hold': 120,
+    'stk_holdernumber': 300,
+    'fina_mainbz': 60,
+    'ths_daily': 300,
+    'ths_index': 300,
+    'ths_member': 300,
+    'stock_basic': 300,
+    'stock_company': 300,
+    'trade_cal': 300,
+    'index_daily': 500,
+}
+DEFAULT_RATE = 500
+
+
+class TokenBucket(object):
+    """令牌桶, rate为每分钟令牌数, capacity为最大突发数"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, int(rate / 60)))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate / 60.0)
+        self.last = now
+
+    def acquire(self, n=1):
+        """阻塞直到拿到n个令牌"""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) * 60.0 / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter(object):
+    """按接口名注册令牌桶, 同一进程内所有任务共享同一接口的额度, 可另设所有接口共享的总额度"""
+
+    _buckets = {}
+    _global = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure_global(cls, rate):
+        """所有接口合计每分钟调用次数, None为不限"""
+        with cls._lock:
+            cls._global = TokenBucket(rate) if rate else None
+
+    @classmethod
+    def configure(cls, api_name, rate):
+        """声明接口每分钟调用次数, 覆盖 TS_API_QUOTA"""
+        with cls._lock:
+            bucket = cls._buckets.get(api_name)
+            if bucket is None or bucket.rate != float(rate):
+                cls._buckets[api_name] = TokenBucket(rate)
+
+    @classmethod
+    def get(cls, api_name):
+        with cls._lock:
+            if api_name not in cls._buckets:
+                cls._buckets[api_name] = TokenBucket(TS_API_QUOTA.get(api_name, DEFAULT_RATE))
+            return cls._buckets[api_name]
+
+    @classmethod
+    def acquire(cls, api_name, n=1):
+        cls.get(api_name).acquire(n)
+        if cls._global is not None:
+            cls._global.acquire(n)
+
+
+class RateLimitedPro(object):
+    """包装 tushare pro_api, 每次接口调用前按接口名取令牌"""
+
+    def __init__(self, pro):
+        self._pro = pro
+
+    def __getattr__(self, api_name):
+        func = getattr(self._pro, api_name)
+        if not callable(func):
+            return func
+
+        def wrapper(*args, **kwargs):
+            RateLimiter.acquire(api_name)
+            return func(*args, **kwargs)
+        return wrapper
+
+    def query(self, api_name, fields='', **kwargs):
+        RateLimiter.acquire(api_name)
+        return self._pro.query(api_name, fields=fields, **kwargs)
+
+
+if __name__ == '__main__':
+    RateLimiter.configure('demo', 120)
+    st = time.time()
+    for i in range(5):
+        RateLimiter.acquire('demo')
+        print(i, round(time.time() - st, 2))
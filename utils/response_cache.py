@@ -0,0 +1,163 @@
+# coding: utf-8
+# tushare 接口结果本地缓存: 按 接口名+参数+字段 做key, zstd压缩parquet落盘, 按接口TTL过期, 总大小超限按LRU淘汰
+# 命中缓存不调用接口, 也不消耗限流令牌
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.now import Now
+from utils.path_util import PathUtil
+
+# 各接口缓存秒数, 未列出的按 DEFAULT_TTL; 查询日期早于 HISTORY_DAYS 天前的结果视为不再变化, 永不过期
+# ODS每天跑一次, TTL须远小于一天, 否则次日提前几秒执行会命中前一天的结果(漏掉新股等), 缓存只服务当天重跑/断点续跑
+DEFAULT_TTL = 6 * 3600
+API_TTL = {}
+HISTORY_DAYS = 7
+# 缓存目录最大字节数
+MAX_BYTES = 2 * 1024 ** 3
+
+
+class ResponseCache(object):
+
+    def __init__(self, cache_dir=None, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir or os.path.join(PathUtil.get_root_abs_path(), 'ts', 'data', 'api_cache')
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    @classmethod
+    def make_key(cls, api_name, params, fields):
+        if isinstance(fields, (list, tuple)):
+            fields = ','.join(fields)
+        raw = json.dumps({'api': api_name, 'params': params, 'fields': fields or ''},
+                         sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_ttl(cls, api_name, params):
+        """参数中的日期都早于HISTORY_DAYS天前时返回None, 表示永不过期"""
+        dates = [str(params[k]) for k in ('trade_date', 'end_date', 'period') if params.get(k)]
+        if dates and max(dates) < Now().delta(HISTORY_DAYS).datekey:
+            return None
+        return API_TTL.get(api_name, DEFAULT_TTL)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.parquet')
+
+    def get(self, api_name, params, fields):
+        path = self._path(self.make_key(api_name, params, fields))
+        if not os.path.exists(path):
+            return None
+        try:
+            ttl = self.get_ttl(api_name, params)
+            # 写入时间存在parquet footer, 只读footer判断是否过期
+            if ttl is not None:
+                meta = pq.read_metadata(path).metadata or {}
+                if time.time() - float(meta.get(b'cache_time', 0)) > ttl:
+                    return None
+            df = pq.read_table(path).to_pandas()
+        except Exception as e:
+            print(f'ResponseCache read {path} error:{e}')
+            return None
+        # mtime记录最近访问时间, 用于LRU淘汰
+        os.utime(path)
+        return df
+
+    def put(self, api_name, params, fields, df):
+        """空结果不缓存, 避免把未出数的日期缓存下来"""
+        if df is None or df.shape[0] == 0:
+            return
+        path = self._path(self.make_key(api_name, params, fields))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            meta = dict(table.schema.metadata or {})
+            meta[b'cache_time'] = str(time.time()).encode()
+            pq.write_table(table.replace_schema_metadata(meta), tmp_path, compression='zstd')
+        except Exception as e:
+            print(f'ResponseCache write {path} error:{e}')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        os.replace(tmp_path, path)
+        self._add_bytes(os.path.getsize(path))
+
+    def _scan(self):
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith('.parquet'):
+                    st = os.stat(os.path.join(root, name))
+                    files.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+        return files
+
+    def _add_bytes(self, size):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(i[1] for i in self._scan())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """按mtime从旧到新删除, 降到上限的80%"""
+        files = sorted(self._scan())
+        total = sum(i[1] for i in files)
+        target = self.max_bytes * 0.8
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+
+class CachedPro(object):
+    """包装 pro(一般为 RateLimitedPro), 先查本地缓存, 未命中再调用接口并写缓存"""
+
+    def __init__(self, pro, cache=None):
+        self._pro = pro
+        self._cache = cache or ResponseCache()
+        # 设置环境变量 TS_CACHE=0 关闭缓存
+        self.enabled = os.environ.get('TS_CACHE', '1') != '0'
+
+    def _call(self, api_name, func, kwargs):
+        fields = kwargs.get('fields', '')
+        params = {k: v for k, v in kwargs.items() if k != 'fields'}
+        if not self.enabled:
+            return func()
+        df = self._cache.get(api_name, params, fields)
+        if df is not None:
+            return df
+        df = func()
+        self._cache.put(api_name, params, fields, df)
+        return df
+
+    def __getattr__(self, api_name):
+        func = getattr(self._pro, api_name)
+        if not callable(func):
+            return func
+
+        def wrapper(*args, **kwargs):
+            if args:
+                return func(*args, **kwargs)
+            return self._call(api_name, lambda: func(**kwargs), kwargs)
+        return wrapper
+
+    def query(self, api_name, fields='', **kwargs):
+        return self._call(api_name, lambda: self._pro.query(api_name, fields=fields, **kwargs),
+                          dict(kwargs, fields=fields))
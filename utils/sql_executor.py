@@ -0,0 +1,322 @@
+# coding: utf-8
+# sql执行后端: hive命令行 / HiveServer2连接池 / 本地duckdb / dry_run, 由环境变量 SQL_EXECUTOR 选择
+# 统一返回 SqlResult(退出码, 耗时, 各表写入行数)
+
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+
+# hive 输出的写入统计: Partition ods.daily{pt_dt=2023-07-13} stats: [numFiles=1, numRows=5000, ...]
+STATS_PATTERN = re.compile(r'(?:Table|Partition) (\S+?)(\{[^}]*\})? stats: \[[^\]]*?numRows=(\d+)')
+HDFS_READ_PATTERN = re.compile(r'HDFS Read: (\d+)')
+
+
+def split_statements(sql):
+    """按分号切分多条语句, 忽略引号内的分号和 -- 注释"""
+    statements = []
+    buf = []
+    quote = None
+    i = 0
+    while i < len(sql):
+        c = sql[i]
+        if quote:
+            buf.append(c)
+            if c == '\\' and i + 1 < len(sql):
+                buf.append(sql[i + 1])
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in ('"', "'", '`'):
+            quote = c
+            buf.append(c)
+        elif c == '-' and sql[i:i + 2] == '--':
+            j = sql.find('\n', i)
+            i = len(sql) if j < 0 else j
+            continue
+        elif c == ';':
+            statements.append(''.join(buf).strip())
+            buf = []
+        else:
+            buf.append(c)
+        i += 1
+    statements.append(''.join(buf).strip())
+    return [s for s in statements if s]
+
+
+class SqlResult(object):
+
+    def __init__(self, name, exit_code=0, cost=0.0, rows=None, hdfs_read=0, statements=0, error=None):
+        """
+        :param name: sql文件名
+        :param exit_code: 0为成功
+        :param cost: 耗时秒
+        :param rows: {表或分区: 写入行数}
+        :param hdfs_read: 读取字节数
+        :param statements: 执行语句数
+        :param error: 错误信息
+        """
+        self.name = name
+        self.exit_code = exit_code
+        self.cost = cost
+        self.rows = rows or {}
+        self.hdfs_read = hdfs_read
+        self.statements = statements
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+    @property
+    def total_rows(self):
+        return sum(self.rows.values())
+
+    def __str__(self):
+        s = (f'SqlResult {os.path.basename(self.name)} exit_code:{self.exit_code} cost:{self.cost:.1f}s '
+             f'statements:{self.statements} rows:{self.total_rows} hdfs_read:{self.hdfs_read}')
+        for k, v in self.rows.items():
+            s += f'\n    {k}: {v}'
+        if self.error:
+            s += f'\n    error: {self.error}'
+        return s
+
+
+class BaseExecutor(object):
+
+    # load data 的文件是否在执行sql的机器上, 为False时模板用 load data inpath 读 stage 返回的HDFS路径
+    LOCAL_LOAD = True
+
+    def execute(self, sql, name='sql'):
+        raise NotImplementedError
+
+    def stage(self, path):
+        """
+        load data 前的准备
+        :param path: 本地落地文件或目录
+        :return: sql中使用的路径
+        """
+        return path
+
+    def unstage(self, path):
+        """删除 stage 生成的临时文件"""
+        pass
+
+    def execute_file(self, sql_file):
+        with open(sql_file, 'r', encoding='utf-8') as f:
+            return self.execute(f.read(), name=sql_file)
+
+    def close(self):
+        pass
+
+
+class HiveCliExecutor(BaseExecutor):
+    """每个文件起一个 hive -f 进程, 输出实时打印并解析写入行数"""
+
+    def __init__(self, cmd=None):
+        self.cmd = shlex.split(cmd or os.environ.get('HIVE_CMD', 'sudo -u hive hive'))
+
+    @classmethod
+    def parse_output(cls, lines):
+        rows = {}
+        hdfs_read = 0
+        for line in lines:
+            for table, part, num in STATS_PATTERN.findall(line):
+                rows[table + part] = int(num)
+            for num in HDFS_READ_PATTERN.findall(line):
+                hdfs_read += int(num)
+        return rows, hdfs_read
+
+    def execute_file(self, sql_file):
+        st = time.time()
+        print(' '.join(self.cmd + ['-f', sql_file]))
+        try:
+            proc = subprocess.Popen(self.cmd + ['-f', sql_file], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, errors='replace')
+        except OSError as e:
+            # hive/sudo 不在PATH等, 与执行失败一样返回结果
+            return SqlResult(sql_file, 127, time.time() - st, error=str(e))
+        lines = []
+        for line in proc.stdout:
+            print(line, end='')
+            lines.append(line)
+        exit_code = proc.wait()
+        rows, hdfs_read = self.parse_output(lines)
+        error = None if exit_code == 0 else ''.join(lines[-5:]).strip()
+        return SqlResult(sql_file, exit_code, time.time() - st, rows, hdfs_read, error=error)
+
+    def execute(self, sql, name='sql'):
+        # hive -e 对长sql和特殊字符不友好, 统一写临时文件
+        tmp_file = f'/tmp/sql_executor_{os.getpid()}_{threading.get_ident()}.sql'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(sql)
+        try:
+            result = self.execute_file(tmp_file)
+        finally:
+            os.remove(tmp_file)
+        result.name = name
+        return result
+
+
+class Hs2Executor(BaseExecutor):
+    """
+    HiveServer2 连接池, 复用session, 多条语句逐条执行, 依赖 pyhive
+    写入行数/读取字节数从每条语句的操作日志解析, 需服务端 hive.server2.logging.operation.level=VERBOSE,
+    日志级别不够时为空, HiveResourceAdvisor 不记录
+    load data local inpath 的路径在HS2所在机器上解析, 落地文件先由 stage 经 hdfs 命令上传到 HDFS_STAGING_DIR,
+    模板改用 load data inpath, 本机需有 hdfs 客户端(HDFS_CMD)
+    """
+
+    LOCAL_LOAD = False
+
+    def __init__(self, host=None, port=None, username=None, database='default', pool_size=4,
+                 hdfs_cmd=None, staging_dir=None):
+        self.host = host or os.environ.get('HIVE_HOST', '127.0.0.1')
+        self.port = int(port or os.environ.get('HIVE_PORT', 10000))
+        self.username = username or os.environ.get('HIVE_USER', 'hive')
+        self.database = database
+        self.pool = queue.LifoQueue()
+        self.semaphore = threading.Semaphore(pool_size)
+        self.hdfs_cmd = shlex.split(hdfs_cmd or os.environ.get('HDFS_CMD', 'hdfs dfs'))
+        self.staging_dir = staging_dir or os.environ.get('HDFS_STAGING_DIR', '/tmp/soros_staging')
+
+    def _hdfs(self, *args):
+        cmd = self.hdfs_cmd + list(args)
+        print(' '.join(cmd))
+        subprocess.run(cmd, check=True)
+
+    def stage(self, path):
+        """上传到 HDFS_STAGING_DIR 下的独立目录, load data inpath 会把文件移入表目录"""
+        target_dir = f'{self.staging_dir}/{uuid.uuid4().hex}'
+        self._hdfs('-mkdir', '-p', target_dir)
+        self._hdfs('-put', '-f', path, target_dir)
+        return f'{target_dir}/{os.path.basename(path.rstrip(os.sep))}'
+
+    def unstage(self, path):
+        try:
+            self._hdfs('-rm', '-r', '-f', os.path.dirname(path))
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f'Hs2Executor unstage {path} error:{e}')
+
+    def _connect(self):
+        from pyhive import hive
+        return hive.Connection(host=self.host, port=self.port, username=self.username, database=self.database)
+
+    def _acquire(self):
+        self.semaphore.acquire()
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self.semaphore.release()
+                raise
+
+    def _release(self, conn, broken=False):
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        else:
+            self.pool.put(conn)
+        self.semaphore.release()
+
+    def execute(self, sql, name='sql'):
+        st = time.time()
+        statements = split_statements(sql)
+        conn = self._acquire()
+        broken = False
+        done = 0
+        lines = []
+        try:
+            cursor = conn.cursor()
+            for statement in statements:
+                print(f'Hs2Executor {os.path.basename(name)} [{done + 1}/{len(statements)}] {statement[:80]}')
+                cursor.execute(statement)
+                lines += self.fetch_logs(cursor)
+                done += 1
+            cursor.close()
+            # 同一session内的set参数对下个文件仍生效, 重置避免串扰
+            conn.cursor().execute('reset')
+            rows, hdfs_read = HiveCliExecutor.parse_output(lines)
+            return SqlResult(name, 0, time.time() - st, rows, hdfs_read, statements=done)
+        except Exception as e:
+            broken = True
+            rows, hdfs_read = HiveCliExecutor.parse_output(lines)
+            return SqlResult(name, 1, time.time() - st, rows, hdfs_read, statements=done, error=str(e))
+        finally:
+            self._release(conn, broken)
+
+    @classmethod
+    def fetch_logs(cls, cursor):
+        """语句的操作日志, 服务端未开启时为空"""
+        try:
+            return cursor.fetch_logs()
+        except Exception:
+            return []
+
+    def close(self):
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+
+class DryRunExecutor(BaseExecutor):
+    """不连集群, 只切分并记录语句, 用于本地调试"""
+
+    def __init__(self):
+        self.history = []
+
+    def execute(self, sql, name='sql'):
+        statements = split_statements(sql)
+        self.history.append((name, statements))
+        print(f'DryRunExecutor {os.path.basename(name)} statements:{len(statements)}')
+        return SqlResult(name, 0, 0.0, statements=len(statements))
+
+
+class SqlExecutor(object):
+
+    EXECUTORS = {
+        'hive_cli': HiveCliExecutor,
+        'hs2': Hs2Executor,
+        'dry_run': DryRunExecutor,
+    }
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def engine(cls):
+        return os.environ.get('SQL_EXECUTOR', 'hive_cli')
+
+    @classmethod
+    def get(cls):
+        """进程内单例, 按环境变量 SQL_EXECUTOR 选择, 默认 hive_cli"""
+        with cls._lock:
+            if cls._instance is None:
+                if cls.engine() == 'duckdb':
+                    # duckdb 为可选依赖, 用到时才导入
+                    from utils.duckdb_executor import DuckDbExecutor
+                    cls._instance = DuckDbExecutor()
+                else:
+                    cls._instance = cls.EXECUTORS[cls.engine()]()
+            return cls._instance
+
+    @classmethod
+    def set(cls, executor):
+        with cls._lock:
+            cls._instance = executor
+
+
+if __name__ == '__main__':
+    e = DryRunExecutor()
+    print(e.execute("set a=1; -- x;y\nselect ';' from t;\ninsert overwrite table t select 1;"))
+    print(e.history)
+    print(HiveCliExecutor.parse_output([
+        'Partition ods.daily{pt_dt=2023-07-13} stats: [numFiles=1, numRows=5000, totalSize=1, rawDataSize=2]',
+        'Stage-Stage-1: Map: 1   Cumulative CPU: 3.1 sec   HDFS Read: 12345 HDFS Write: 678 SUCCESS',
+    ]))
@@ -0,0 +1,63 @@
+# coding: utf-8
+# 从渲染后的sql中解析读写的表, 用于自动生成任务依赖
+# 只识别带库名的表(db.table), with子句别名等不会被当作表
+
+import re
+
+from utils.sql_executor import split_statements
+
+TABLE = r'(`?\w+`?\.`?\w+`?)'
+STRING_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+READ_PATTERNS = [
+    re.compile(r'\b(?:from|join)\s+' + TABLE, re.I),
+    re.compile(r'\blike\s+' + TABLE, re.I),
+]
+WRITE_PATTERNS = [
+    re.compile(r'\binsert\s+(?:overwrite|into)\s+(?:table\s+)?' + TABLE, re.I),
+    re.compile(r'\bcreate\s+(?:external\s+)?table\s+(?:if\s+not\s+exists\s+)?' + TABLE, re.I),
+    re.compile(r'\bload\s+data\s+(?:local\s+)?inpath\s+\S+\s+(?:overwrite\s+)?into\s+table\s+' + TABLE, re.I),
+    re.compile(r'\bdrop\s+table\s+(?:if\s+exists\s+)?' + TABLE, re.I),
+    re.compile(r'\balter\s+table\s+' + TABLE, re.I),
+]
+
+
+class SqlLineage(object):
+
+    def __init__(self, reads=None, writes=None):
+        self.reads = set(reads or [])
+        self.writes = set(writes or [])
+
+    @classmethod
+    def normalize(cls, table):
+        return table.replace('`', '').lower()
+
+    @classmethod
+    def parse(cls, sql):
+        """
+        :param sql: 渲染后的sql, 可含多条语句
+        :return: SqlLineage, reads不含本身写入的表
+        """
+        reads = set()
+        writes = set()
+        for statement in split_statements(sql):
+            # load data 的路径也是字符串, 先匹配写入再去掉字符串
+            for pattern in WRITE_PATTERNS:
+                writes.update(cls.normalize(i) for i in pattern.findall(statement))
+            statement = STRING_PATTERN.sub("''", statement)
+            for pattern in READ_PATTERNS:
+                reads.update(cls.normalize(i) for i in pattern.findall(statement))
+        return SqlLineage(reads - writes, writes)
+
+    def __repr__(self):
+        return f'SqlLineage(reads={sorted(self.reads)}, writes={sorted(self.writes)})'
+
+
+if __name__ == '__main__':
+    print(SqlLineage.parse("""
+        drop table if exists l1.t;
+        create table if not exists l1.t like ods_incr.t stored as orc;
+        -- from l1.comment_table
+        with a as (select * from ods.daily_snap where name != 'from x.y')
+        insert overwrite table l1.t partition (trade_month)
+        select * from a join `l1`.`dim_stock` s on a.ts_code = s.ts_code left join (select 1 from l1.t) b;
+    """))
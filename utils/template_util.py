@@ -1,9 +1,21 @@
 # coding: utf-8
 # https://cheetahtemplate.org/users_guide/index.html
 
+import os
+import threading
+
 from Cheetah.Template import Template
+from utils.hive_resource import HiveResourceAdvisor
 from utils.now import Now
 from utils.path_util import PathUtil
+from utils.sql_executor import SqlExecutor
+
+
+# 进程内编译好的模板类, key为组成模板的文件及其mtime, 文件修改后自动重新编译
+_COMPILED = {}
+# hive_param.sql 等纯文本文件
+_TEXT = {}
+_LOCK = threading.Lock()
 
 
 class TemplateUtil(object):
@@ -16,37 +28,105 @@ class TemplateUtil(object):
         self.search_list = search_list or dict()
         if 'now' not in self.search_list:
             self.search_list['now'] = Now()
+        # 模板中可按 $engine 区分 hive / duckdb 写法
+        if 'engine' not in self.search_list:
+            self.search_list['engine'] = SqlExecutor.engine()
+        self._sql = None
+
+    @classmethod
+    def _read(cls, path):
+        """按mtime缓存的文件内容"""
+        mtime = os.path.getmtime(path)
+        cached = _TEXT.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(file=path, encoding='utf-8') as f:
+            text = f.read()
+        _TEXT[path] = (mtime, text)
+        return text
 
     @property
-    def _tpl_str(self):
-        res = ''
-        # hive参数
-        with open(file=PathUtil.get_sql_template_file_name('hive_param.sql'), encoding='utf-8') as f:
-            res += f.read()
+    def _tpl_paths(self):
         # ddl
-        with open(file=self.file_path, encoding="utf-8") as f:
-            res += f.read()
+        paths = [self.file_path]
         if self.cata == 'ods':
-            with open(file=PathUtil.get_sql_template_file_name('ods_etl_template.sql', cata='ods'), encoding='utf-8') as f:
-                res += f.read()
-        return res
+            paths.append(PathUtil.get_sql_template_file_name('ods_etl_template.sql', cata='ods'))
+        return paths
+
+    @property
+    def _tpl_str(self):
+        return ''.join(self._read(p) for p in self._tpl_paths)
+
+    def _compiled(self):
+        key = tuple((p, os.path.getmtime(p)) for p in self._tpl_paths)
+        klass = _COMPILED.get(key)
+        if klass is None:
+            with _LOCK:
+                klass = _COMPILED.get(key)
+                if klass is None:
+                    klass = Template.compile(source=self._tpl_str)
+                    _COMPILED[key] = klass
+        return klass
+
+    @classmethod
+    def _hints(cls, file_name):
+        return HiveResourceAdvisor.get().hints(file_name)
 
     def update_search_list(self, k=None, v=None, **kwargs):
         if k and v:
             self.search_list[k] = v
         if kwargs:
             self.search_list.update(kwargs)
+        self._sql = None
 
     @property
     def sql(self):
-        t = Template(self._tpl_str, searchList=self.search_list)
-        return str(t)
+        """渲染结果在实例内缓存, 修改search_list后重新渲染"""
+        if self._sql is None:
+            # hive参数
+            res = self._read(PathUtil.get_sql_template_file_name('hive_param.sql'))
+            # 按历史数据量覆盖资源参数
+            if self.search_list['engine'] != 'duckdb':
+                res += self._hints(self.file_name)
+            res += str(self._compiled()(searchList=self.search_list))
+            self._sql = res
+        return self._sql
 
     def write_and_get_result_sql_path(self):
         with open(self.output_path, 'w') as f:
             f.write(self.sql)
         return self.output_path
 
+    @classmethod
+    def list_templates(cls, cata):
+        """目录下的模板文件名, ods不含公共的 ods_etl_template.sql"""
+        dir_path = PathUtil.get_sql_template_dir(cata)
+        return sorted(i for i in os.listdir(dir_path) if i.endswith('.sql') and i != 'ods_etl_template.sql')
+
+    @classmethod
+    def render_batch(cls, items, search_list=None, write=False):
+        """
+        一次渲染多个模板, 共用编译缓存
+        :param items: [(file_name, cata)] 或 [(file_name, cata, 单个模板的search_list)]
+        :param search_list: 公共参数, 如指定运行日期 {'now': Now(...)}
+        :param write: 是否写入 sql_files/
+        :return: [TemplateUtil], 与items顺序一致, sql已渲染
+        """
+        res = []
+        for item in items:
+            file_name, cata = item[0], item[1]
+            sl = dict(search_list or {})
+            if len(item) > 2 and item[2]:
+                sl.update(item[2])
+            t = TemplateUtil(file_name, search_list=sl, cata=cata)
+            if write:
+                t.write_and_get_result_sql_path()
+            else:
+                # 预先渲染, 结果缓存在实例内
+                t.sql
+            res.append(t)
+        return res
+
 
 if __name__ == '__main__':
     t = TemplateUtil('stock_basic.sql', cata='ods', search_list={'now': Now(), 'data_file_path': 'fffff.abc'})
@@ -0,0 +1,116 @@
+# coding: utf-8
+# DagRunner 依赖顺序, 失败跳过下游, 重试, 耗时不含排队时间
+
+import threading
+import time
+
+import pytest
+
+from utils.dag_runner import DagRunner, DagTask
+
+
+def recorder():
+    log = []
+    lock = threading.Lock()
+
+    def step(name, sleep=0.0, result=None):
+        def func():
+            with lock:
+                log.append(('start', name))
+            time.sleep(sleep)
+            with lock:
+                log.append(('end', name))
+            return result
+        return func
+    return log, step
+
+
+def test_order():
+    log, step = recorder()
+    r = DagRunner(max_workers=4, retry_wait=0)
+    r.add('trade_cal', step('trade_cal', 0.05))
+    r.add('stock_basic', step('stock_basic', 0.05))
+    r.add('daily', step('daily'), deps=['trade_cal', 'stock_basic'])
+    r.add('money_flow', step('money_flow'), deps=['trade_cal'])
+    assert r.run()
+    pos = {e: i for i, e in enumerate(log)}
+    assert pos[('start', 'daily')] > pos[('end', 'trade_cal')]
+    assert pos[('start', 'daily')] > pos[('end', 'stock_basic')]
+    assert pos[('start', 'money_flow')] > pos[('end', 'trade_cal')]
+    # 无依赖的任务并发执行
+    assert pos[('start', 'stock_basic')] < pos[('end', 'trade_cal')]
+    assert all(t.status == DagTask.SUCCESS for t in r.tasks.values())
+
+
+def test_skip_downstream():
+    log, step = recorder()
+    r = DagRunner(max_workers=2, retries=0)
+    r.add('a', step('a'))
+    r.add('b', step('b', result=1), deps=['a'])
+    r.add('c', step('c'), deps=['b'])
+    r.add('d', step('d'), deps=['c'])
+    r.add('e', step('e'), deps=['a'])
+    assert not r.run()
+    status = {name: t.status for name, t in r.tasks.items()}
+    assert status == {'a': DagTask.SUCCESS, 'b': DagTask.FAILED, 'c': DagTask.SKIPPED,
+                      'd': DagTask.SKIPPED, 'e': DagTask.SUCCESS}
+    assert ('start', 'c') not in log and ('start', 'd') not in log
+    assert r.tasks['c'].error == 'upstream b failed'
+
+
+def test_retry():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise IOError('timeout')
+
+    r = DagRunner(max_workers=1, retries=2, retry_wait=0)
+    r.add('flaky', flaky)
+    assert r.run()
+    assert r.tasks['flaky'].attempts == 3
+
+    calls.clear()
+    r = DagRunner(max_workers=1, retries=5, retry_wait=0)
+    r.add('flaky', flaky, retries=1)
+    r.add('next', lambda: None, deps=['flaky'])
+    assert not r.run()
+    assert r.tasks['flaky'].attempts == 2
+    assert r.tasks['next'].status == DagTask.SKIPPED
+
+
+def test_check():
+    r = DagRunner()
+    r.add('a', lambda: None, deps=['b'])
+    r.add('b', lambda: None, deps=['a'])
+    with pytest.raises(ValueError):
+        r.run()
+    r = DagRunner()
+    r.add('a', lambda: None, deps=['x'])
+    with pytest.raises(ValueError):
+        r.run()
+
+
+def test_cost_excludes_queue():
+    # 单线程时后执行的任务在队列中等待, 耗时只算自身执行时间
+    r = DagRunner(max_workers=1)
+    for name in 'abcd':
+        r.add(name, lambda: time.sleep(0.1))
+    assert r.run()
+    for task in r.tasks.values():
+        assert 0.09 <= task.cost < 0.18
+    cost, path = r.critical_path()
+    assert cost < 0.18 and len(path) == 1
+
+
+def test_critical_path():
+    r = DagRunner(max_workers=4)
+    r.add('a', lambda: time.sleep(0.1))
+    r.add('b', lambda: time.sleep(0.2), deps=['a'])
+    r.add('c', lambda: None, deps=['a'])
+    r.add('d', lambda: None, deps=['b', 'c'])
+    assert r.run()
+    cost, path = r.critical_path()
+    assert path == ['a', 'b', 'd']
+    assert 0.29 <= cost < 0.45
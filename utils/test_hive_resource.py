@@ -0,0 +1,65 @@
+# coding: utf-8
+# HiveResourceAdvisor 按数据量生成的资源参数
+
+import pytest
+
+from utils.hive_resource import GB, MB, HiveResourceAdvisor
+from utils.sql_executor import SqlResult
+
+# hive_param.sql 默认值
+DEFAULT_SPLIT = 100000000
+DEFAULT_MEMORY = 3072
+
+
+def advise(input_bytes):
+    return dict(HiveResourceAdvisor.advise(input_bytes))
+
+
+@pytest.mark.parametrize('input_bytes', [0, 10 * MB, 2 * GB, 9 * GB])
+def test_small_not_more_maps(input_bytes):
+    # 小任务的split不小于默认值, map数和内存都不超过默认配置
+    p = advise(input_bytes)
+    assert p['mapred.max.split.size'] == p['mapred.min.split.size'] == DEFAULT_SPLIT
+    assert p['mapreduce.map.memory.mb'] == p['mapreduce.reduce.memory.mb'] == DEFAULT_MEMORY
+    assert p['hive.exec.reducers.max'] == max(1, -(-input_bytes // HiveResourceAdvisor.BYTES_PER_REDUCER))
+
+
+def test_medium():
+    p = advise(20 * GB)
+    assert p['mapred.max.split.size'] == 20 * GB // HiveResourceAdvisor.TARGET_MAPS
+    assert p['hive.exec.reducers.max'] == 80
+    assert p['mapreduce.map.memory.mb'] == DEFAULT_MEMORY
+    assert p['mapreduce.map.java.opts'] == '-Xmx2457m'
+
+
+def test_large():
+    p = advise(200 * GB)
+    assert p['mapred.max.split.size'] == HiveResourceAdvisor.MAX_SPLIT
+    assert p['hive.exec.reducers.max'] == HiveResourceAdvisor.MAX_REDUCERS
+    assert p['mapreduce.map.memory.mb'] == p['mapreduce.reduce.memory.mb'] == 4096
+    assert p['mapreduce.reduce.java.opts'] == '-Xmx3276m'
+
+
+def test_monotonic():
+    sizes = [MB, 100 * MB, GB, 10 * GB, 50 * GB, 500 * GB]
+    for key in ['mapred.max.split.size', 'hive.exec.reducers.max', 'mapreduce.map.memory.mb']:
+        values = [advise(b)[key] for b in sizes]
+        assert values == sorted(values)
+
+
+def test_hints(tmp_path):
+    advisor = HiveResourceAdvisor(db_path=str(tmp_path / 'sql_stats.db'))
+    assert advisor.hints('daily.sql') == ''
+    # 失败或无读取统计的执行不记录
+    advisor.record('daily.sql', SqlResult('daily.sql', 1, hdfs_read=GB))
+    advisor.record('daily.sql', SqlResult('daily.sql', 0))
+    assert advisor.estimate_bytes('daily.sql') is None
+
+    advisor.record('daily.sql', SqlResult('daily.sql', 0, rows={'ods.daily': 10}, hdfs_read=2 * GB))
+    # 写入行数折算的数据量大于读取量时取大
+    advisor.record('daily.sql', SqlResult('daily.sql', 0, rows={'ods.daily': 300000000}, hdfs_read=GB))
+    assert advisor.estimate_bytes('daily.sql') == 300000000 * HiveResourceAdvisor.ROW_BYTES
+    hints = advisor.hints('daily.sql')
+    assert hints.startswith('-- resource hints: daily.sql')
+    assert 'set mapreduce.map.memory.mb=3072;' in hints
+    advisor.close()
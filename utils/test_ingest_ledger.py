@@ -0,0 +1,124 @@
+# coding: utf-8
+# IngestLedger 状态流转 fetched -> committed -> loaded 及快照标记
+
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+
+from utils.ingest_ledger import IngestLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    a = IngestLedger('IngestLedgerTest', db_path=str(tmp_path / 'ingest_ledger.db'))
+    yield a
+    a.close()
+
+
+def status(ledger, dt, code=''):
+    row = ledger.conn.execute('SELECT status FROM ingest_ledger WHERE task = ? AND ts_code = ? AND dt = ?',
+                              (ledger.task, code, str(dt))).fetchone()
+    return row and row[0]
+
+
+def test_record_commit_load(ledger):
+    ledger.record(20230101, df=pd.DataFrame({'a': [1, 2]}))
+    # 只拉取未写落地文件, 不算覆盖
+    assert status(ledger, 20230101) == IngestLedger.FETCHED
+    assert not ledger.exists(20230101)
+    assert not ledger.has_unloaded()
+
+    ledger.commit()
+    assert status(ledger, 20230101) == IngestLedger.COMMITTED
+    assert ledger.exists(20230101)
+    assert ledger.has_unloaded()
+    assert not ledger.pending
+
+    ledger.mark_loaded()
+    assert status(ledger, 20230101) == IngestLedger.LOADED
+    assert not ledger.has_unloaded()
+    ledger.reload()
+    assert ledger.exists(20230101)
+
+
+def test_row_count_checksum(ledger):
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    ledger.record('20230102', code='000001.SZ', df=df)
+    row = ledger.conn.execute('SELECT row_count, checksum FROM ingest_ledger WHERE dt = ?', ('20230102',)).fetchone()
+    assert row == (3, IngestLedger.checksum(df))
+    assert IngestLedger.checksum(pd.DataFrame()) == ''
+
+
+def test_commit_keys(ledger):
+    ledger.record('20230101')
+    ledger.record('20230102')
+    ledger.commit([('', 20230101)])
+    assert ledger.exists('20230101') and not ledger.exists('20230102')
+    assert ledger.pending == {('', '20230102')}
+
+
+def test_stale_committed_not_done(ledger):
+    # 更早committed未load的落地文件已不在当天glob内, 视为缺失
+    ledger.record('20230101')
+    ledger.commit()
+    with ledger.conn:
+        ledger.conn.execute('UPDATE ingest_ledger SET update_time = ?', (ledger.today_begin() - 1,))
+    ledger.reload()
+    assert not ledger.exists('20230101')
+    assert not ledger.has_unloaded()
+
+
+def test_missing_lookback(ledger):
+    for dt in ['20230101', '20230102', '20230103']:
+        ledger.record(dt)
+    ledger.commit()
+    date_list = ['20230101', '20230102', '20230103', '20230104']
+    assert ledger.missing(date_list) == ['20230104']
+    assert ledger.missing(date_list, lookback=2) == ['20230103', '20230104']
+    assert ledger.missing(date_list, code='000001.SZ') == date_list
+
+
+def test_remove(ledger):
+    ledger.record('20230101')
+    ledger.commit()
+    ledger.remove(['20230101'])
+    assert not ledger.exists('20230101')
+    assert status(ledger, '20230101') is None
+
+
+def test_dt_since_excludes_snapshot(ledger):
+    since = time.time() - 1
+    assert ledger.min_dt_since(since) is None
+    ledger.mark_snapshot_ready()
+    assert ledger.min_dt_since(since) is None and ledger.max_dt_since(since) is None
+    for dt in ['20230105', '20230103', '20230104']:
+        ledger.record(dt)
+    assert ledger.min_dt_since(since) == '20230103'
+    assert ledger.max_dt_since(since) == '20230105'
+    assert ledger.min_dt_since(time.time() + 1) is None
+
+
+def test_snapshot_ready(ledger, tmp_path):
+    assert not ledger.snapshot_ready()
+    ledger.mark_snapshot_ready()
+    assert ledger.snapshot_ready()
+    # 标记不影响日期覆盖判断, 新实例读取同一台账仍可见
+    assert ledger.missing(['20230101']) == ['20230101']
+    other = IngestLedger('IngestLedgerTest', db_path=str(tmp_path / 'ingest_ledger.db'))
+    assert other.snapshot_ready()
+    assert not IngestLedger('IngestLedgerOther', db_path=str(tmp_path / 'ingest_ledger.db')).snapshot_ready()
+    other.close()
+
+
+def test_context_manager(tmp_path):
+    db_path = str(tmp_path / 'ingest_ledger.db')
+    with IngestLedger('IngestLedgerTest', db_path=db_path) as a:
+        a.record('20230101')
+        a.commit()
+    # 退出 with 后连接关闭, 已提交的记录可被新实例读取
+    with pytest.raises(sqlite3.ProgrammingError):
+        a.conn.execute('SELECT 1')
+    with IngestLedger('IngestLedgerTest', db_path=db_path) as b:
+        assert b.exists('20230101')
@@ -0,0 +1,79 @@
+# coding: utf-8
+# 令牌桶按每分钟额度限流, 多线程共享同一接口额度
+
+import threading
+import time
+
+from utils.rate_limiter import RateLimitedPro, RateLimiter, TokenBucket
+
+
+def test_bucket_burst():
+    # 满桶时突发 capacity 个不等待
+    bucket = TokenBucket(6000)
+    assert bucket.capacity == 100
+    st = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - st < 0.1
+
+
+def test_bucket_quota():
+    # 6000次/分钟 = 100次/秒, 突发100后再取50个至少等0.5秒
+    bucket = TokenBucket(6000)
+    st = time.monotonic()
+    for _ in range(150):
+        bucket.acquire()
+    assert time.monotonic() - st >= 0.45
+
+
+def test_bucket_quota_threads():
+    bucket = TokenBucket(6000)
+    st = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(50)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 0.95 <= time.monotonic() - st < 2
+
+
+def test_configure_shared_by_name():
+    RateLimiter.configure('test_api', 6000)
+    bucket = RateLimiter.get('test_api')
+    assert bucket.rate == 6000
+    # 额度不变时沿用同一个桶, 多个任务共享
+    RateLimiter.configure('test_api', 6000)
+    assert RateLimiter.get('test_api') is bucket
+    RateLimiter.configure('test_api', 3000)
+    assert RateLimiter.get('test_api').rate == 3000
+
+
+def test_global_quota():
+    RateLimiter.configure('test_api_a', 60000)
+    RateLimiter.configure('test_api_b', 60000)
+    RateLimiter.configure_global(6000)
+    try:
+        st = time.monotonic()
+        for i in range(150):
+            RateLimiter.acquire('test_api_a' if i % 2 else 'test_api_b')
+        assert time.monotonic() - st >= 0.45
+    finally:
+        RateLimiter.configure_global(None)
+
+
+class FakePro(object):
+
+    def daily(self, trade_date=''):
+        return trade_date
+
+    def query(self, api_name, fields='', **kwargs):
+        return api_name
+
+
+def test_rate_limited_pro(monkeypatch):
+    calls = []
+    monkeypatch.setattr(RateLimiter, 'acquire', classmethod(lambda cls, api_name, n=1: calls.append(api_name)))
+    pro = RateLimitedPro(FakePro())
+    assert pro.daily(trade_date='20230103') == '20230103'
+    assert pro.query('moneyflow') == 'moneyflow'
+    assert calls == ['daily', 'moneyflow']
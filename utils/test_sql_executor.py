@@ -0,0 +1,80 @@
+# coding: utf-8
+# 执行后端: 语句切分, hive输出解析, hs2 load data 的HDFS上传
+
+import pytest
+
+from utils.sql_executor import (BaseExecutor, DryRunExecutor, HiveCliExecutor, Hs2Executor, SqlExecutor,
+                                split_statements)
+from utils.template_util import TemplateUtil
+
+
+def test_split_statements():
+    sql = "set a=1; -- x;y\nselect ';' from t;\ninsert overwrite table t select 1;"
+    assert split_statements(sql) == ['set a=1', "select ';' from t", 'insert overwrite table t select 1']
+
+
+def test_parse_output():
+    rows, hdfs_read = HiveCliExecutor.parse_output([
+        'Partition ods.daily{pt_dt=2023-07-13} stats: [numFiles=1, numRows=5000, totalSize=1, rawDataSize=2]',
+        'Table l1.dim_stock stats: [numFiles=1, numRows=300, totalSize=1]',
+        'Stage-Stage-1: Map: 1   Cumulative CPU: 3.1 sec   HDFS Read: 12345 HDFS Write: 678 SUCCESS',
+        'Stage-Stage-2: Map: 1   HDFS Read: 100 HDFS Write: 1 SUCCESS',
+    ])
+    assert rows == {'ods.daily{pt_dt=2023-07-13}': 5000, 'l1.dim_stock': 300}
+    assert hdfs_read == 12445
+
+
+def test_hive_cli_missing():
+    result = HiveCliExecutor('/nonexistent/hive').execute('select 1')
+    assert result.exit_code == 127 and not result.ok
+
+
+def test_local_executors_no_stage():
+    for executor in [DryRunExecutor(), HiveCliExecutor()]:
+        assert executor.LOCAL_LOAD
+        assert executor.stage('/data/daily') == '/data/daily'
+
+
+@pytest.fixture
+def hs2(monkeypatch):
+    executor = Hs2Executor(staging_dir='/tmp/staging')
+    calls = []
+    monkeypatch.setattr(executor, '_hdfs', lambda *args: calls.append(args))
+    return executor, calls
+
+
+def test_hs2_stage(hs2):
+    executor, calls = hs2
+    assert not executor.LOCAL_LOAD
+    path = executor.stage('/root/data/daily/')
+    target = path.rsplit('/', 1)[0]
+    assert path.startswith('/tmp/staging/') and path.endswith('/daily')
+    assert calls == [('-mkdir', '-p', target), ('-put', '-f', '/root/data/daily/', target)]
+    # 每次上传独立目录, 并发任务互不覆盖
+    assert executor.stage('/root/data/daily') != path
+
+    calls.clear()
+    executor.unstage(path)
+    assert calls == [('-rm', '-r', '-f', target)]
+
+
+@pytest.mark.parametrize('executor, keyword', [(DryRunExecutor(), 'load data local inpath'),
+                                               (Hs2Executor(), 'load data  inpath')])
+def test_template_load(executor, keyword, monkeypatch):
+    # 不读写 ts/data/sql_stats.db
+    monkeypatch.setattr(TemplateUtil, '_hints', classmethod(lambda cls, file_name: ''))
+    search_list = {
+        'file_format': 'parquet', 'data_dir': '/x/daily', 'partition_col': 'trade_date',
+        'partition_list': ['20230103'], 'pq_cols': '`a` string', 'pq_col_names': '`a`',
+        'snapshot_by_partition': True, 'snap_init': False, 'retention_days': 10, 'engine': 'hive',
+        'load_local': 'local' if executor.LOCAL_LOAD else '',
+    }
+    sql = TemplateUtil('daily.sql', cata='ods', search_list=search_list).sql
+    assert f"{keyword} '/x/daily/trade_date=20230103'" in sql
+
+
+def test_executor_engine(monkeypatch):
+    monkeypatch.setattr(SqlExecutor, '_instance', None)
+    monkeypatch.setenv('SQL_EXECUTOR', 'dry_run')
+    assert isinstance(SqlExecutor.get(), DryRunExecutor)
+    assert isinstance(SqlExecutor.get(), BaseExecutor)
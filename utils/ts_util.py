@@ -4,10 +4,13 @@ import os
 import sys
 import tushare as ts
 from utils.setting import TOKEN
+from utils.rate_limiter import RateLimitedPro
+from utils.response_cache import CachedPro
 from env import TOKEN as ENV_TOKEN
 
 token = TOKEN or ENV_TOKEN
 
 ts.set_token(token)
-pro = ts.pro_api()
+# 先查本地缓存(utils/response_cache), 未命中再按接口限流调用, 见 utils/rate_limiter.TS_API_QUOTA
+pro = CachedPro(RateLimitedPro(ts.pro_api()))
 